@@ -0,0 +1,257 @@
+"""Incremental replanning with D* Lite over a NavGrid.
+
+A DStarLite planner searches backwards from a fixed goal cell and keeps its
+search state between calls. When the start has moved, only the priority
+offset changes; when the nav grid has changed (props added, removed or
+moved), only the cells whose walkability flipped and their neighbours are
+repaired, so a re-plan towards the same goal expands far fewer cells than a
+new search.
+
+Moves and costs match Pathfinding.astar: 8 directions, sqrt(2) diagonals, no
+corner cutting; the goal may be a tight cell and the start need not be open.
+
+A planner can work on NavGrid snapshots, handed a newer one on each plan.
+
+NPCs do not use it: on the real scene masks (see bench_pathfinding.py) a
+first plan costs about a hundred times a JPS search and a repair after a prop
+change still ten times one, so NPC re-paths are full JPS searches on the path
+worker instead.
+"""
+import heapq
+import math
+
+from ai.pathfinding import DEFAULT_MAX_EXPANSIONS, DIAGONAL_COST, _open_cell_fn, may_connect
+
+# Replan counters
+_stats = {"plans": 0, "repairs": 0, "expansions": 0}
+
+# Keys are rounded to this many decimals: float sums of the same moves in another
+# order differ in the last bits, which would break ties the wrong way
+KEY_DIGITS = 6
+
+_STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+def get_replan_stats() -> dict:
+    """Return totals of incremental plans, grid repairs and node expansions."""
+    return dict(_stats)
+
+
+class DStarLite:
+    """D* Lite search state for one nav grid, goal cell and avoid_portals setting."""
+
+    def __init__(self, nav_grid, goal_cell: tuple, avoid_portals: bool = False,
+                 max_expansions: int = DEFAULT_MAX_EXPANSIONS):
+        self.nav_grid = nav_grid
+        self.goal_cell = goal_cell
+        self.avoid_portals = avoid_portals
+        self.max_expansions = max_expansions
+        self.cols, self.rows = nav_grid.cols, nav_grid.rows
+        self.goal = goal_cell[1] * self.cols + goal_cell[0]
+        self.version = nav_grid.version
+        self._open = self._snapshot()
+        self.start = None
+        self.km = 0.0
+        self.g = {}
+        self.rhs = {self.goal: 0.0}
+        # Heap of (k1, k2, cell) with lazy deletion; _queued holds each cell's live key
+        self._heap = []
+        self._queued = {}
+        self.last_expansions = 0
+
+    def _snapshot(self) -> bytearray:
+        """Open cells of the grid, with the goal opened if it is a usable tight cell."""
+        cells = bytearray(self.nav_grid.open_cells(self.avoid_portals))
+        gx, gy = self.goal_cell
+        if self.nav_grid.in_bounds(gx, gy) and _open_cell_fn(self.nav_grid, self.goal_cell, self.avoid_portals)(gx, gy):
+            cells[self.goal] = 1
+        return cells
+
+    def _is_open(self, i: int) -> bool:
+        return self._open[i] == 1 or i == self.start
+
+    def _h(self, a: int, b: int) -> float:
+        """Octile distance between two cells."""
+        dx = abs(a % self.cols - b % self.cols)
+        dy = abs(a // self.cols - b // self.cols)
+        return (dx + dy) + (DIAGONAL_COST - 2) * min(dx, dy)
+
+    def _around(self, i: int):
+        """All in-bounds cells in the 8-neighbourhood of i."""
+        x, y = i % self.cols, i // self.cols
+        for dx, dy in _STEPS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.cols and 0 <= ny < self.rows:
+                yield ny * self.cols + nx
+
+    def _edges(self, i: int):
+        """(neighbour, cost) for every legal move out of (or, symmetrically, into) cell i."""
+        if not self._is_open(i):
+            return
+        cols, rows = self.cols, self.rows
+        x, y = i % cols, i // cols
+        for dx, dy in _STEPS:
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < cols and 0 <= ny < rows):
+                continue
+            j = ny * cols + nx
+            if not self._is_open(j):
+                continue
+            if dx and dy:
+                # No corner cutting: both cardinal cells beside a diagonal must be open
+                if not (self._is_open(y * cols + nx) and self._is_open(ny * cols + x)):
+                    continue
+                yield j, DIAGONAL_COST
+            else:
+                yield j, 1.0
+
+    def _key(self, i: int) -> tuple:
+        best = min(self.g.get(i, math.inf), self.rhs.get(i, math.inf))
+        return (round(best + self._h(self.start, i) + self.km, KEY_DIGITS), round(best, KEY_DIGITS))
+
+    def _update_vertex(self, i: int) -> None:
+        if i != self.goal:
+            self.rhs[i] = min((cost + self.g.get(j, math.inf) for j, cost in self._edges(i)), default=math.inf)
+        if self.g.get(i, math.inf) != self.rhs.get(i, math.inf):
+            key = self._key(i)
+            self._queued[i] = key
+            heapq.heappush(self._heap, (key[0], key[1], i))
+        else:
+            self._queued.pop(i, None)
+
+    def _top(self):
+        """Live (key, cell) with the smallest key, or None if the queue is empty."""
+        heap, queued = self._heap, self._queued
+        while heap:
+            k1, k2, i = heap[0]
+            if queued.get(i) == (k1, k2):
+                return (k1, k2), i
+            heapq.heappop(heap)  # Stale entry
+        return None
+
+    def _compute(self) -> bool:
+        """Settle the start cell. Returns False if the expansion budget ran out first."""
+        expansions = 0
+        start = self.start
+        while True:
+            top = self._top()
+            start_g = self.g.get(start, math.inf)
+            start_rhs = self.rhs.get(start, math.inf)
+            settled = start_rhs == start_g or abs(start_rhs - start_g) < 10 ** -KEY_DIGITS
+            if top is None or (top[0] >= self._key(start) and settled):
+                break
+            if expansions >= self.max_expansions:
+                self._finish(expansions)
+                return False
+            expansions += 1
+            old_key, u = top
+            new_key = self._key(u)
+            if old_key < new_key:
+                # Key went stale as the start moved: requeue with the current one
+                self._queued[u] = new_key
+                heapq.heappush(self._heap, (new_key[0], new_key[1], u))
+                continue
+            del self._queued[u]
+            heapq.heappop(self._heap)
+            if self.g.get(u, math.inf) > self.rhs.get(u, math.inf):
+                self.g[u] = self.rhs[u]
+            else:
+                self.g[u] = math.inf
+                self._update_vertex(u)
+            for j in self._around(u):
+                self._update_vertex(j)
+        self._finish(expansions)
+        return True
+
+    def _finish(self, expansions: int) -> None:
+        self.last_expansions = expansions
+        _stats["expansions"] += expansions
+
+    def _cells_changed(self, cells) -> None:
+        """Repair around cells whose walkability flipped."""
+        for i in cells:
+            self._update_vertex(i)
+            for j in self._around(i):
+                self._update_vertex(j)
+
+    def _sync_grid(self) -> bool:
+        """Pick up nav grid changes since the last plan. Returns False if they can no longer be traced."""
+        grid = self.nav_grid
+        if self.version == grid.version:
+            return True
+        changes = grid.changes_since(self.version)
+        if changes is None:
+            return False
+        fresh = self._snapshot()
+        if self.start is None:
+            # Nothing searched yet: just take the new walkability
+            self._open = fresh
+            self.version = grid.version
+            return True
+        flipped = set()
+        cols = self.cols
+        for x0, y0, x1, y1 in changes:
+            for y in range(y0, y1 + 1):
+                row = y * cols
+                for i in range(row + x0, row + x1 + 1):
+                    if fresh[i] != self._open[i]:
+                        flipped.add(i)
+        self._open = fresh
+        self.version = grid.version
+        if flipped:
+            _stats["repairs"] += 1
+            self._cells_changed(flipped)
+        return True
+
+    def plan(self, start_cell: tuple, nav_grid=None):
+        """Path from start_cell to the goal as world positions of cell centers.
+
+        nav_grid is a later snapshot of the same grid to catch up with first.
+        Returns None when no path can be produced incrementally (goal not
+        reachable, grid history lost, or the expansion budget ran out);
+        callers then fall back to a full search.
+        """
+        if nav_grid is not None:
+            self.nav_grid = nav_grid
+        grid = self.nav_grid
+        sx, sy = start_cell
+        if not grid.in_bounds(sx, sy) or not grid.in_bounds(*self.goal_cell):
+            return None
+        if start_cell == self.goal_cell:
+            return [grid.cell_center(sx, sy)]
+        start = sy * self.cols + sx
+        if self.start is not None and start != self.start:
+            # Offset the keys for the move before any repair queues new ones
+            previous = self.start
+            self.km += self._h(previous, start)
+            self.start = start
+            # The start is always enterable, so moving it can flip two cells
+            self._cells_changed([i for i in (previous, start) if not self._open[i]])
+        if not self._sync_grid() or not may_connect(grid, start_cell, self.goal_cell, self.avoid_portals):
+            return None
+        if self.start is None:
+            self.start = start
+            key = self._key(self.goal)
+            self._queued[self.goal] = key
+            heapq.heappush(self._heap, (key[0], key[1], self.goal))
+        _stats["plans"] += 1
+        if not self._compute() or self.g.get(start, math.inf) == math.inf:
+            return None
+
+        # Walk downhill on g from the start to the goal
+        cells = [start]
+        current = start
+        for _ in range(self.cols * self.rows):
+            if current == self.goal:
+                return [grid.cell_center(i % self.cols, i // self.cols) for i in cells]
+            best, best_cost = None, math.inf
+            for j, cost in self._edges(current):
+                total = cost + self.g.get(j, math.inf)
+                if total < best_cost:
+                    best, best_cost = j, total
+            if best is None or best_cost == math.inf:
+                return None
+            cells.append(best)
+            current = best
+        return None
+
@@ -0,0 +1,228 @@
+"""Dijkstra flow fields toward scene portals.
+
+NPCs crossing scenes always walk to a portal's center, and a scene has only a
+handful of portals. A FlowField floods the nav grid once from a portal's
+center cell and stores, for every cell, the step to take toward it, so any
+number of NPCs heading for that portal read their path off the field instead
+of searching. Fields are built on first use.
+
+When the nav grid changes, a field is repaired from the grid's change log
+(see NavGrid.changes_since) rather than flooded again: cells whose steps led
+through a newly closed cell are cleared and filled in from their neighbours,
+and newly opened cells are flooded outwards from theirs.
+"""
+import heapq
+import math
+from typing import Optional
+
+from ai.nav_grid import NAV_TIGHT
+
+# Step per direction code; a cell's code is the step toward the field's goal
+FLOW_STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+FLOW_GOAL = 8     # The goal cell itself
+FLOW_NONE = 255   # Closed, or cannot reach the goal
+
+_SQRT2 = math.sqrt(2)
+
+# Field counters shown in the debug overlay
+_stats = {"builds": 0, "repairs": 0, "repaired_cells": 0}
+
+
+def get_flow_field_stats() -> dict:
+    """Return totals of full field builds, repairs after grid changes and cells those repairs redid."""
+    return dict(_stats)
+
+
+class FlowField:
+    """Per-cell step toward one goal cell of a nav grid (portals are walkable)."""
+
+    def __init__(self, nav_grid, goal_cell: tuple):
+        self.nav_grid = nav_grid
+        self.goal = goal_cell
+        self.version = nav_grid.version
+        cols, rows = nav_grid.cols, nav_grid.rows
+        # Open cells inside a closed one-cell frame, so steps need no bounds checks
+        width = self.width = cols + 2
+        flags = self._flags = bytearray(width * (rows + 2))
+        open_cells = nav_grid.open_cells(False)
+        for y in range(rows):
+            flags[(y + 1) * width + 1:(y + 1) * width + 1 + cols] = open_cells[y * cols:(y + 1) * cols]
+        gx, gy = goal_cell
+        self._goal_i = (gy + 1) * width + gx + 1
+        if self._goal_open():
+            flags[self._goal_i] = 1  # A tight goal cell is still a valid place to end
+        # (offset to neighbour, cost, cardinal offsets a diagonal needs open, code stepping back)
+        self._moves = []
+        for dx, dy in FLOW_STEPS:
+            back = FLOW_STEPS.index((-dx, -dy))
+            if dx and dy:
+                self._moves.append((dy * width + dx, _SQRT2, dx, dy * width, back))
+            else:
+                self._moves.append((dy * width + dx, 1.0, 0, 0, back))
+
+        # Step code and walking cost to the goal per framed cell
+        self._codes = bytearray(b"\xff") * len(flags)
+        self._dist = [math.inf] * len(flags)
+        if nav_grid.in_bounds(gx, gy) and flags[self._goal_i]:
+            self._codes[self._goal_i] = FLOW_GOAL
+            self._dist[self._goal_i] = 0.0
+            self._flood([(0.0, self._goal_i)])
+        _stats["builds"] += 1
+
+    def _goal_open(self) -> bool:
+        grid = self.nav_grid
+        gx, gy = self.goal
+        if not grid.in_bounds(gx, gy):
+            return False
+        i = gy * grid.cols + gx
+        return not grid.prop_blocks[i] and (grid.cells[i] == NAV_TIGHT or grid.open_cells(False)[i] == 1)
+
+    def _flood(self, heap: list) -> None:
+        """Dijkstra outwards from the (cost, cell) entries of heap, lowering costs wherever it can."""
+        flags, codes, dist, moves = self._flags, self._codes, self._dist, self._moves
+        heapq.heapify(heap)
+        pop, push = heapq.heappop, heapq.heappush
+        while heap:
+            d, i = pop(heap)
+            if d > dist[i]:
+                continue  # Stale entry
+            for offset, cost, a, b, back in moves:
+                nb = i + offset
+                if not flags[nb] or (a and not (flags[i + a] and flags[i + b])):
+                    continue
+                nd = d + cost
+                if nd < dist[nb]:
+                    dist[nb] = nd
+                    codes[nb] = back
+                    push(heap, (nd, nb))
+
+    def _step_ok(self, i: int) -> bool:
+        """True if the step stored for cell i can still be taken."""
+        code = self._codes[i]
+        if code == FLOW_GOAL or code == FLOW_NONE:
+            return True
+        flags = self._flags
+        offset, _, a, b, _ = self._moves[code]
+        return flags[i] and flags[i + offset] and (not a or (flags[i + a] and flags[i + b]))
+
+    def refresh(self) -> bool:
+        """Bring the field up to date with the nav grid. Returns False if it has to be built again."""
+        grid = self.nav_grid
+        if self.version == grid.version:
+            return True
+        changes = grid.changes_since(self.version)
+        if changes is None:
+            return False
+        cols, width = grid.cols, self.width
+        flags, codes, dist, moves = self._flags, self._codes, self._dist, self._moves
+        open_cells = grid.open_cells(False)
+        goal_open = self._goal_open()
+        closed, opened = [], []
+        for x0, y0, x1, y1 in changes:
+            for y in range(y0, y1 + 1):
+                for x in range(x0, x1 + 1):
+                    i = (y + 1) * width + x + 1
+                    now = 1 if (open_cells[y * cols + x] or (i == self._goal_i and goal_open)) else 0
+                    if now != flags[i]:
+                        flags[i] = now
+                        (opened if now else closed).append(i)
+        self.version = grid.version
+        if not closed and not opened:
+            return True
+        if self._goal_i in opened:
+            return False  # Nothing was reachable before
+        _stats["repairs"] += 1
+
+        # Clear every cell whose steps ran through a closed cell or past one diagonally
+        cleared = set(closed)
+        for i in closed:
+            for offset, _, _, _, _ in moves:
+                if not self._step_ok(i + offset):
+                    cleared.add(i + offset)
+        pending = list(cleared)
+        while pending:
+            i = pending.pop()
+            for offset, _, _, _, back in moves:
+                nb = i + offset
+                # nb's step leads to i exactly when it is the step back from i
+                if codes[nb] == back and nb not in cleared:
+                    cleared.add(nb)
+                    pending.append(nb)
+        for i in cleared:
+            codes[i] = FLOW_NONE
+            dist[i] = math.inf
+        _stats["repaired_cells"] += len(cleared) + len(opened)
+
+        # Cleared and opened cells take the best step into a neighbour that kept its cost;
+        # neighbours of opened cells flood on, as the opened cells may be a shortcut for them
+        heap = []
+        for i in list(cleared) + opened:
+            if not flags[i]:
+                continue
+            for code, (offset, cost, a, b, _) in enumerate(moves):
+                nb = i + offset
+                if dist[nb] + cost < dist[i] and (not a or (flags[i + a] and flags[i + b])):
+                    dist[i] = dist[nb] + cost
+                    codes[i] = code
+            if dist[i] < math.inf:
+                heap.append((dist[i], i))
+        for i in opened:
+            for offset, _, _, _, _ in moves:
+                if dist[i + offset] < math.inf:
+                    heap.append((dist[i + offset], i + offset))
+        self._flood(heap)
+        return True
+
+    def cost_from(self, cell: tuple) -> float:
+        """Walking cost in cells from cell to the goal (math.inf if it cannot get there)."""
+        cx, cy = cell
+        if not self.nav_grid.in_bounds(cx, cy):
+            return math.inf
+        return self._dist[(cy + 1) * self.width + cx + 1]
+
+    def path_from(self, start: tuple) -> list:
+        """World positions of cell centers from the cell under start to the goal, or [] if unreachable."""
+        grid = self.nav_grid
+        cx, cy = grid.cell_of(*start)
+        if not grid.in_bounds(cx, cy):
+            return []
+        width, codes = self.width, self._codes
+        path = [grid.cell_center(cx, cy)]
+        for _ in range(len(codes)):
+            code = codes[(cy + 1) * width + cx + 1]
+            if code == FLOW_GOAL:
+                return path
+            if code == FLOW_NONE:
+                return []
+            dx, dy = FLOW_STEPS[code]
+            cx += dx
+            cy += dy
+            path.append(grid.cell_center(cx, cy))
+        return []
+
+
+def portal_at(nav_grid, x: float, y: float) -> Optional[int]:
+    """Id of the portal whose center lies in the same cell as (x, y), or None."""
+    mask = nav_grid.mask_system
+    target = nav_grid.cell_of(x, y)
+    for portal_id in mask.portal_regions:
+        bounds = mask.get_portal_bounds(portal_id)
+        if bounds is not None and nav_grid.cell_of(bounds.centerx, bounds.centery) == target:
+            return portal_id
+    return None
+
+
+def get_portal_flow_field(nav_grid, x: float, y: float) -> Optional[FlowField]:
+    """Flow field toward the portal whose center is under (x, y), or None if (x, y) is not a portal center.
+
+    Fields are kept on the nav grid per portal and repaired after the grid changes.
+    """
+    portal_id = portal_at(nav_grid, x, y)
+    if portal_id is None:
+        return None
+    target = nav_grid.cell_of(x, y)
+    field = nav_grid.flow_fields.get(portal_id)
+    if field is None or field.goal != target or not field.refresh():
+        field = FlowField(nav_grid, target)
+        nav_grid.flow_fields[portal_id] = field
+    return field
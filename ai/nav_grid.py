@@ -0,0 +1,315 @@
+"""Packed navigation grids for NPC pathfinding.
+
+A NavGrid samples a scene's compiled collision mask at the center of every
+pathfinding cell once, storing one byte per cell, plus a per-cell count of the
+prop collision rects covering it. Pathfinding.astar reads the bytes directly, so
+repeated repaths cost only the search. Grids are cached per (scene, cell size);
+the prop layer is kept in sync incrementally by the scene's PropIndex. Row and
+column scan tables for Jump Point Search are derived on demand and kept until
+the grid changes; recent changes are logged as cell ranges so derived
+structures (see ai.flow_field) can update only what changed.
+
+Searches run on snapshot() copies: a snapshot freezes the prop layer at one
+version, so the path worker (see ai.path_worker) can search it without a lock
+while the main thread keeps changing the live grid.
+"""
+import copy
+from array import array
+from typing import Optional
+
+# Per-cell navigation classes
+NAV_BLOCKED = 0
+NAV_FLOOR = 1   # Walkable with enough clearance for the NPC footprint
+NAV_PORTAL = 2  # Portal pixel (doorways only need to be walkable)
+NAV_TIGHT = 3   # Walkable but too close to a wall; only usable as the goal cell
+
+# Cells whose center is within this many pixels of a prop collision rect are blocked
+PROP_MARGIN = 5
+
+# Raster class -> 0 blocked / 1 walkable / 2 portal
+_RASTER_KIND = bytes(min(value, 2) for value in range(256))
+# (raster kind + 4 * has clearance) -> nav class
+_NAV_CLASS = bytes([NAV_BLOCKED, NAV_TIGHT, NAV_PORTAL, 0, NAV_BLOCKED, NAV_FLOOR, NAV_PORTAL] + [0] * 249)
+
+# 1 <-> 0 for open/blocked lanes
+_INVERT = bytes([1, 0] + [0] * 254)
+# Prop cover count -> 1 if no prop covers the cell
+_FREE = bytes([1] + [0] * 255)
+
+# Changed cell ranges kept in NavGrid.change_log
+CHANGE_LOG_SIZE = 64
+
+# (scene_name, cell_size, clearance) -> NavGrid
+_nav_grids = {}
+
+
+def line_tables(line: bytes) -> tuple:
+    """Scan tables for one grid row or column of open (1) / closed (0) cells.
+
+    Returns (blocked, opens_forward, opens_backward): per-cell flags for a
+    closed cell, an open cell whose predecessor is closed, and an open cell
+    whose successor is closed. Jump Point Search finds the next blocker or
+    forced neighbour along a line with bytes.find on these.
+    """
+    n = len(line)
+    lanes = int.from_bytes(line, "little")
+    ones = int.from_bytes(b"\x01" * n, "little")
+    previous = (lanes << 8) & ((1 << (8 * n)) - 1)
+    following = lanes >> 8
+    opens_forward = lanes & (previous ^ ones)
+    opens_backward = lanes & (following ^ ones)
+    return (line.translate(_INVERT), opens_forward.to_bytes(n, "little"), opens_backward.to_bytes(n, "little"))
+
+
+class NavGrid:
+    """Byte-per-cell walkability grid for one scene and cell size."""
+
+    def __init__(self, mask_system, cell_size: int, clearance: int, scene_name: str = None, version: int = 0):
+        self.mask_system = mask_system
+        self.scene_name = scene_name
+        self.cell = cell_size
+        self.clearance = clearance
+        half = cell_size // 2
+        self.cols = max(0, (mask_system.width - half + cell_size - 1) // cell_size)
+        self.rows = max(0, (mask_system.height - half + cell_size - 1) // cell_size)
+        self.cells = self._sample_cells()
+        # Number of prop collision rects covering each cell center
+        self.prop_blocks = bytearray(self.cols * self.rows)
+        # PropIndex currently feeding the prop layer
+        self.prop_source = None
+        # avoid_portals -> (version, open cells, row tables, column tables) for JPS
+        self._jump_tables = {}
+        # avoid_portals -> (version, component labels)
+        self._components = {}
+        # portal id -> flow_field.FlowField toward the portal's center, built on first use
+        self.flow_fields = {}
+        # avoid_portals -> navmesh.NavMesh, built on first use
+        self.navmeshes = {}
+        # Bumped on every change so callers can tell when cached results went stale
+        self.version = version
+        # (version, x0, y0, x1, y1) of the most recent changes, oldest first
+        self.change_log = []
+        # The grid snapshots are taken from (itself for a live grid), and the latest snapshot
+        self.live = self
+        self._snapshot = None
+
+    def snapshot(self) -> "NavGrid":
+        """Frozen copy of the grid at its current version, shared until the grid changes.
+
+        Shares the sampled cells; the prop layer and change log are copied and
+        the derived caches start over (scan tables and components of the same
+        version are reused). Call on the thread that changes the grid.
+        """
+        previous = self._snapshot
+        if previous is not None and previous.version == self.version:
+            return previous
+        snap = copy.copy(self)
+        snap.prop_blocks = bytes(self.prop_blocks)
+        snap.change_log = list(self.change_log)
+        snap._jump_tables = {key: value for key, value in self._jump_tables.items() if value[0] == self.version}
+        snap._components = {key: value for key, value in self._components.items() if value[0] == self.version}
+        snap.flow_fields = {}
+        snap.navmeshes = {}
+        snap.prop_source = None
+        snap._snapshot = snap
+        self._snapshot = snap
+        return snap
+
+    def _sample_cells(self) -> bytes:
+        """Classify every cell from the mask pixel at its center."""
+        mask = self.mask_system
+        width, cell, cols = mask.width, self.cell, self.cols
+        half = cell // 2
+        has_clearance = bytes(1 if value > self.clearance else 0 for value in range(256))
+        out = bytearray()
+        for row in range(self.rows):
+            start = (row * cell + half) * width + half
+            end = start + (cols - 1) * cell + 1
+            kinds = bytes(mask.raster[start:end:cell]).translate(_RASTER_KIND)
+            room = bytes(mask.clearance[start:end:cell]).translate(has_clearance)
+            # Lanes never exceed 6, so byte-wise addition cannot carry between cells
+            combined = int.from_bytes(kinds, "little") + (int.from_bytes(room, "little") << 2)
+            out += combined.to_bytes(cols, "little").translate(_NAV_CLASS)
+        return bytes(out)
+
+    def cell_of(self, x: float, y: float) -> tuple:
+        """Grid cell containing world position (x, y)."""
+        return int(x // self.cell), int(y // self.cell)
+
+    def cell_center(self, cx: int, cy: int) -> tuple:
+        """World position of a cell's center."""
+        return cx * self.cell + self.cell // 2, cy * self.cell + self.cell // 2
+
+    def in_bounds(self, cx: int, cy: int) -> bool:
+        return 0 <= cx < self.cols and 0 <= cy < self.rows
+
+    def passable_table(self, avoid_portals: bool = False, allow_tight: bool = False) -> bytes:
+        """Lookup table nav class -> 1 if a search may enter cells of that class."""
+        table = bytearray(256)
+        table[NAV_FLOOR] = 1
+        if not avoid_portals:
+            table[NAV_PORTAL] = 1
+        if allow_tight:
+            table[NAV_TIGHT] = 1
+        return bytes(table)
+
+    def is_passable(self, cx: int, cy: int, avoid_portals: bool = False) -> bool:
+        """True if a path may pass through the cell."""
+        if not self.in_bounds(cx, cy):
+            return False
+        i = cy * self.cols + cx
+        return not self.prop_blocks[i] and self.passable_table(avoid_portals)[self.cells[i]] == 1
+
+    def open_cells(self, avoid_portals: bool = False) -> bytes:
+        """One byte per cell: 1 if passable (class and prop layer), else 0."""
+        return self.jump_tables(avoid_portals)[1]
+
+    def jump_tables(self, avoid_portals: bool = False) -> tuple:
+        """Open cells plus per-row and per-column scan tables (see line_tables).
+
+        Built on first use and kept until the grid version changes.
+        """
+        cached = self._jump_tables.get(avoid_portals)
+        if cached is not None and cached[0] == self.version:
+            return cached
+        cols, rows = self.cols, self.rows
+        size = cols * rows
+        passable = int.from_bytes(self.cells.translate(self.passable_table(avoid_portals)), "little")
+        free = int.from_bytes(bytes(self.prop_blocks).translate(_FREE), "little")
+        open_cells = (passable & free).to_bytes(size, "little")
+        row_tables = [line_tables(open_cells[y * cols:(y + 1) * cols]) for y in range(rows)]
+        col_tables = [line_tables(open_cells[x::cols]) for x in range(cols)]
+        cached = (self.version, open_cells, row_tables, col_tables)
+        self._jump_tables[avoid_portals] = cached
+        return cached
+
+    def components(self, avoid_portals: bool = False) -> array:
+        """Connected-component label per cell (0 for closed cells), kept until the grid changes.
+
+        Diagonal steps need both cardinal cells open, so 4-connected open
+        cells are exactly the cells a search can travel between.
+        """
+        cached = self._components.get(avoid_portals)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        cols = self.cols
+        open_cells = self.open_cells(avoid_portals)
+        # Union-find over the open runs of each row
+        parent = []
+
+        def find(run):
+            while parent[run] != run:
+                parent[run] = parent[parent[run]]
+                run = parent[run]
+            return run
+
+        runs = []  # (row start index, x0, x1, run id) per row
+        previous = []
+        for y in range(self.rows):
+            row = open_cells[y * cols:(y + 1) * cols]
+            current = []
+            x = row.find(1)
+            while x != -1:
+                end = row.find(0, x)
+                if end == -1:
+                    end = cols
+                run = len(parent)
+                parent.append(run)
+                for px0, px1, other in previous:
+                    if px0 < end and x < px1:
+                        a, b = find(run), find(other)
+                        if a != b:
+                            parent[max(a, b)] = min(a, b)
+                current.append((x, end, run))
+                x = row.find(1, end)
+            runs.append(current)
+            previous = current
+        labels = array("I", bytes(4 * cols * self.rows))
+        for y, current in enumerate(runs):
+            for x0, x1, run in current:
+                labels[y * cols + x0:y * cols + x1] = array("I", [find(run) + 1]) * (x1 - x0)
+        self._components[avoid_portals] = (self.version, labels)
+        return labels
+
+    def _prop_cell_range(self, rect):
+        """Cells whose centers lie within PROP_MARGIN of rect, as (x0, y0, x1, y1) inclusive."""
+        cell, half = self.cell, self.cell // 2
+        # Center c*cell + half must fall in [left - margin, right + margin)
+        x0 = max(0, -((half - rect.left + PROP_MARGIN) // cell))
+        y0 = max(0, -((half - rect.top + PROP_MARGIN) // cell))
+        x1 = min(self.cols - 1, (rect.right + PROP_MARGIN - 1 - half) // cell)
+        y1 = min(self.rows - 1, (rect.bottom + PROP_MARGIN - 1 - half) // cell)
+        return x0, y0, x1, y1
+
+    def _adjust_props(self, rect, delta: int) -> None:
+        self._changed(*self._count_prop(rect, delta))
+
+    def _count_prop(self, rect, delta: int) -> tuple:
+        """Add delta to the prop count of the cells under rect; returns the cell range."""
+        x0, y0, x1, y1 = self._prop_cell_range(rect)
+        blocks, cols = self.prop_blocks, self.cols
+        for cy in range(y0, y1 + 1):
+            row = cy * cols
+            for i in range(row + x0, row + x1 + 1):
+                # Counts are bytes: a cell under more than 255 rects stays saturated
+                blocks[i] = min(255, max(0, blocks[i] + delta))
+        return x0, y0, x1, y1
+
+    def _changed(self, x0: int, y0: int, x1: int, y1: int) -> None:
+        """Bump the version and log the changed cell range."""
+        self.version += 1
+        self.change_log.append((self.version, x0, y0, x1, y1))
+        if len(self.change_log) > CHANGE_LOG_SIZE:
+            del self.change_log[0]
+
+    def changes_since(self, version: int):
+        """Cell ranges changed after version, or None if the log no longer reaches back that far."""
+        log = self.change_log
+        if version == self.version:
+            return []
+        if not log or log[0][0] > version + 1:
+            return None
+        return [change[1:] for change in log if change[0] > version]
+
+    def add_prop_rect(self, rect) -> None:
+        """Block the cells under a world-space prop collision rect."""
+        self._adjust_props(rect, 1)
+
+    def remove_prop_rect(self, rect) -> None:
+        """Unblock the cells under a prop collision rect added earlier."""
+        self._adjust_props(rect, -1)
+
+    def move_prop_rects(self, old_rects, new_rects) -> None:
+        """Swap prop rects added earlier for new ones (a prop moved or changed) as one change."""
+        if list(old_rects) == list(new_rects):
+            return
+        ranges = [self._count_prop(rect, -1) for rect in old_rects]
+        ranges += [self._count_prop(rect, 1) for rect in new_rects]
+        x0s, y0s, x1s, y1s = zip(*ranges)
+        self._changed(min(x0s), min(y0s), max(x1s), max(y1s))
+
+    def set_prop_rects(self, rects) -> None:
+        """Replace the whole prop layer."""
+        self.prop_blocks = bytearray(self.cols * self.rows)
+        for rect in rects:
+            self._count_prop(rect, 1)
+        # One version bump and log entry for the whole layer
+        self._changed(0, 0, self.cols - 1, self.rows - 1)
+
+
+def get_nav_grid(scene_name: str, mask_system, cell_size: int, clearance: int) -> Optional[NavGrid]:
+    """Get the nav grid for a scene and cell size, building it on first use or when its mask changed."""
+    if mask_system is None:
+        return None
+    key = (scene_name, cell_size, clearance)
+    grid = _nav_grids.get(key)
+    if grid is None or grid.mask_system is not mask_system:
+        # A replacement grid continues the old one's versions, so results cached against it go stale
+        grid = NavGrid(mask_system, cell_size, clearance, scene_name, grid.version + 1 if grid else 0)
+        _nav_grids[key] = grid
+    return grid
+
+
+def clear_nav_grids() -> None:
+    """Drop all cached nav grids."""
+    _nav_grids.clear()
@@ -0,0 +1,217 @@
+"""Polygon navigation meshes over a NavGrid.
+
+The open cells of a nav grid (the scene's compiled mask sampled with the NPC
+clearance, minus prop footprints) are merged row by row into convex
+rectangles of at most MAX_POLYGON_CELLS cells a side. Rectangles that share a
+stretch of edge are linked through it (a portal). A search runs over a few
+hundred polygons instead of thousands of cells (see Pathfinding.navmesh),
+and the corridor of portals it finds is pulled tight with the funnel
+algorithm, so paths come out any-angle with one waypoint per corner.
+
+Every point of a mesh lies in an open cell, so any path through a corridor
+is walkable. Portal ends at a wall corner are pulled in by PORTAL_MARGIN of a
+cell so paths do not graze walls.
+
+Meshes are cached per nav grid and avoid_portals flag and rebuilt when the
+grid changes.
+"""
+from array import array
+
+# Longest polygon side in cells; smaller polygons give better search costs, larger ones fewer nodes
+MAX_POLYGON_CELLS = 12
+# Portal ends touching a closed cell are moved this fraction of a cell along the portal
+PORTAL_MARGIN = 0.5
+
+
+def _area2(a, b, c) -> float:
+    """Twice the signed area of triangle abc (positive when c is left of a->b in a y-up frame)."""
+    return (c[0] - a[0]) * (b[1] - a[1]) - (b[0] - a[0]) * (c[1] - a[1])
+
+
+def funnel(start, goal, portals) -> list:
+    """Shortest path from start to goal through portals, as a list of points.
+
+    portals are (left, right) point pairs in walking order, left and right as
+    seen walking from start to goal in a y-up frame (see NavMesh.oriented).
+    Start and goal are included.
+    """
+    # Start and goal act as zero-width portals
+    portals = [(start, start)] + list(portals) + [(goal, goal)]
+    points = [start]
+    apex = left = right = start
+    apex_i = left_i = right_i = 0
+    i = 1
+    while i < len(portals):
+        new_left, new_right = portals[i]
+        # Narrow the right side of the funnel
+        if _area2(apex, right, new_right) <= 0.0:
+            if apex == right or _area2(apex, left, new_right) > 0.0:
+                right, right_i = new_right, i
+            else:
+                # Right crossed over left: the left corner is on the path
+                points.append(left)
+                apex, apex_i = left, left_i
+                left = right = apex
+                left_i = right_i = apex_i
+                i = apex_i + 1
+                continue
+        # Narrow the left side of the funnel
+        if _area2(apex, left, new_left) >= 0.0:
+            if apex == left or _area2(apex, right, new_left) < 0.0:
+                left, left_i = new_left, i
+            else:
+                points.append(right)
+                apex, apex_i = right, right_i
+                left = right = apex
+                left_i = right_i = apex_i
+                i = apex_i + 1
+                continue
+        i += 1
+    if points[-1] != goal:
+        points.append(goal)
+    return points
+
+
+class NavMesh:
+    """Convex polygons covering the open cells of one nav grid, and the portals between them."""
+
+    def __init__(self, nav_grid, avoid_portals: bool = False, max_cells: int = MAX_POLYGON_CELLS):
+        self.nav_grid = nav_grid
+        self.avoid_portals = avoid_portals
+        self.version = nav_grid.version
+        cols, rows, cell = nav_grid.cols, nav_grid.rows, nav_grid.cell
+        self.open = open_cells = nav_grid.open_cells(avoid_portals)
+        # (x0, y0, x1, y1) inclusive cell bounds per polygon
+        self.polygons = []
+        # Polygon index per cell, -1 for closed cells
+        self.owner = owner = array("i", [-1]) * (cols * rows)
+        taken = bytearray(cols * rows)
+        for y in range(rows):
+            row = y * cols
+            x = 0
+            while x < cols:
+                i = row + x
+                if not open_cells[i] or taken[i]:
+                    x += 1
+                    continue
+                x1 = x
+                while x1 + 1 < cols and x1 + 1 - x < max_cells and open_cells[row + x1 + 1] and not taken[row + x1 + 1]:
+                    x1 += 1
+                width = x1 - x + 1
+                full, free = b"\x01" * width, bytes(width)
+                y1 = y
+                while y1 + 1 < rows and y1 + 1 - y < max_cells:
+                    below = (y1 + 1) * cols + x
+                    if open_cells[below:below + width] != full or taken[below:below + width] != free:
+                        break
+                    y1 += 1
+                index = len(self.polygons)
+                self.polygons.append((x, y, x1, y1))
+                ids = array("i", [index]) * width
+                for yy in range(y, y1 + 1):
+                    start = yy * cols + x
+                    taken[start:start + width] = full
+                    owner[start:start + width] = ids
+                x = x1 + 1
+
+        # Polygon center in world pixels
+        self.centers = [((x0 + x1 + 1) * cell / 2, (y0 + y1 + 1) * cell / 2) for x0, y0, x1, y1 in self.polygons]
+        # Per polygon: [(neighbour, portal end a, portal end b), ...] with ends in world pixels
+        self.links = [[] for _ in self.polygons]
+        for index, (x0, y0, x1, y1) in enumerate(self.polygons):
+            if x1 + 1 < cols:
+                self._link_side(index, [(x1 + 1, y) for y in range(y0, y1 + 1)], vertical=True)
+            if y1 + 1 < rows:
+                self._link_side(index, [(x, y1 + 1) for x in range(x0, x1 + 1)], vertical=False)
+
+    def _link_side(self, index: int, outside: list, vertical: bool) -> None:
+        """Link a polygon to the polygons owning the cells just past its right or bottom side."""
+        cols = self.nav_grid.cols
+        owners = [self.owner[cy * cols + cx] for cx, cy in outside] + [-1]
+        run_start = 0
+        for k in range(1, len(owners)):
+            if owners[k] == owners[run_start]:
+                continue
+            other = owners[run_start]
+            if other >= 0:
+                first, last = outside[run_start], outside[k - 1]
+                if vertical:
+                    a = self._portal_end(first[0], first[1], 0, 1)
+                    b = self._portal_end(first[0], last[1] + 1, 0, -1)
+                else:
+                    a = self._portal_end(first[0], first[1], 1, 0)
+                    b = self._portal_end(last[0] + 1, first[1], -1, 0)
+                self.links[index].append((other, a, b))
+                self.links[other].append((index, a, b))
+            run_start = k
+
+    def _portal_end(self, corner_x: int, corner_y: int, dx: int, dy: int) -> tuple:
+        """World position of a portal end at a cell corner, pulled by PORTAL_MARGIN along (dx, dy) next to a closed cell."""
+        cell = self.nav_grid.cell
+        if self._corner_is_clear(corner_x, corner_y):
+            return (corner_x * cell, corner_y * cell)
+        margin = PORTAL_MARGIN * cell
+        return (corner_x * cell + dx * margin, corner_y * cell + dy * margin)
+
+    def _corner_is_clear(self, corner_x: int, corner_y: int) -> bool:
+        """True if all four cells around a cell corner are open."""
+        cols, rows, open_cells = self.nav_grid.cols, self.nav_grid.rows, self.open
+        for cx in (corner_x - 1, corner_x):
+            for cy in (corner_y - 1, corner_y):
+                if not (0 <= cx < cols and 0 <= cy < rows) or not open_cells[cy * cols + cx]:
+                    return False
+        return True
+
+    def polygon_at(self, cell) -> int:
+        """Polygon containing a cell, or -1 if the cell is closed or out of bounds."""
+        cx, cy = cell
+        if not self.nav_grid.in_bounds(cx, cy):
+            return -1
+        return self.owner[cy * self.nav_grid.cols + cx]
+
+    def entry(self, cell):
+        """(polygon, portal into cell or None) for reaching a cell, or (-1, None).
+
+        An open cell is reached inside its own polygon. A closed cell (e.g. a
+        tight goal) is reached from an open cardinal neighbour, through the
+        cell edge they share.
+        """
+        polygon = self.polygon_at(cell)
+        if polygon >= 0:
+            return polygon, None
+        cx, cy = cell
+        cell_size = self.nav_grid.cell
+        for nx, ny in ((cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)):
+            polygon = self.polygon_at((nx, ny))
+            if polygon < 0:
+                continue
+            # Shared edge, shrunk towards its middle like portal ends at walls
+            ex, ey = max(cx, nx), max(cy, ny)
+            margin = PORTAL_MARGIN * cell_size / 2
+            if nx != cx:
+                edge = ((ex * cell_size, ey * cell_size + margin), (ex * cell_size, (ey + 1) * cell_size - margin))
+            else:
+                edge = ((ex * cell_size + margin, ey * cell_size), ((ex + 1) * cell_size - margin, ey * cell_size))
+            return polygon, edge
+        return -1, None
+
+    def oriented(self, a, b, from_point, to_point) -> tuple:
+        """Portal ends (a, b) as (left, right) seen walking from from_point towards to_point.
+
+        Sides are taken in a y-up frame, as funnel() expects; with screen
+        coordinates (y down) "left" is on the walker's right.
+        """
+        mid = ((a[0] + b[0]) / 2, (a[1] + b[1]) / 2)
+        dx, dy = to_point[0] - from_point[0], to_point[1] - from_point[1]
+        if dx * (a[1] - mid[1]) - dy * (a[0] - mid[0]) > 0:
+            return a, b
+        return b, a
+
+
+def get_navmesh(nav_grid, avoid_portals: bool = False) -> NavMesh:
+    """Get the up-to-date navmesh for a nav grid, building it on first use or after the grid changed."""
+    mesh = nav_grid.navmeshes.get(avoid_portals)
+    if mesh is None or mesh.version != nav_grid.version:
+        mesh = NavMesh(nav_grid, avoid_portals)
+        nav_grid.navmeshes[avoid_portals] = mesh
+    return mesh
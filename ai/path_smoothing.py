@@ -0,0 +1,135 @@
+"""Line-of-sight smoothing for grid paths.
+
+Grid searches return one waypoint per cell, so a diagonal trip comes out as a
+staircase of cell-sized steps. smooth_path drops every waypoint the walker can
+skip by heading straight for a later one. A straight segment counts as clear
+when every nav cell it passes through is open (supercover: both cells beside
+a corner it crosses must be open, as for diagonal steps) and every mask pixel
+along it has room for the NPC footprint. The pixel walk reads the mask's
+clearance raster and skips ahead as far as the clearance allows, so segments
+across open floor cost a few lookups.
+
+Segments into doorways and tight goal cells fail the footprint check, so the
+grid waypoints around them are kept.
+"""
+import math
+import threading
+
+# Waypoint totals shown in the debug overlay; paths are smoothed on the main thread and the path worker
+_stats = {"paths": 0, "waypoints_in": 0, "waypoints_out": 0}
+_stats_lock = threading.Lock()
+
+
+def get_smoothing_stats() -> dict:
+    """Return totals of paths smoothed and waypoints before and after."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _cells_clear(nav_grid, open_cells: bytes, a, b) -> bool:
+    """True if every cell the segment a-b touches is open; the cells holding a and b are not checked."""
+    cell, cols, rows = nav_grid.cell, nav_grid.cols, nav_grid.rows
+    x0, y0, x1, y1 = a[0] / cell, a[1] / cell, b[0] / cell, b[1] / cell
+    cx, cy = int(x0), int(y0)
+    ex, ey = int(x1), int(y1)
+    dx, dy = x1 - x0, y1 - y0
+    step_x = 1 if dx > 0 else -1
+    step_y = 1 if dy > 0 else -1
+    # Segment parameter t (0..1) at the next vertical / horizontal cell border
+    next_x = (cx + (dx > 0) - x0) / dx if dx else math.inf
+    next_y = (cy + (dy > 0) - y0) / dy if dy else math.inf
+    delta_x = abs(1 / dx) if dx else math.inf
+    delta_y = abs(1 / dy) if dy else math.inf
+
+    def closed(x, y):
+        if (x, y) == (ex, ey):
+            return False
+        return not (0 <= x < cols and 0 <= y < rows) or not open_cells[y * cols + x]
+
+    for _ in range(abs(ex - cx) + abs(ey - cy)):
+        if cx == ex and cy == ey:
+            break
+        if abs(next_x - next_y) < 1e-9:
+            # Through a cell corner: no corner cutting
+            if closed(cx + step_x, cy) or closed(cx, cy + step_y):
+                return False
+            cx += step_x
+            cy += step_y
+            next_x += delta_x
+            next_y += delta_y
+        elif next_x < next_y:
+            cx += step_x
+            next_x += delta_x
+        else:
+            cy += step_y
+            next_y += delta_y
+        if closed(cx, cy):
+            return False
+    return cx == ex and cy == ey
+
+
+def _footprint_clear(mask, a, b, radius: int) -> bool:
+    """True if every pixel on the segment a-b has more than radius clearance (see MaskCollisionSystem.has_clearance)."""
+    x0, y0 = a
+    steps = int(max(abs(b[0] - x0), abs(b[1] - y0)))
+    if steps == 0:
+        return True
+    sx, sy = (b[0] - x0) / steps, (b[1] - y0) / steps
+    clearance, width = mask.clearance, mask.width
+    i = 0
+    while i <= steps:
+        room = clearance[int(y0 + sy * i) * width + int(x0 + sx * i)]
+        if room <= radius:
+            return False
+        # Chessboard clearance drops by at most 1 per pixel step, so the next
+        # room - radius - 1 steps are clear too
+        i += max(1, room - radius - 1)
+    return True
+
+
+def line_of_sight(nav_grid, a, b, avoid_portals: bool = False) -> bool:
+    """True if an NPC can walk straight from world point a to world point b on this grid."""
+    return (_cells_clear(nav_grid, nav_grid.open_cells(avoid_portals), a, b)
+            and _footprint_clear(nav_grid.mask_system, a, b, nav_grid.clearance))
+
+
+def smooth_path(nav_grid, path: list, avoid_portals: bool = False) -> list:
+    """Drop the waypoints of path that can be skipped by walking straight.
+
+    The first and last waypoints are always kept. path is compacted in place
+    and returned.
+    """
+    count = len(path)
+    if count < 3:
+        return path
+
+    # Waypoints in the middle of a straight run never change the route
+    kept = 1
+    for i in range(1, count - 1):
+        ax, ay = path[kept - 1]
+        bx, by = path[i]
+        cx, cy = path[i + 1]
+        if (bx - ax) * (cy - by) != (by - ay) * (cx - bx):
+            path[kept] = path[i]
+            kept += 1
+    path[kept] = path[count - 1]
+    del path[kept + 1:]
+
+    # String pulling: from each kept waypoint, skip ahead while the next one is in sight
+    open_cells = nav_grid.open_cells(avoid_portals)
+    mask, radius = nav_grid.mask_system, nav_grid.clearance
+    anchor = path[0]
+    kept = 1
+    for i in range(1, len(path) - 1):
+        ahead = path[i + 1]
+        if _cells_clear(nav_grid, open_cells, anchor, ahead) and _footprint_clear(mask, anchor, ahead, radius):
+            continue
+        anchor = path[kept] = path[i]
+        kept += 1
+    path[kept] = path[-1]
+    del path[kept + 1:]
+    with _stats_lock:
+        _stats["paths"] += 1
+        _stats["waypoints_in"] += count
+        _stats["waypoints_out"] += len(path)
+    return path
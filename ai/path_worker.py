@@ -0,0 +1,168 @@
+"""Background path searches delivered a few per frame.
+
+NPCs hand their grid searches to the shared PathWorker instead of running them
+inside the frame. A daemon thread takes requests in order and searches with
+each request's own Pathfinding, and the game loop calls deliver() once per
+frame to hand finished paths back (at most DELIVERIES_PER_FRAME of them), so a
+long search towards an unreachable spot never stalls a frame by itself.
+
+Each request searches a snapshot of its nav grid (see NavGrid.snapshot)
+taken on the main thread, so the worker never holds a lock the frame could
+wait on. The snapshot's scan tables (and components and navmesh, for
+MODE_NAVMESH) are built when the snapshot is taken (see
+Pathfinding.prepare), so the worker only reads them. A request is cancelled
+when its NPC changes state or leaves the scene; a cancelled request is dropped
+wherever it is. A result whose snapshot is older than the live grid is
+searched again on a fresh snapshot.
+
+Without the thread (disabled, or it could not be started) deliver() runs at
+most SYNC_SEARCHES_PER_FRAME searches itself each frame.
+"""
+import threading
+from collections import deque
+
+# Finished requests handed back per deliver() call
+DELIVERIES_PER_FRAME = 4
+# Searches deliver() may run on the calling thread per call when there is no worker thread
+SYNC_SEARCHES_PER_FRAME = 2
+# Set to False to run every search in deliver()
+USE_WORKER_THREAD = True
+
+# Request counters shown in the debug overlay
+_stats = {"requests": 0, "delivered": 0, "cancelled": 0, "stale": 0, "sync": 0}
+
+_worker = None
+
+
+def get_path_worker_stats() -> dict:
+    """Return request totals, plus the number still queued or waiting for delivery."""
+    stats = dict(_stats)
+    stats["queued"] = _worker.queued() if _worker is not None else 0
+    return stats
+
+
+class PathRequest:
+    """One find_path call waiting for the worker; on_done(request) runs on the main thread with request.path set."""
+
+    __slots__ = ("pathfinder", "nav_grid", "start", "goal", "avoid_portals", "on_done", "version", "cancelled", "path")
+
+    def __init__(self, pathfinder, nav_grid, start: tuple, goal: tuple, avoid_portals: bool, on_done):
+        self.pathfinder = pathfinder
+        self.nav_grid = nav_grid.snapshot()
+        pathfinder.prepare(self.nav_grid, avoid_portals)
+        self.start = start
+        self.goal = goal
+        self.avoid_portals = avoid_portals
+        self.on_done = on_done
+        self.version = self.nav_grid.version
+        self.cancelled = False
+        self.path = None
+
+    def cancel(self) -> None:
+        """Drop the request; its callback will not run."""
+        if not self.cancelled:
+            self.cancelled = True
+            _stats["cancelled"] += 1
+
+    def refresh(self) -> None:
+        """Point the request at a fresh snapshot of its live grid (main thread only)."""
+        self.nav_grid = self.nav_grid.live.snapshot()
+        self.pathfinder.prepare(self.nav_grid, self.avoid_portals)
+        self.version = self.nav_grid.version
+
+    def run(self) -> None:
+        self.path = self.pathfinder.find_path(self.nav_grid, self.start, self.goal, avoid_portals=self.avoid_portals)
+
+
+class PathWorker:
+    """Queue of path requests served by one daemon thread."""
+
+    def __init__(self, use_thread: bool = USE_WORKER_THREAD):
+        self._pending = deque()
+        self._done = deque()
+        self._wakeup = threading.Condition()
+        self._thread = None
+        if use_thread:
+            try:
+                self._thread = threading.Thread(target=self._serve, name="path-worker", daemon=True)
+                self._thread.start()
+            except RuntimeError as e:
+                print(f"Warning: Could not start path worker thread ({e}); searching on the main thread")
+                self._thread = None
+
+    def submit(self, request: PathRequest) -> PathRequest:
+        """Queue a request; its result arrives through deliver() in a later frame."""
+        _stats["requests"] += 1
+        self._queue(request)
+        return request
+
+    def _queue(self, request: PathRequest) -> None:
+        with self._wakeup:
+            self._pending.append(request)
+            self._wakeup.notify()
+
+    def queued(self) -> int:
+        """Requests not yet delivered (cancelled ones included until they are dropped)."""
+        return len(self._pending) + len(self._done)
+
+    def _take(self):
+        """Oldest live pending request, or None."""
+        with self._wakeup:
+            while self._pending:
+                request = self._pending.popleft()
+                if not request.cancelled:
+                    return request
+        return None
+
+    def _serve(self) -> None:
+        while True:
+            with self._wakeup:
+                while not self._pending:
+                    self._wakeup.wait()
+            request = self._take()
+            if request is None:
+                continue
+            try:
+                request.run()
+            except Exception as e:
+                print(f"Warning: Path search failed: {e}")
+                request.path = []
+            self._done.append(request)
+
+    def deliver(self, max_results: int = DELIVERIES_PER_FRAME) -> int:
+        """Hand finished paths to their callbacks. Call once per frame from the game loop.
+
+        Returns the number of callbacks run.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            for _ in range(SYNC_SEARCHES_PER_FRAME):
+                request = self._take()
+                if request is None:
+                    break
+                _stats["sync"] += 1
+                request.run()
+                self._done.append(request)
+
+        delivered = 0
+        while self._done and delivered < max_results:
+            request = self._done.popleft()
+            if request.cancelled:
+                continue
+            if request.version != request.nav_grid.live.version:
+                # Props moved after the snapshot was taken: search again against the current grid
+                _stats["stale"] += 1
+                request.refresh()
+                self._queue(request)
+                continue
+            _stats["delivered"] += 1
+            delivered += 1
+            request.on_done(request)
+        return delivered
+
+
+def get_path_worker() -> PathWorker:
+    """Get the shared path worker, starting it on first use."""
+    global _worker
+    if _worker is None:
+        _worker = PathWorker()
+    return _worker
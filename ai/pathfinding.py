@@ -1,20 +1,199 @@
 import heapq
+import math
+import threading
+from collections import OrderedDict
+from ai.nav_grid import line_tables
+from ai.navmesh import get_navmesh, funnel
+from ai.path_smoothing import smooth_path
+
+# Cost of a diagonal step (cardinal steps cost 1)
+DIAGONAL_COST = math.sqrt(2)
+# Default cap on node expansions per search; an unreachable goal stops here
+# instead of flooding the whole grid
+DEFAULT_MAX_EXPANSIONS = 4000
+
+# Search modes selectable on Pathfinding
+MODE_ASTAR = "astar"
+MODE_JPS = "jps"  # Jump Point Search: same optimal cost, far fewer expansions in open areas
+MODE_NAVMESH = "navmesh"  # A* over navmesh polygons, funnel-smoothed into any-angle paths
+
+# Most recent find_path results kept in the path cache
+PATH_CACHE_SIZE = 256
+
+# Search counters shown in the debug overlay; both the main thread and the path worker search
+_stats = {"searches": 0, "expansions": 0, "partial": 0, "failed": 0}
+_stats_lock = threading.Lock()
+
+# (scene, cell size, clearance, grid version, mode, smooth, avoid_portals, budget, start cell, goal cell)
+#   -> (path, partial); least recently used first
+_path_cache = OrderedDict()
+_cache_stats = {"hits": 0, "misses": 0}
+# Held only while the cache itself is read or written (searches run outside it)
+_cache_lock = threading.Lock()
+
+
+def _open_cell_fn(nav_grid, goal_c, avoid_portals: bool):
+    """Return is_open(cx, cy) for a search towards goal_c (the goal may be a tight cell)."""
+    cols, rows = nav_grid.cols, nav_grid.rows
+    cells = nav_grid.cells
+    prop_blocks = nav_grid.prop_blocks
+    passable = nav_grid.passable_table(avoid_portals)
+    goal_passable = nav_grid.passable_table(avoid_portals, allow_tight=True)
+
+    def is_open(nx, ny):
+        if not (0 <= nx < cols and 0 <= ny < rows):
+            return False
+        i = ny * cols + nx
+        if prop_blocks[i]:
+            return False
+        table = goal_passable if (nx, ny) == goal_c else passable
+        return table[cells[i]] == 1
+
+    return is_open
+
+
+def may_connect(nav_grid, start_c, goal_c, avoid_portals: bool = False) -> bool:
+    """False if no walk links start_c and goal_c (each may itself be a closed cell, like in astar())."""
+    labels = nav_grid.components(avoid_portals)
+    cols = nav_grid.cols
+
+    def touching(c):
+        # A closed cell still connects to the components of its open cardinal neighbours
+        x, y = c
+        if not nav_grid.in_bounds(x, y):
+            return set()
+        if labels[y * cols + x]:
+            return {labels[y * cols + x]}
+        return {labels[ny * cols + nx] for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1))
+                if nav_grid.in_bounds(nx, ny) and labels[ny * cols + nx]}
+
+    return bool(touching(start_c) & touching(goal_c))
+
+
+def get_pathfinding_stats() -> dict:
+    """Return totals of searches, node expansions, partial and failed searches."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(key: str, amount: int = 1) -> None:
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def get_path_cache_stats() -> dict:
+    """Return path cache hit/miss counters and the number of cached paths."""
+    return {"hits": _cache_stats["hits"], "misses": _cache_stats["misses"], "entries": len(_path_cache)}
+
+
+def clear_path_cache() -> None:
+    """Drop all cached paths."""
+    with _cache_lock:
+        _path_cache.clear()
+
 
 class Pathfinding:
-    def __init__(self, cell_size: int = 20):
+    def __init__(self, cell_size: int = 20, max_expansions: int = DEFAULT_MAX_EXPANSIONS, mode: str = MODE_ASTAR,
+                 smooth: bool = False):
         self.cell = cell_size
+        self.max_expansions = max_expansions
+        self.mode = mode
+        # Drop waypoints that can be skipped by walking straight (see ai.path_smoothing)
+        self.smooth = smooth
+        # Results of the most recent search
+        self.last_expansions = 0
+        self.last_partial = False
 
     def _heuristic(self, a, b):
-        return abs(a[0]-b[0]) + abs(a[1]-b[1])
+        """Octile distance: exact cost on an empty 8-connected grid, so it never overestimates."""
+        dx = abs(a[0]-b[0])
+        dy = abs(a[1]-b[1])
+        return (dx + dy) + (DIAGONAL_COST - 2) * min(dx, dy)
 
-    def astar(self, walkable_fn, start, goal, bounds):
+    def prepare(self, nav_grid, avoid_portals: bool = False) -> None:
+        """Build the derived tables a search in this mode reads from nav_grid (a snapshot).
+
+        Call on the main thread before handing the snapshot to another thread:
+        the search then only reads the snapshot's scan tables, components and
+        navmesh and never fills them in.
         """
-        A* over a grid. walkable_fn(x, y) -> bool for center of NPC hitbox.
-        start, goal are world coords (pixels). bounds=(w,h).
-        Returns list of world positions (pixels) for centers to follow.
+        nav_grid.jump_tables(avoid_portals)
+        if self.mode == MODE_NAVMESH:
+            nav_grid.components(avoid_portals)
+            get_navmesh(nav_grid, avoid_portals)
+
+    def find_path(self, nav_grid, start, goal, avoid_portals: bool = False, max_expansions: int = None):
+        """Search with the configured mode (MODE_ASTAR, MODE_JPS or MODE_NAVMESH). See astar() for arguments and results.
+
+        Results are cached per nav grid version and start/goal cell (see
+        PATH_CACHE_SIZE); a hit returns a copy of the cached path without
+        searching and sets self.last_expansions to 0. With self.smooth, grid
+        paths come back string-pulled (navmesh paths already are).
+
+        The search runs on nav_grid.snapshot(), so a live grid may keep
+        changing on the main thread while a snapshot is searched elsewhere.
         """
-        cell = self.cell
-        w, h = bounds
+        nav_grid = nav_grid.snapshot()
+        path = self.lookup(nav_grid, start, goal, avoid_portals, max_expansions)
+        if path is not None:
+            return path
+        with _cache_lock:
+            _cache_stats["misses"] += 1
+        path = self._search(nav_grid, start, goal, avoid_portals, max_expansions)
+        if self.smooth and self.mode != MODE_NAVMESH:
+            smooth_path(nav_grid, path, avoid_portals)
+        with _cache_lock:
+            _path_cache[self._cache_key(nav_grid, start, goal, avoid_portals, max_expansions)] = (
+                tuple(path), self.last_partial)
+            if len(_path_cache) > PATH_CACHE_SIZE:
+                _path_cache.popitem(last=False)
+        return path
+
+    def lookup(self, nav_grid, start, goal, avoid_portals: bool = False, max_expansions: int = None):
+        """find_path() result from the path cache, or None on a miss (nothing is searched)."""
+        key = self._cache_key(nav_grid, start, goal, avoid_portals, max_expansions)
+        with _cache_lock:
+            cached = _path_cache.get(key)
+            if cached is None:
+                return None
+            _cache_stats["hits"] += 1
+            _path_cache.move_to_end(key)
+        path, self.last_partial = cached
+        self.last_expansions = 0
+        return list(path)
+
+    def _cache_key(self, nav_grid, start, goal, avoid_portals: bool, max_expansions: int) -> tuple:
+        cell = nav_grid.cell
+        return (nav_grid.scene_name, cell, nav_grid.clearance, nav_grid.version, self.mode, self.smooth, avoid_portals,
+                self.max_expansions if max_expansions is None else max_expansions,
+                int(start[0] // cell), int(start[1] // cell), int(goal[0] // cell), int(goal[1] // cell))
+
+    def _search(self, nav_grid, start, goal, avoid_portals: bool, max_expansions: int):
+        """Run the configured search mode, bypassing the path cache."""
+        if self.mode == MODE_NAVMESH:
+            return self.navmesh(nav_grid, start, goal, avoid_portals, max_expansions)
+        if self.mode == MODE_JPS:
+            return self.jps(nav_grid, start, goal, avoid_portals, max_expansions)
+        return self.astar(nav_grid, start, goal, avoid_portals, max_expansions)
+
+    def astar(self, nav_grid, start, goal, avoid_portals: bool = False, max_expansions: int = None):
+        """
+        A* over a NavGrid (see ai.nav_grid). Reads the grid's packed cell bytes
+        directly; the goal cell may also be a tight (near-wall) cell.
+        start, goal are world coords (pixels).
+
+        Diagonal steps are only taken when both adjacent cardinal cells are open
+        (no corner cutting). Ties on f are broken towards the goal (lower h),
+        then by cell coordinates, so equal inputs always give the same path.
+        If more than max_expansions nodes are expanded, the search stops and
+        returns a partial path to the expanded cell closest to the goal
+        (self.last_partial is set). self.last_expansions holds the node count.
+
+        Returns list of world positions (pixels) for centers to follow, or []
+        if the goal cannot be reached at all.
+        """
+        cell = nav_grid.cell
+        budget = self.max_expansions if max_expansions is None else max_expansions
 
         def to_cell(p):
             return (int(p[0]//cell), int(p[1]//cell))
@@ -23,38 +202,379 @@ class Pathfinding:
 
         start_c = to_cell(start)
         goal_c = to_cell(goal)
+        is_open = _open_cell_fn(nav_grid, goal_c, avoid_portals)
 
-        open_set = []
-        heapq.heappush(open_set, (0, start_c))
+        def neighbors(c):
+            x, y = c
+            right, left = is_open(x + 1, y), is_open(x - 1, y)
+            down, up = is_open(x, y + 1), is_open(x, y - 1)
+            if right:
+                yield (x + 1, y), 1.0
+            if left:
+                yield (x - 1, y), 1.0
+            if down:
+                yield (x, y + 1), 1.0
+            if up:
+                yield (x, y - 1), 1.0
+            # No corner cutting: both cardinal cells beside a diagonal must be open
+            if right and down and is_open(x + 1, y + 1):
+                yield (x + 1, y + 1), DIAGONAL_COST
+            if right and up and is_open(x + 1, y - 1):
+                yield (x + 1, y - 1), DIAGONAL_COST
+            if left and down and is_open(x - 1, y + 1):
+                yield (x - 1, y + 1), DIAGONAL_COST
+            if left and up and is_open(x - 1, y - 1):
+                yield (x - 1, y - 1), DIAGONAL_COST
+
+        def reconstruct(current):
+            path = [current]
+            while current in came_from:
+                current = came_from[current]
+                path.append(current)
+            path.reverse()
+            return [to_world(c) for c in path]
+
+        start_h = self._heuristic(start_c, goal_c)
+        # Heap entries: (f, h, cell) - lower h then cell order breaks f ties deterministically
+        open_set = [(start_h, start_h, start_c)]
         came_from = {}
         gscore = {start_c: 0}
+        closed = set()
+        best_c, best_h = start_c, start_h
+        expansions = 0
 
-        def neighbors(c):
-            # 8-direction movement: cardinals + diagonals
-            for dx, dy in ((1,0),(-1,0),(0,1),(0,-1),(1,1),(1,-1),(-1,1),(-1,-1)):
-                nx, ny = c[0]+dx, c[1]+dy
-                wx, wy = to_world((nx, ny))
-                if 0 <= wx < w and 0 <= wy < h and walkable_fn(wx, wy):
-                    yield (nx, ny)
-
+        _count("searches")
+        self.last_partial = False
         while open_set:
-            _, current = heapq.heappop(open_set)
+            _, h, current = heapq.heappop(open_set)
+            if current in closed:
+                continue  # Stale entry for a cell already expanded via a cheaper route
             if current == goal_c:
-                # reconstruct
-                path = [current]
-                while current in came_from:
-                    current = came_from[current]
-                    path.append(current)
-                path.reverse()
-                return [to_world(c) for c in path]
-            for nb in neighbors(current):
-                # Diagonal moves cost more (sqrt(2) ≈ 1.414)
-                is_diagonal = (nb[0] != current[0]) and (nb[1] != current[1])
-                move_cost = 1.414 if is_diagonal else 1.0
-                tentative = gscore[current] + move_cost
-                if nb not in gscore or tentative < gscore[nb]:
+                self._finish(expansions)
+                return reconstruct(current)
+            if expansions >= budget:
+                # Budget exhausted: head for the closest cell found so far
+                self.last_partial = True
+                _count("partial")
+                self._finish(expansions)
+                return reconstruct(best_c)
+            closed.add(current)
+            expansions += 1
+            if h < best_h:
+                best_c, best_h = current, h
+            g = gscore[current]
+            for nb, move_cost in neighbors(current):
+                if nb in closed:
+                    continue
+                tentative = g + move_cost
+                if tentative < gscore.get(nb, math.inf):
                     came_from[nb] = current
                     gscore[nb] = tentative
-                    f = tentative + self._heuristic(nb, goal_c)
-                    heapq.heappush(open_set, (f, nb))
+                    nb_h = self._heuristic(nb, goal_c)
+                    heapq.heappush(open_set, (tentative + nb_h, nb_h, nb))
+        _count("failed")
+        self._finish(expansions)
         return []
+
+    def jps(self, nav_grid, start, goal, avoid_portals: bool = False, max_expansions: int = None):
+        """
+        Jump Point Search over a NavGrid, with the same movement rules, costs,
+        budget and results as astar() (paths have the same optimal cost).
+
+        Straight and diagonal runs are scanned without queueing the cells along
+        them; only jump points (cells with forced neighbours, or the goal) are
+        pushed, so the expansion count is the number of jump points expanded.
+        The returned path lists every cell, like astar().
+        """
+        cell = nav_grid.cell
+        budget = self.max_expansions if max_expansions is None else max_expansions
+
+        def to_cell(p):
+            return (int(p[0]//cell), int(p[1]//cell))
+        def to_world(c):
+            return (c[0]*cell + cell//2, c[1]*cell + cell//2)
+
+        start_c = to_cell(start)
+        goal_c = to_cell(goal)
+        gx, gy = goal_c
+        cols, rows = nav_grid.cols, nav_grid.rows
+        _, open_cells, row_tables, col_tables = nav_grid.jump_tables(avoid_portals)
+        if _open_cell_fn(nav_grid, goal_c, avoid_portals)(gx, gy) and not open_cells[gy * cols + gx]:
+            # Goal is a tight cell: open it for this search only
+            goal_i = gy * cols + gx
+            open_cells = open_cells[:goal_i] + b"\x01" + open_cells[goal_i + 1:]
+            row_tables = list(row_tables)
+            col_tables = list(col_tables)
+            row_tables[gy] = line_tables(open_cells[gy * cols:(gy + 1) * cols])
+            col_tables[gx] = line_tables(open_cells[gx::cols])
+
+        def is_open(x, y):
+            return 0 <= x < cols and 0 <= y < rows and open_cells[y * cols + x] == 1
+
+        def scan(tables, line, pos, step, size, goal_line, goal_pos):
+            """Straight scan along one row/column: return the first jump position or -1.
+
+            Stops at the goal or at a forced neighbour (an open cell beside the line
+            whose predecessor is closed); returns -1 on reaching a closed cell.
+            """
+            if not 0 <= pos < size:
+                return -1
+            blocked = tables[line][0]
+            if step > 0:
+                end = blocked.find(1, pos)
+                if end == -1:
+                    end = size
+                best = end
+                for side in (line - 1, line + 1):
+                    if 0 <= side < len(tables):
+                        hit = tables[side][1].find(1, pos, best)
+                        if hit != -1:
+                            best = hit
+                if goal_line == line and pos <= goal_pos < best:
+                    best = goal_pos
+                return best if best < end else -1
+            start = blocked.rfind(1, 0, pos + 1)
+            best = start
+            for side in (line - 1, line + 1):
+                if 0 <= side < len(tables):
+                    hit = tables[side][2].rfind(1, best + 1, pos + 1)
+                    if hit != -1:
+                        best = hit
+            if goal_line == line and best < goal_pos <= pos:
+                best = goal_pos
+            return best if best > start else -1
+
+        def jump(x, y, dx, dy):
+            """Scan from (x, y) in direction (dx, dy); return the first jump point or None."""
+            if not dy:
+                hit = scan(row_tables, y, x, dx, cols, gy, gx)
+                return (hit, y) if hit != -1 else None
+            if not dx:
+                hit = scan(col_tables, x, y, dy, rows, gx, gy)
+                return (x, hit) if hit != -1 else None
+            while True:
+                if not is_open(x, y):
+                    return None
+                if x == gx and y == gy:
+                    return (x, y)
+                # A diagonal run stops where a straight run off it finds a jump point
+                if scan(row_tables, y, x + dx, dx, cols, gy, gx) != -1 or scan(col_tables, x, y + dy, dy, rows, gx, gy) != -1:
+                    return (x, y)
+                # No corner cutting: the next diagonal step needs both cardinals open
+                if not (is_open(x + dx, y) and is_open(x, y + dy)):
+                    return None
+                x += dx
+                y += dy
+
+        def directions(c):
+            """Pruned search directions at c, given the direction it was reached from."""
+            x, y = c
+            parent = came_from.get(c)
+            if parent is None:
+                right, left = is_open(x + 1, y), is_open(x - 1, y)
+                down, up = is_open(x, y + 1), is_open(x, y - 1)
+                dirs = [d for d, ok in (((1, 0), right), ((-1, 0), left), ((0, 1), down), ((0, -1), up)) if ok]
+                for dx, dy, ok in ((1, 1, right and down), (1, -1, right and up),
+                                   (-1, 1, left and down), (-1, -1, left and up)):
+                    if ok and is_open(x + dx, y + dy):
+                        dirs.append((dx, dy))
+                return dirs
+            dx = (x > parent[0]) - (x < parent[0])
+            dy = (y > parent[1]) - (y < parent[1])
+            dirs = []
+            if dx and dy:
+                horizontal, vertical = is_open(x + dx, y), is_open(x, y + dy)
+                if vertical:
+                    dirs.append((0, dy))
+                if horizontal:
+                    dirs.append((dx, 0))
+                if horizontal and vertical:
+                    dirs.append((dx, dy))
+            elif dx:
+                ahead = is_open(x + dx, y)
+                below, above = is_open(x, y + 1), is_open(x, y - 1)
+                if ahead:
+                    dirs.append((dx, 0))
+                    if below and is_open(x + dx, y + 1):
+                        dirs.append((dx, 1))
+                    if above and is_open(x + dx, y - 1):
+                        dirs.append((dx, -1))
+                if below:
+                    dirs.append((0, 1))
+                if above:
+                    dirs.append((0, -1))
+            else:
+                ahead = is_open(x, y + dy)
+                right, left = is_open(x + 1, y), is_open(x - 1, y)
+                if ahead:
+                    dirs.append((0, dy))
+                    if right and is_open(x + 1, y + dy):
+                        dirs.append((1, dy))
+                    if left and is_open(x - 1, y + dy):
+                        dirs.append((-1, dy))
+                if right:
+                    dirs.append((1, 0))
+                if left:
+                    dirs.append((-1, 0))
+            return dirs
+
+        def reconstruct(current):
+            jump_points = [current]
+            while current in came_from:
+                current = came_from[current]
+                jump_points.append(current)
+            jump_points.reverse()
+            # Fill in the straight/diagonal runs between jump points
+            path = [jump_points[0]]
+            for (x1, y1) in jump_points[1:]:
+                x0, y0 = path[-1]
+                sx = (x1 > x0) - (x1 < x0)
+                sy = (y1 > y0) - (y1 < y0)
+                while (x0, y0) != (x1, y1):
+                    x0 += sx
+                    y0 += sy
+                    path.append((x0, y0))
+            return [to_world(c) for c in path]
+
+        start_h = self._heuristic(start_c, goal_c)
+        # Heap entries: (f, h, cell) - lower h then cell order breaks f ties deterministically
+        open_set = [(start_h, start_h, start_c)]
+        came_from = {}
+        gscore = {start_c: 0}
+        closed = set()
+        best_c, best_h = start_c, start_h
+        expansions = 0
+
+        _count("searches")
+        self.last_partial = False
+        while open_set:
+            _, h, current = heapq.heappop(open_set)
+            if current in closed:
+                continue  # Stale entry for a jump point already expanded via a cheaper route
+            if current == goal_c:
+                self._finish(expansions)
+                return reconstruct(current)
+            if expansions >= budget:
+                # Budget exhausted: head for the closest jump point found so far
+                self.last_partial = True
+                _count("partial")
+                self._finish(expansions)
+                return reconstruct(best_c)
+            closed.add(current)
+            expansions += 1
+            if h < best_h:
+                best_c, best_h = current, h
+            g = gscore[current]
+            for dx, dy in directions(current):
+                point = jump(current[0] + dx, current[1] + dy, dx, dy)
+                if point is None or point in closed:
+                    continue
+                # Runs are straight or diagonal, so the octile distance is the exact cost
+                tentative = g + self._heuristic(current, point)
+                if tentative < gscore.get(point, math.inf):
+                    came_from[point] = current
+                    gscore[point] = tentative
+                    point_h = self._heuristic(point, goal_c)
+                    heapq.heappush(open_set, (tentative + point_h, point_h, point))
+        _count("failed")
+        self._finish(expansions)
+        return []
+
+    def navmesh(self, nav_grid, start, goal, avoid_portals: bool = False, max_expansions: int = None):
+        """
+        A* over the polygons of the nav grid's navmesh (see ai.navmesh), with
+        the corridor found pulled tight by the funnel algorithm.
+
+        Each portal is crossed at its point closest to where the search
+        entered the polygon before it, so costs are close to but not always
+        optimal. The path runs from the exact start
+        to the exact goal position with one waypoint per corner turned, not
+        one per cell. Like astar(), the goal may be a tight cell, the budget
+        counts polygons expanded and running out gives a partial path (to the
+        center of the polygon closest to the goal).
+        """
+        cell = nav_grid.cell
+        budget = self.max_expansions if max_expansions is None else max_expansions
+        start_c = (int(start[0] // cell), int(start[1] // cell))
+        goal_c = (int(goal[0] // cell), int(goal[1] // cell))
+        mesh = get_navmesh(nav_grid, avoid_portals)
+        start_poly, start_edge = mesh.entry(start_c)
+        goal_poly, goal_edge = mesh.entry(goal_c)
+        _count("searches")
+        self.last_partial = False
+        goal_usable = nav_grid.in_bounds(*goal_c) and _open_cell_fn(nav_grid, goal_c, avoid_portals)(*goal_c)
+        if start_poly < 0 or goal_poly < 0 or not goal_usable or not may_connect(nav_grid, start_c, goal_c, avoid_portals):
+            _count("failed")
+            self._finish(0)
+            return []
+
+        def distance(a, b):
+            return math.hypot(a[0] - b[0], a[1] - b[1])
+
+        start_h = distance(start, goal)
+        open_set = [(start_h, start_h, start_poly)]
+        # Where the path enters each polygon, and (previous polygon, portal end a, portal end b)
+        entered = {start_poly: start}
+        came_from = {}
+        gscore = {start_poly: 0.0}
+        closed = set()
+        best, best_h = start_poly, start_h
+        expansions = 0
+        end = None
+        while open_set:
+            _, h, current = heapq.heappop(open_set)
+            if current in closed:
+                continue
+            if current == goal_poly:
+                end = current
+                break
+            if expansions >= budget:
+                self.last_partial = True
+                _count("partial")
+                end = best
+                break
+            closed.add(current)
+            expansions += 1
+            if h < best_h:
+                best, best_h = current, h
+            here, g = entered[current], gscore[current]
+            for nb, a, b in mesh.links[current]:
+                if nb in closed:
+                    continue
+                # Cross at the point of the portal closest to where this polygon was entered
+                ax, ay = a
+                vx, vy = b[0] - ax, b[1] - ay
+                t = ((here[0] - ax) * vx + (here[1] - ay) * vy) / ((vx * vx + vy * vy) or 1.0)
+                t = min(1.0, max(0.0, t))
+                crossing = (ax + vx * t, ay + vy * t)
+                tentative = g + distance(here, crossing)
+                if tentative < gscore.get(nb, math.inf):
+                    gscore[nb] = tentative
+                    entered[nb] = crossing
+                    came_from[nb] = (current, a, b)
+                    nb_h = distance(crossing, goal)
+                    heapq.heappush(open_set, (tentative + nb_h, nb_h, nb))
+        self._finish(expansions)
+        if end is None:
+            _count("failed")
+            return []
+
+        # Portals from the goal polygon back to the start polygon, turned into walking order
+        centers = mesh.centers
+        portals = []
+        current = end
+        while current in came_from:
+            previous, a, b = came_from[current]
+            portals.append(mesh.oriented(a, b, centers[previous], centers[current]))
+            current = previous
+        portals.reverse()
+        if start_edge is not None:
+            portals.insert(0, mesh.oriented(*start_edge, start, centers[start_poly]))
+        target = centers[end] if self.last_partial else goal
+        if goal_edge is not None and not self.last_partial:
+            portals.append(mesh.oriented(*goal_edge, centers[goal_poly], goal))
+        return funnel(start, target, portals)
+
+    def _finish(self, expansions: int) -> None:
+        self.last_expansions = expansions
+        _count("expansions", expansions)
@@ -0,0 +1,94 @@
+"""Taking turns at portals.
+
+NPC paths ignore each other, so NPCs heading for the same portal arrive
+together, crowd its last waypoint, trip stuck detection and repath over and
+over. Instead, an NPC within PORTAL_QUEUE_RADIUS of the portal it is walking
+to joins that portal's queue and asks for its place in line every frame. The
+head walks on into the portal; the others stop QUEUE_SPACING apart per place
+and wait, which stuck detection does not count against them.
+
+A place is given up when the NPC goes through the portal. Entries an NPC
+stops renewing (it changed plans or left the visible scene) expire after
+ENTRY_TTL seconds, and a head that holds the portal longer than
+MAX_HOLD_TIME goes to the back of the line, so a lost NPC never blocks the
+doorway. The queue clock is advanced once per frame by update_portal_queues.
+"""
+
+# Distance (unscaled px) from a portal's center at which NPCs join its queue
+PORTAL_QUEUE_RADIUS = 60
+# Gap (unscaled px) between waiting NPCs; place n waits n gaps from the portal center
+QUEUE_SPACING = 20
+# Seconds an entry lives without being renewed
+ENTRY_TTL = 0.5
+# Seconds the head may hold a portal before it is sent to the back
+MAX_HOLD_TIME = 3.0
+
+# Queue counters shown in the debug overlay
+_stats = {"joins": 0, "released": 0, "expired": 0, "bumped": 0}
+
+# (scene_name, portal_id) -> [[npc_id, last renewed], ...], head first
+_queues = {}
+# (scene_name, portal_id) -> clock time the current head got its turn
+_head_since = {}
+_clock = 0.0
+
+
+def get_portal_queue_stats() -> dict:
+    """Return queue totals, plus the number of NPCs currently waiting behind a head."""
+    stats = dict(_stats)
+    stats["waiting"] = sum(max(0, len(queue) - 1) for queue in _queues.values())
+    return stats
+
+
+def update_portal_queues(dt: float) -> None:
+    """Advance the queue clock, dropping stale entries and heads that held on too long. Call once per frame."""
+    global _clock
+    _clock += dt
+    for key in list(_queues):
+        queue = _queues[key]
+        head = queue[0][0]
+        kept = [entry for entry in queue if _clock - entry[1] <= ENTRY_TTL]
+        _stats["expired"] += len(queue) - len(kept)
+        if len(kept) > 1 and kept[0][0] == head and _clock - _head_since[key] > MAX_HOLD_TIME:
+            kept.append(kept.pop(0))
+            _stats["bumped"] += 1
+        _set_queue(key, kept, head)
+
+
+def _set_queue(key, queue: list, old_head) -> None:
+    if not queue:
+        _queues.pop(key, None)
+        _head_since.pop(key, None)
+        return
+    _queues[key] = queue
+    if queue[0][0] != old_head:
+        _head_since[key] = _clock
+
+
+def request_portal_turn(scene_name: str, portal_id: int, npc_id) -> int:
+    """Join or renew npc_id's place in a portal's queue; returns the place, 0 meaning it may go through."""
+    key = (scene_name, portal_id)
+    queue = _queues.get(key)
+    if queue is None:
+        queue = _queues[key] = []
+        _head_since[key] = _clock
+    for place, entry in enumerate(queue):
+        if entry[0] == npc_id:
+            entry[1] = _clock
+            return place
+    queue.append([npc_id, _clock])
+    _stats["joins"] += 1
+    return len(queue) - 1
+
+
+def release_portal_turn(scene_name: str, portal_id: int, npc_id) -> None:
+    """Give up npc_id's place in a portal's queue (e.g. once it went through)."""
+    key = (scene_name, portal_id)
+    queue = _queues.get(key)
+    if not queue:
+        return
+    kept = [entry for entry in queue if entry[0] != npc_id]
+    if len(kept) != len(queue):
+        _stats["released"] += 1
+        _set_queue(key, kept, queue[0][0])
+
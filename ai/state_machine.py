@@ -1,5 +1,6 @@
 import random
 import math
+from ai.wander_index import get_wander_index
 
 # State name constants
 STATE_IDLE = "IdleState"
@@ -18,8 +19,7 @@ DEFAULT_MAX_TRAVEL_TIME = 30.0
 DEFAULT_NPC_SPEED = 100.0
 
 # Wander constants
-WANDER_MAX_ATTEMPTS = 20
-TWO_PI = 2 * math.pi
+WANDER_OPEN_CLEARANCE = 20  # Preferred distance (unscaled px) from walls for wander targets
 TRAVEL_PROBABILITY_MULT = 0.2  # Boost for mid-travel idle
 
 class State:
@@ -49,6 +49,11 @@ class State:
         """Get the name of this state."""
         return self.__class__.__name__
 
+    def _npc_waiting_for_path(self) -> bool:
+        """Check if the NPC's path is still being searched in the background."""
+        has_pending_path = getattr(self.npc, 'has_pending_path', None)
+        return bool(has_pending_path and has_pending_path())
+
 
 class IdleState(State):
     """NPC stands still for a duration."""
@@ -103,12 +108,14 @@ class WanderState(State):
         # Get feet position as reference point for wander calculations
         feet_x, feet_y = self.npc._get_feet_position()
         
+        npc_name = getattr(self.npc, 'npc_id', '?')
+        scene_name = getattr(getattr(self.npc, 'scene', None), 'scene_name', None)
+        
         # If off-screen, use precached mask for destination validation
         if not mask_system:
             from world.mask_cache import get_mask_for_scene
             from world.world_registry import get_npc_location
             
-            npc_name = getattr(self.npc, 'npc_id', '?')
             scene_name = get_npc_location(npc_name)
             
             mask_system = get_mask_for_scene(scene_name)
@@ -117,49 +124,13 @@ class WanderState(State):
                 self.npc.path = []
                 return
         
-        npc_name = getattr(self.npc, 'npc_id', '?')
-        
-        target_x = None
-        target_y = None
-        
-        for attempt in range(WANDER_MAX_ATTEMPTS):
-            # Pick a random point near current position
-            angle = random.uniform(0, TWO_PI)
-            distance = random.uniform(self.wander_min_distance, self.wander_radius)
-            test_x = feet_x + distance * math.cos(angle)
-            test_y = feet_y + distance * math.sin(angle)
-            
-            # Check if this point is walkable
-            is_walkable = mask_system.is_walkable(int(test_x), int(test_y))
-            if not is_walkable:
-                continue
-            
-            # Check if point is in or too close to a portal
-            is_too_close_to_portal = False
-            
-            # Check if directly in a portal
-            if mask_system.is_portal(int(test_x), int(test_y)) is not None:
-                continue
-            
-            # Check distance to all portal regions
-            for portal_id in mask_system.portal_regions:
-                portal_bounds = mask_system.get_portal_bounds(portal_id)
-                if portal_bounds:
-                    # Calculate distance to closest point in portal bounds
-                    portal_center_x = (portal_bounds.left + portal_bounds.right) / 2
-                    portal_center_y = (portal_bounds.top + portal_bounds.bottom) / 2
-                    dist_to_portal = math.sqrt((test_x - portal_center_x)**2 + (test_y - portal_center_y)**2)
-                    
-                    if dist_to_portal < self.portal_min_distance:
-                        is_too_close_to_portal = True
-                        break
-            
-            if is_too_close_to_portal:
-                continue
-            
-            # This point is valid - not in portal and not too close
-            target_x, target_y = test_x, test_y
-            break
+        # Prefer open floor; fall back to a point near a wall
+        open_clearance = max(1, int(WANDER_OPEN_CLEARANCE * getattr(self.npc, 'scene_scale', 1.0)))
+        index = get_wander_index(scene_name, mask_system, self.portal_min_distance, open_clearance)
+        target = index.sample(feet_x, feet_y, self.wander_min_distance, self.wander_radius)
+        if target is None:
+            target = index.sample(feet_x, feet_y, self.wander_min_distance, self.wander_radius, open_only=False)
+        target_x, target_y = target if target is not None else (None, None)
         
         # Store target and set up movement
         self.target_x = target_x
@@ -178,7 +149,7 @@ class WanderState(State):
         else:
             # No valid point found
             npc_name = getattr(self.npc, 'npc_id', '?')
-            print(f"    [WanderState] {npc_name}: No valid wander target found after {WANDER_MAX_ATTEMPTS} attempts")
+            print(f"    [WanderState] {npc_name}: No valid wander target within {self.wander_radius:.0f}px")
             self.npc.path = []
             self.warp_time = 0.0
     
@@ -204,9 +175,9 @@ class WanderState(State):
                 return True
             return False
         else:
-            # On-screen pathfinding: check if path is finished
+            # On-screen pathfinding: check if path is finished (or not yet found)
             has_path = self.npc.path and self.npc.current_waypoint_idx < len(self.npc.path)
-            return not has_path
+            return not has_path and not self._npc_waiting_for_path()
 
 
 class TravelToSceneState(State):
@@ -216,9 +187,12 @@ class TravelToSceneState(State):
         # Get config from NPC, fallback to constant
         config = getattr(npc, 'config', None)
         self.max_travel_time = config.max_travel_time if config else DEFAULT_MAX_TRAVEL_TIME
+        # Off-screen: estimated walking time of the trip (the NPC hops scenes at once)
+        self.arrival_time = None
     
     def enter(self):
         super().enter()
+        self.arrival_time = None
         npc_name = getattr(self.npc, 'npc_id', '?')
         
         # Determine current scene using registry
@@ -254,7 +228,15 @@ class TravelToSceneState(State):
         target_portal = random.choice(valid_portals)
         target_scene = target_portal.get('to_scene')
         if target_scene:
+            is_offscreen = not self.npc.mask_system
+            start = self.npc._get_feet_position()
             self.npc.pathfind_to_scene(target_scene)
+            if is_offscreen:
+                # Walking cost is in unscaled pixels, so base speed turns it into seconds
+                cost = graph.route_cost(current_scene, target_scene, start)
+                npc_speed = getattr(self.npc, 'base_speed', DEFAULT_NPC_SPEED)
+                if cost < math.inf and npc_speed > 0:
+                    self.arrival_time = cost / npc_speed
             return
 
         # No valid scene found - path will be empty
@@ -262,8 +244,14 @@ class TravelToSceneState(State):
         print(f"    No target scene selected, aborting travel")
     
     def is_complete(self) -> bool:
-        """Travel is complete when local path and scene path are finished, or timeout reached."""
+        """Travel is complete when local path and scene path are finished, or timeout reached.
+
+        Off-screen travel is complete once the estimated walking time has passed.
+        """
+        if self.arrival_time is not None and self.time_in_state >= self.arrival_time:
+            return True
         has_path = self.npc.path and self.npc.current_waypoint_idx < len(self.npc.path)
+        has_path = has_path or self._npc_waiting_for_path()
         has_scene_path = self.npc.scene_path and self.npc.current_scene_step < len(self.npc.scene_path)
         return (not has_path and not has_scene_path) or self.time_in_state >= self.max_travel_time
     
@@ -290,6 +278,7 @@ class TravelToSceneState(State):
             self.npc.scene = active_scene
             self.npc.mask_system = active_scene.mask_system
             self.npc.props = active_scene.props
+            self.npc.prop_index = active_scene.prop_index
     
     def update(self, dt: float) -> None:
         super().update(dt)
@@ -333,6 +322,11 @@ class StateMachine:
             print(f"Warning: State '{state_name}' not registered")
             return
         
+        # A search started for the old state is no longer wanted
+        cancel_path_request = self._get_npc_attr('cancel_path_request')
+        if cancel_path_request:
+            cancel_path_request()
+
         # Exit current state
         if self.current_state:
             self.current_state.exit()
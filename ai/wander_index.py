@@ -0,0 +1,127 @@
+"""Precomputed wander targets per scene.
+
+A WanderIndex samples a scene's compiled mask once on a WANDER_INDEX_STEP
+lattice. It keeps the floor points (walkable, not portal) that are at least
+portal_min_distance from every portal center, splits them into open points
+(more than open_clearance from any wall) and near-wall points, and buckets
+both tiers into BUCKET_SIZE squares.
+
+sample() picks uniformly among one tier's points in a ring around a
+position. Buckets wholly inside the ring are used as they are, the few
+straddling its edges are filtered, and one weighted random choice gives the
+point, so there is no rejection loop however narrow the room is.
+
+Indexes are cached per (scene, portal_min_distance, open_clearance) and
+rebuilt when the scene's mask is replaced.
+"""
+import bisect
+import math
+import random
+from array import array
+from itertools import compress
+
+from world.mask_collision import CELL_WALKABLE
+
+# Lattice spacing (px) of the wander candidates
+WANDER_INDEX_STEP = 8
+# Side (px) of the square buckets candidates are grouped in
+BUCKET_SIZE = 64
+
+# Raster class -> 1 for plain floor (walkable and not a portal)
+_FLOOR = bytes(1 if value == CELL_WALKABLE else 0 for value in range(256))
+
+# (scene_name, portal_min_distance, open_clearance) -> WanderIndex
+_wander_indexes = {}
+
+
+class WanderIndex:
+    """Valid wander targets of one scene, bucketed by position."""
+
+    def __init__(self, mask_system, portal_min_distance: float, open_clearance: int, step: int = WANDER_INDEX_STEP):
+        self.mask_system = mask_system
+        width, height = mask_system.width, mask_system.height
+        half = step // 2
+        portal_centers = [(region.bounds[0] + region.bounds[2] / 2, region.bounds[1] + region.bounds[3] / 2)
+                          for region in mask_system.portal_regions.values()]
+        has_room = bytes(1 if value > open_clearance else 0 for value in range(256))
+        # (bucket x, bucket y) -> array of x, y pairs, for open points and near-wall points
+        self.open_buckets = {}
+        self.wall_buckets = {}
+        for y in range(half, height, step):
+            start, end = y * width + half, (y + 1) * width
+            floor = bytearray(bytes(mask_system.raster[start:end:step]).translate(_FLOOR))
+            room = bytes(mask_system.clearance[start:end:step]).translate(has_room)
+            # Points closer than portal_min_distance to a portal center are dropped
+            for px, py in portal_centers:
+                dy = y - py
+                if abs(dy) >= portal_min_distance:
+                    continue
+                reach = math.sqrt(portal_min_distance * portal_min_distance - dy * dy)
+                first = max(0, math.floor((px - reach - half) / step) + 1)
+                last = min(len(floor) - 1, math.ceil((px + reach - half) / step) - 1)
+                if first <= last:
+                    floor[first:last + 1] = bytes(last - first + 1)
+            for i in compress(range(len(floor)), floor):
+                x = half + i * step
+                buckets = self.open_buckets if room[i] else self.wall_buckets
+                key = (x // BUCKET_SIZE, y // BUCKET_SIZE)
+                points = buckets.get(key)
+                if points is None:
+                    points = buckets[key] = array("i")
+                points.append(x)
+                points.append(y)
+
+    def sample(self, x: float, y: float, min_distance: float, max_distance: float, open_only: bool = True):
+        """Random candidate between min_distance and max_distance from (x, y), or None if there is none.
+
+        open_only picks from the open points, otherwise from the near-wall ones.
+        """
+        buckets = self.open_buckets if open_only else self.wall_buckets
+        min_sq, max_sq = min_distance * min_distance, max_distance * max_distance
+        choices = []
+        for bx in range(int((x - max_distance) // BUCKET_SIZE), int((x + max_distance) // BUCKET_SIZE) + 1):
+            for by in range(int((y - max_distance) // BUCKET_SIZE), int((y + max_distance) // BUCKET_SIZE) + 1):
+                points = buckets.get((bx, by))
+                if points is None:
+                    continue
+                left, top = bx * BUCKET_SIZE, by * BUCKET_SIZE
+                near_x = max(left - x, 0, x - left - BUCKET_SIZE)
+                near_y = max(top - y, 0, y - top - BUCKET_SIZE)
+                far_x = max(abs(left - x), abs(left + BUCKET_SIZE - x))
+                far_y = max(abs(top - y), abs(top + BUCKET_SIZE - y))
+                near_sq, far_sq = near_x * near_x + near_y * near_y, far_x * far_x + far_y * far_y
+                if near_sq > max_sq or far_sq < min_sq:
+                    continue
+                if near_sq < min_sq or far_sq > max_sq:
+                    # Bucket straddles the ring: keep only the points inside it
+                    inside = array("i")
+                    for i in range(0, len(points), 2):
+                        dx, dy = points[i] - x, points[i + 1] - y
+                        if min_sq <= dx * dx + dy * dy <= max_sq:
+                            inside.append(points[i])
+                            inside.append(points[i + 1])
+                    points = inside
+                if points:
+                    choices.append(points)
+        if not choices:
+            return None
+        totals = []
+        total = 0
+        for points in choices:
+            total += len(points) // 2
+            totals.append(total)
+        pick = random.randrange(total)
+        k = bisect.bisect_right(totals, pick)
+        points = choices[k]
+        i = (pick - totals[k] + len(points) // 2) * 2
+        return points[i], points[i + 1]
+
+
+def get_wander_index(scene_name: str, mask_system, portal_min_distance: float, open_clearance: int) -> WanderIndex:
+    """Get the wander index for a scene, building it on first use or after the scene's mask changed."""
+    key = (scene_name, portal_min_distance, open_clearance)
+    index = _wander_indexes.get(key)
+    if index is None or index.mask_system is not mask_system:
+        index = WanderIndex(mask_system, portal_min_distance, open_clearance)
+        _wander_indexes[key] = index
+    return index
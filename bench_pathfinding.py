@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""Benchmark A*, Jump Point Search, navmesh, flow field and D* Lite paths on the real scene masks.
+
+Runs headless (SDL dummy drivers). For every registered scene it builds the
+nav grid NPCs use and a seeded corpus of start/goal queries at the scene's
+NPC cell size:
+
+    floor        start and goal on random floor cells
+    portal       start on floor, goal at a portal's center (as for scene travel)
+    unreachable  goal on a blocked cell or in a part of the grid the start cannot reach
+
+Every search mode runs the same corpus. Per scene, query kind and mode it
+reports found paths, node expansions, path cost in cells, waypoints and
+p50/p99 time per query; "cost diff" is the largest cost difference from A*
+on the same query (0 for the exact modes). Navmesh timings exclude building
+the mesh, which is done once per grid. Navmesh paths are any-angle, so their
+costs come out below A*'s. --smooth string-pulls grid paths as NPCs do (see
+ai.path_smoothing).
+
+Two more modes run outside find_path:
+
+    flow   portal queries walked out of the portal's prebuilt flow field
+    dstar  a new D* Lite planner's first plan per query; kind "repair" times
+           the plan after a prop is dropped on the middle of the first path
+           (cost diff against A* on the grid with the prop). NPCs re-path
+           with JPS instead; this row shows why
+
+Per scene it also prints the time to build the navmesh and each portal's
+flow field from scratch; --json keeps them under "builds".
+
+--json writes the results for later runs to compare against with --baseline,
+which prints p50/p99 and expansion changes per row.
+
+Usage:
+    python bench_pathfinding.py [--queries N] [--seed S] [--smooth] [--json OUT] [--baseline IN]
+"""
+import argparse
+import json
+import math
+import os
+import random
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+# Share of each scene's queries per kind; floor queries get the rest
+PORTAL_SHARE = 0.15
+UNREACHABLE_SHARE = 0.15
+
+
+def path_cost(path, cell):
+    """Cost of a waypoint path in cells (1 per straight step, sqrt(2) per diagonal)."""
+    return sum(math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(path, path[1:])) / cell
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list."""
+    return sorted_values[max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))]
+
+
+def build_corpus(grid, mask, rng, count):
+    """Seeded (kind, start, goal) queries for one nav grid; see the module docstring for the kinds."""
+    from ai.nav_grid import NAV_FLOOR, NAV_BLOCKED
+
+    floor = [i for i, value in enumerate(grid.cells) if value == NAV_FLOOR and not grid.prop_blocks[i]]
+    if not floor:
+        return []
+    labels = grid.components()
+    blocked = [i for i, value in enumerate(grid.cells) if value == NAV_BLOCKED]
+    # Bounds centers, as NPCs aim for on scene travel
+    portals = [mask.get_portal_bounds(portal_id).center for portal_id in mask.portal_regions]
+
+    def center(i):
+        return grid.cell_center(i % grid.cols, i // grid.cols)
+
+    queries = []
+    for _ in range(int(count * PORTAL_SHARE) if portals else 0):
+        queries.append(("portal", center(rng.choice(floor)), rng.choice(portals)))
+    for _ in range(int(count * UNREACHABLE_SHARE) if blocked else 0):
+        start = rng.choice(floor)
+        # Prefer open cells cut off from the start; a blocked goal otherwise
+        others = [i for i in rng.sample(floor, min(len(floor), 64)) if labels[i] != labels[start]]
+        queries.append(("unreachable", center(start), center(rng.choice(others or blocked))))
+    while len(queries) < count:
+        queries.append(("floor", center(rng.choice(floor)), center(rng.choice(floor))))
+    return queries
+
+
+def record(rows, kind, elapsed, expansions, path, cell):
+    """Add one timed query to rows[kind]; path is None (or empty) if nothing was found. Returns the path cost or None."""
+    row = rows.setdefault(kind, {"times": [], "found": 0, "expansions": 0, "costs": [], "waypoints": []})
+    row["times"].append(elapsed)
+    row["expansions"] += expansions
+    if not path:
+        return None
+    row["found"] += 1
+    cost = path_cost(path, cell)
+    row["costs"].append(cost)
+    row["waypoints"].append(len(path))
+    return cost
+
+
+def cost_diffs(queries, astar_costs, costs):
+    """Largest cost difference from A* per query kind, over queries both found."""
+    diffs = {}
+    for (kind, _, _), a, b in zip(queries, astar_costs, costs):
+        if a is not None and b is not None:
+            diffs[kind] = max(diffs.get(kind, 0.0), abs(a - b))
+    return diffs
+
+
+def report(results, scene_name, grid, mode, rows, diffs):
+    """Print one line per query kind of a mode and add it to results."""
+    for kind in ("floor", "portal", "unreachable", "repair"):
+        row = rows.get(kind)
+        if row is None:
+            continue
+        times = sorted(row["times"])
+        count = len(times)
+        result = {
+            "scene": scene_name, "kind": kind, "mode": mode, "queries": count, "found": row["found"],
+            "expansions": row["expansions"] / count,
+            "cost": sum(row["costs"]) / len(row["costs"]) if row["costs"] else 0.0,
+            "waypoints": sum(row["waypoints"]) / len(row["waypoints"]) if row["waypoints"] else 0.0,
+            "p50_ms": percentile(times, 50) * 1000, "p99_ms": percentile(times, 99) * 1000,
+            "cost_diff": diffs.get(kind, 0.0),
+        }
+        results.append(result)
+        print(f"{scene_name:<18} {grid.cols:>4}x{grid.rows:<4} {kind:<11} {mode:>7} "
+              f"{result['found']:>4}/{count:<4} {result['expansions']:>10.0f} {result['cost']:>7.1f} "
+              f"{result['waypoints']:>9.1f} {result['p50_ms']:>7.2f} {result['p99_ms']:>7.2f} "
+              f"{result['cost_diff']:>9.2g}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200, help="Queries per scene")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the query corpus")
+    parser.add_argument("--smooth", action="store_true", help="String-pull grid paths as NPCs do")
+    parser.add_argument("--json", metavar="OUT", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", metavar="IN", help="Compare with results written earlier by --json")
+    args = parser.parse_args()
+    # Assets and the mask cache are found relative to the repo root; result files stay relative to the caller
+    if args.json:
+        args.json = os.path.abspath(args.json)
+    if args.baseline:
+        args.baseline = os.path.abspath(args.baseline)
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+
+    from core.assets import Assets
+    from scenes.scene_registry import SCENE_REGISTRY
+    from scenes import cat_cafe_scene, cat_cafe_kitchen_scene, arcade_scene, outdoor_scene  # noqa: F401 (registers scenes)
+    from world.mask_cache import get_mask, get_mask_path
+    from ai.nav_grid import get_nav_grid
+    from ai.pathfinding import Pathfinding, MODE_ASTAR, MODE_JPS, MODE_NAVMESH, clear_path_cache
+    from ai.navmesh import NavMesh, get_navmesh
+    from ai.flow_field import FlowField, get_portal_flow_field
+    from ai.dstar_lite import DStarLite
+    from entities.npc import PATH_CLEARANCE
+
+    assets = Assets()
+    rng = random.Random(args.seed)
+    results = []
+    builds = []
+    print(f"{'scene':<18} {'grid':>9} {'kind':<11} {'mode':>7} {'found':>9} {'expansions':>10} {'cost':>7} "
+          f"{'waypoints':>9} {'p50 ms':>7} {'p99 ms':>7} {'cost diff':>9}")
+    for scene_name, scene_class in sorted(SCENE_REGISTRY.items()):
+        scale = getattr(scene_class, 'SCENE_SCALE', 1.0) or 1.0
+        mask = get_mask(scene_name, get_mask_path(scene_class.BACKGROUND_PATH), assets, scale)
+        # Same cell size and clearance as NPC.pathfind_to
+        cell = max(5, int(20 * scale))
+        grid = get_nav_grid(scene_name, mask, cell, max(1, int(PATH_CLEARANCE * scale)))
+        queries = build_corpus(grid, mask, rng, args.queries)
+        if not queries:
+            continue
+
+        # Build times from scratch; the searches below use the grid's cached structures
+        began = time.perf_counter()
+        NavMesh(grid)
+        build_times = {"navmesh": time.perf_counter() - began}
+        portal_times = []
+        for portal_id in mask.portal_regions:
+            bounds = mask.get_portal_bounds(portal_id)
+            began = time.perf_counter()
+            FlowField(grid, grid.cell_of(bounds.centerx, bounds.centery))
+            portal_times.append(time.perf_counter() - began)
+        if portal_times:
+            build_times["flow field"] = sum(portal_times) / len(portal_times)
+        for structure, elapsed in build_times.items():
+            builds.append({"scene": scene_name, "structure": structure, "ms": elapsed * 1000})
+        print(f"{scene_name:<18} {grid.cols:>4}x{grid.rows:<4} builds: "
+              + ", ".join(f"{structure} {elapsed * 1000:.1f} ms" for structure, elapsed in build_times.items())
+              + (f" (mean of {len(portal_times)} portals)" if portal_times else ""))
+
+        get_navmesh(grid)
+        astar_costs = None
+        for mode in (MODE_ASTAR, MODE_JPS, MODE_NAVMESH):
+            # Time the searches themselves, not path cache hits
+            clear_path_cache()
+            pathfinder = Pathfinding(cell, mode=mode, smooth=args.smooth)
+            rows = {}
+            costs = []
+            for kind, start, goal in queries:
+                began = time.perf_counter()
+                path = pathfinder.find_path(grid, start, goal)
+                elapsed = time.perf_counter() - began
+                costs.append(record(rows, kind, elapsed, pathfinder.last_expansions,
+                                    path if not pathfinder.last_partial else None, cell))
+            if astar_costs is None:
+                astar_costs = costs
+            report(results, scene_name, grid, mode, rows, cost_diffs(queries, astar_costs, costs))
+
+        # Portal trips read off the portal's flow field
+        rows = {}
+        costs = []
+        for kind, start, goal in queries:
+            field = get_portal_flow_field(grid, *goal) if kind == "portal" else None
+            if field is None:
+                costs.append(None)
+                continue
+            began = time.perf_counter()
+            path = field.path_from(start)
+            elapsed = time.perf_counter() - began
+            costs.append(record(rows, kind, elapsed, 0, path or None, cell))
+        report(results, scene_name, grid, "flow", rows, cost_diffs(queries, astar_costs, costs))
+
+        # D* Lite: a new planner per query, then a repair after a prop lands on its path
+        astar = Pathfinding(cell, mode=MODE_ASTAR)
+        rows = {}
+        costs = []
+        repair_diffs = {}
+        for kind, start, goal in queries:
+            planner = DStarLite(grid, grid.cell_of(*goal))
+            start_cell = grid.cell_of(*start)
+            # Tables kept per grid version are shared by every NPC: build them outside the timing
+            grid.components()
+            began = time.perf_counter()
+            path = planner.plan(start_cell)
+            elapsed = time.perf_counter() - began
+            costs.append(record(rows, kind, elapsed, planner.last_expansions, path, cell))
+            if not path or len(path) < 3:
+                continue
+            x, y = path[len(path) // 2]
+            prop = pygame.Rect(x - cell // 2, y - cell // 2, cell, cell)
+            grid.add_prop_rect(prop)
+            grid.open_cells()
+            grid.components()
+            began = time.perf_counter()
+            path = planner.plan(start_cell)
+            elapsed = time.perf_counter() - began
+            cost = record(rows, "repair", elapsed, planner.last_expansions, path, cell)
+            expected = astar.astar(grid, start, goal)
+            if cost is not None and not astar.last_partial:
+                repair_diffs["repair"] = max(repair_diffs.get("repair", 0.0), abs(cost - path_cost(expected, cell)))
+            grid.remove_prop_rect(prop)
+        report(results, scene_name, grid, "dstar", rows,
+               dict(cost_diffs(queries, astar_costs, costs), **repair_diffs))
+
+    settings = {"seed": args.seed, "queries": args.queries, "smooth": args.smooth}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(dict(settings, results=results, builds=builds), f, indent=2)
+        print(f"Wrote {len(results)} rows to {args.json}")
+    if args.baseline:
+        compare(results, settings, args.baseline)
+
+    pygame.quit()
+
+
+def compare(results, settings, baseline_path):
+    """Print p50/p99 time ratios and expansion/found changes against a --json baseline."""
+    with open(baseline_path) as f:
+        data = json.load(f)
+    baseline = {(row["scene"], row["kind"], row["mode"]): row for row in data["results"]}
+    print(f"\nAgainst {baseline_path}:")
+    for key, value in settings.items():
+        if data.get(key) != value:
+            print(f"Warning: baseline was run with {key}={data.get(key)}, this run with {key}={value}")
+    print(f"{'scene':<18} {'kind':<11} {'mode':>7} {'p50':>7} {'p99':>7} {'expansions':>11} {'found':>6} {'cost':>7}")
+    for row in results:
+        old = baseline.get((row["scene"], row["kind"], row["mode"]))
+        if old is None:
+            print(f"{row['scene']:<18} {row['kind']:<11} {row['mode']:>7} (not in baseline)")
+            continue
+        p50 = row["p50_ms"] / old["p50_ms"] if old["p50_ms"] else 1.0
+        p99 = row["p99_ms"] / old["p99_ms"] if old["p99_ms"] else 1.0
+        print(f"{row['scene']:<18} {row['kind']:<11} {row['mode']:>7} {p50:>6.2f}x {p99:>6.2f}x "
+              f"{row['expansions'] - old['expansions']:>+11.0f} {row['found'] - old['found']:>+6d} "
+              f"{row['cost'] - old['cost']:>+7.2f}")
+
+
+if __name__ == "__main__":
+    main()
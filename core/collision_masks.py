@@ -2,6 +2,33 @@
 import pygame
 from typing import Dict, List
 
+# Per-channel thresholds for pygame.mask.from_threshold (a channel matches when
+# |channel - color| < threshold). Alpha is ignored.
+_WHITE_COLOR = (255, 255, 255, 255)
+_WHITE_THRESHOLD = (56, 56, 56, 255)  # r, g, b > 200
+_BLACK_COLOR = (0, 0, 0, 255)
+_BLACK_THRESHOLD = (50, 50, 50, 255)  # r, g, b < 50
+
+
+def white_mask(surface: pygame.Surface) -> pygame.mask.Mask:
+    """Mask of white pixels (r, g, b > 200), regardless of alpha."""
+    return pygame.mask.from_threshold(surface, _WHITE_COLOR, _WHITE_THRESHOLD)
+
+
+def blocking_mask(surface: pygame.Surface) -> pygame.mask.Mask:
+    """Mask of blocking prop pixels: anything that is neither white nor opaque black."""
+    size = surface.get_size()
+    blocking = pygame.mask.Mask(size, fill=True)
+    blocking.erase(white_mask(surface), (0, 0))
+    black = pygame.mask.from_threshold(surface, _BLACK_COLOR, _BLACK_THRESHOLD)
+    blocking.erase(black.overlap_mask(pygame.mask.from_surface(surface, 0), (0, 0)), (0, 0))
+    return blocking
+
+
+def component_rects(mask: pygame.mask.Mask) -> List[pygame.Rect]:
+    """Bounding rects of the connected regions of a mask, top-left first."""
+    return sorted(mask.get_bounding_rects(), key=lambda r: (r.y, r.x))
+
 
 class CollisionMaskExtractor:
     """Extracts per-frame collision bounding boxes from a mask image."""
@@ -44,28 +71,14 @@ class CollisionMaskExtractor:
     
     def _find_white_box(self, start_x: int, start_y: int) -> pygame.Rect:
         """Find bounding box of white pixels in a frame region (white = collision area)."""
-        min_x, max_x = self.frame_width, 0
-        min_y, max_y = self.frame_height, 0
-        found_white = False
-        
-        for y in range(start_y, start_y + self.frame_height):
-            for x in range(start_x, start_x + self.frame_width):
-                if x < self.mask_image.get_width() and y < self.mask_image.get_height():
-                    color = self.mask_image.get_at((x, y))
-                    # Check if pixel is white (collision area)
-                    if color[0] > 200 and color[1] > 200 and color[2] > 200:
-                        found_white = True
-                        local_x = x - start_x
-                        local_y = y - start_y
-                        min_x = min(min_x, local_x)
-                        max_x = max(max_x, local_x)
-                        min_y = min(min_y, local_y)
-                        max_y = max(max_y, local_y)
+        frame = pygame.Rect(start_x, start_y, self.frame_width, self.frame_height)
+        frame = frame.clip(self.mask_image.get_rect())
+        regions = []
+        if frame.width and frame.height:
+            regions = white_mask(self.mask_image.subsurface(frame)).get_bounding_rects()
         
-        if found_white:
-            width = max_x - min_x + 1
-            height = max_y - min_y + 1
-            return pygame.Rect(min_x, min_y, width, height)
+        if regions:
+            return regions[0].unionall(regions[1:])
         else:
             # Default: reasonable hitbox for sprite (roughly center-bottom, humanoid shape)
             # For a 290x440 frame: hitbox in lower body area
@@ -23,6 +23,10 @@ class Game:
         self.saves = SaveSystem(Path("saves"))
         self.running = True
 
+        # Precache all scene masks for off-screen NPC wandering (and walk-weighted scene routes)
+        from world.mask_cache import precache_all_masks
+        precache_all_masks(self)
+
         # Initialize a fresh run state (player/world/collections)
         self.reset_run_state()
         
@@ -33,10 +37,6 @@ class Game:
         self.game_time_increment = 15  # Jump 15 game minutes per update
         self.time_until_next_increment = 900 / 56  # ~16.07 seconds until next increment
         self.time_accumulator = 0.0  # Accumulate real time
-        
-        # Precache all scene masks for off-screen NPC wandering
-        from world.mask_cache import precache_all_masks
-        precache_all_masks(self)
 
         self.stack.push(TitleScene(self))
 
@@ -1,5 +1,5 @@
 import pygame
-from core.sprites import SpriteLoader
+from entities.prop_definitions import get_prop_variant
 
 
 class Interactable:
@@ -26,135 +26,57 @@ class Prop:
         self.base_scale = max(0.1, float(scale)) if scale is not None else 1.0
         # Combined scale applies item-level scaling and scene-level scaling together
         self.scale = self.base_scale * self.scene_scale
-        self.sprite = None
-        self._sheet = None
         self.variants = max(1, int(variants))
         self.variant_index = max(0, int(variant_index))
         self.is_item = bool(is_item)
         self.item_data = item_data or {}
         self.item_id = item_id  # Unique identifier for tracking across scenes
         self.picked_up = False
-        self.mask = None
-        self._mask_sheet = None
-        self.collision_rects = []  # Blocking areas (scaled)
-        self.interaction_rects = []  # Interactable white areas (scaled)
-
-        loader = SpriteLoader(game.assets) if game else None
-        if game and sprite_path:
-            try:
-                self._sheet = game.assets.image(sprite_path)
-            except Exception as e:
-                print(f"Warning: Could not load prop sprite {sprite_path}: {e}")
-                self._sheet = pygame.Surface((64, 64))
-                self._sheet.fill((120, 120, 120))
-
-        if game and mask_path:
-            try:
-                self._mask_sheet = game.assets.image(mask_path)
-            except Exception as e:
-                print(f"Warning: Could not load prop mask {mask_path}: {e}")
-                self._mask_sheet = None
-
-        # Slice the requested variant from the sheets
-        if self._sheet:
-            self._rebuild_variant_surface()
+        # Scene PropIndex holding this prop's rects (set by PropIndex.add_prop)
+        self.prop_index = None
+        # Shared sprite/mask/collision data for the current variant (see prop_definitions)
+        self._variant = None
+
+        self._rebuild_variant_surface()
+        if self.sprite:
             self.rect = self.sprite.get_rect(topleft=(x, y))
         else:
             self.rect = pygame.Rect(x, y, 64, 64)
 
+    @property
+    def sprite(self):
+        return self._variant.sprite if self._variant else None
+
+    @property
+    def mask(self):
+        return self._variant.mask if self._variant else None
+
+    @property
+    def visible_rect(self):
+        """Visible sprite bounds, unscaled and relative to the prop position."""
+        return self._variant.visible_rect if self._variant else None
+
+    @property
+    def collision_rects(self):
+        """Blocking areas, one per connected region (unscaled, read-only)."""
+        return self._variant.collision_rects if self._variant else ()
+
+    @property
+    def interaction_rects(self):
+        """Interactable white areas, one per connected region (unscaled, read-only)."""
+        return self._variant.interaction_rects if self._variant else ()
+
     def _rebuild_variant_surface(self):
-        if not self._sheet:
-            return
-        loader = SpriteLoader(self.game.assets) if self.game else None
-        index = max(0, min(self.variant_index, self.variants - 1))
-        if loader:
-            self.sprite = loader.slice_variant(self._sheet, self.variants, index)
-        else:
-            sheet_w = self._sheet.get_width()
-            sheet_h = self._sheet.get_height()
-            frame_w = sheet_w // self.variants if self.variants > 0 else sheet_w
-            frame_h = sheet_h
-            src_rect = pygame.Rect(index * frame_w, 0, frame_w, frame_h)
-            frame = pygame.Surface((frame_w, frame_h), pygame.SRCALPHA)
-            frame.blit(self._sheet, (0, 0), src_rect)
-            self.sprite = frame
-        # Also slice the mask variant if a mask sheet exists
-        if self._mask_sheet:
-            if loader:
-                self.mask = loader.slice_variant(self._mask_sheet, self.variants, index)
-            else:
-                mask_w = self._mask_sheet.get_width()
-                mask_h = self._mask_sheet.get_height()
-                mask_frame_w = mask_w // self.variants if self.variants > 0 else mask_w
-                mask_frame_h = mask_h
-                mask_src_rect = pygame.Rect(index * mask_frame_w, 0, mask_frame_w, mask_frame_h)
-                mask_frame = pygame.Surface((mask_frame_w, mask_frame_h), pygame.SRCALPHA)
-                mask_frame.blit(self._mask_sheet, (0, 0), mask_src_rect)
-                self.mask = mask_frame
-        
-        # Extract collision boxes from mask
-        if self.mask:
-            self._extract_collision_boxes()
-
-    def _extract_collision_boxes(self):
-        """Extract bounding boxes for collision and interaction areas from mask."""
-        if not self.mask:
-            return
-        
-        # Find all blocking pixels (transparent or colored, not black/white)
-        blocking_pixels = set()
-        interaction_pixels = set()
-        
-        for y in range(self.mask.get_height()):
-            for x in range(self.mask.get_width()):
-                try:
-                    color = self.mask.get_at((x, y))
-                    r = color[0] if len(color) >= 1 else 0
-                    g = color[1] if len(color) >= 2 else 0
-                    b = color[2] if len(color) >= 3 else 0
-                    a = color[3] if len(color) >= 4 else 255
-                    
-                    is_black = r < 50 and g < 50 and b < 50
-                    is_white = r > 200 and g > 200 and b > 200
-                    
-                    if is_white:
-                        interaction_pixels.add((x, y))
-                    elif a == 0 or not is_black:
-                        # Transparent or colored = blocking
-                        blocking_pixels.add((x, y))
-                except:
-                    pass
-        
-        # Extract bounding box for blocking area
-        if blocking_pixels:
-            min_x = min(p[0] for p in blocking_pixels)
-            max_x = max(p[0] for p in blocking_pixels)
-            min_y = min(p[1] for p in blocking_pixels)
-            max_y = max(p[1] for p in blocking_pixels)
-            
-            # Store scaled rect relative to prop position
-            unscaled_rect = pygame.Rect(min_x, min_y, max_x - min_x + 1, max_y - min_y + 1)
-            self.collision_rects = [unscaled_rect]
-        else:
-            self.collision_rects = []
-        
-        # Extract bounding box for interaction area
-        if interaction_pixels:
-            min_x = min(p[0] for p in interaction_pixels)
-            max_x = max(p[0] for p in interaction_pixels)
-            min_y = min(p[1] for p in interaction_pixels)
-            max_y = max(p[1] for p in interaction_pixels)
-            
-            # Store scaled rect relative to prop position
-            unscaled_rect = pygame.Rect(min_x, min_y, max_x - min_x + 1, max_y - min_y + 1)
-            self.interaction_rects = [unscaled_rect]
-        else:
-            self.interaction_rects = []
-    
+        """Point this prop at the shared data for its sheet and current variant."""
+        assets = self.game.assets if self.game else None
+        self._variant = get_prop_variant(assets, self.sprite_path, self.mask_path, self.variants, self.variant_index)
+
     def set_variant(self, index: int):
-        """Switch to a different variant sprite and mask."""
+        """Switch to a different variant sprite and mask, re-indexing its rects in the scene's prop index."""
         self.variant_index = int(index)
         self._rebuild_variant_surface()
+        if self.prop_index is not None:
+            self.prop_index.update_prop(self)
 
     def update(self, dt: float) -> None:
         pass
@@ -165,24 +87,17 @@ class Prop:
                 screen_x, screen_y = camera.apply(self.x, self.y)
             else:
                 screen_x, screen_y = self.x, self.y
-            # Scale the sprite if needed
-            if self.scale != 1.0:
-                scaled_width = int(self.sprite.get_width() * self.scale)
-                scaled_height = int(self.sprite.get_height() * self.scale)
-                scaled_sprite = pygame.transform.scale(self.sprite, (scaled_width, scaled_height))
-                surface.blit(scaled_sprite, (screen_x, screen_y))
-            else:
-                surface.blit(self.sprite, (screen_x, screen_y))
+            # Scaled copies are built once per scale and shared between props
+            surface.blit(self._variant.scaled_sprite(self.scale), (screen_x, screen_y))
         else:
             pygame.draw.rect(surface, (120, 120, 120), self.rect)
 
     def depth(self) -> float:
         """Return depth (y) used for sorting. Uses visible sprite bounds to ignore transparent extensions."""
         if self.sprite:
-            # bounding_rect is relative to surface; bottom gives visible height ignoring full transparency
-            bbox = self.sprite.get_bounding_rect(min_alpha=1)
+            # visible_rect bottom gives visible height ignoring full transparency
             # Account for scaling when calculating depth
-            return self.y + bbox.bottom * self.scale
+            return self.y + self.visible_rect.bottom * self.scale
         elif self.rect:
             return self.rect.bottom * self.scale
         return self.y
@@ -5,11 +5,25 @@ from entities.components.animation import Spritesheet, Animation
 from core.sprites import SpriteLoader
 from core.sprite_registry import get_sprite_config
 from core.collision_masks import CollisionMaskExtractor
-from ai.pathfinding import Pathfinding
+from ai.pathfinding import Pathfinding, MODE_JPS
+from ai.nav_grid import get_nav_grid, PROP_MARGIN
+from ai.flow_field import get_portal_flow_field
+from ai.path_worker import PathRequest, get_path_worker
+from ai.path_smoothing import smooth_path
+from ai.portal_queue import request_portal_turn, release_portal_turn, PORTAL_QUEUE_RADIUS, QUEUE_SPACING
 from ai.state_machine import StateMachine
 from world.scene_graph import get_scene_graph
 from entities.npc_configs import NPCConfig, HENRY_CONFIG
 
+# Half-size (unscaled px) of the NPC footprint that must stay clear of walls while pathfinding
+PATH_CLEARANCE = 5
+# Search used for NPC paths (see bench_pathfinding.py for A*, JPS and navmesh numbers).
+# JPS paths are optimal and its p99 stays low on every scene. MODE_NAVMESH gives
+# any-angle paths over a polygon mesh instead of cell-by-cell ones
+PATHFINDING_MODE = MODE_JPS
+# String-pull grid paths so NPCs walk long straight segments instead of one step per cell
+SMOOTH_PATHS = True
+
 class NPC(Character):
     def __init__(self, x: float, y: float, game=None, sprite_scale: float = 1.0, config: NPCConfig = None, scene_scale: float = 1.0):
         self.game = game
@@ -109,12 +123,15 @@ class NPC(Character):
         
         # Pathfinding - scale cell size with scene scale for finer grids in scaled scenes
         scaled_cell_size = max(5, int(20 * self.scene_scale))  # Min 5px, scales with scene
-        self.pathfinder = Pathfinding(cell_size=scaled_cell_size)
+        self.pathfinder = Pathfinding(cell_size=scaled_cell_size, mode=PATHFINDING_MODE, smooth=SMOOTH_PATHS)
         self.path = []  # Current path waypoints (list of (x, y) tuples)
         self.current_waypoint_idx = 0
         # self.speed already set using base_speed and scene_scale
         self.mask_system = None  # Will be set by scene
+        self.prop_index = None  # Scene PropIndex for prop avoidance (set by scene)
         self.destination = None  # Target destination (x, y) for re-pathfinding
+        self.destination_avoid_portals = False  # avoid_portals the destination was requested with
+        self.path_request = None  # PathRequest waiting on the path worker
         self.stuck_timer = 0.0  # Time spent not making progress
         self.last_position = self._get_feet_position()  # Track position for stuck detection
         self.repath_interval = 2.0  # Re-pathfind every N seconds if moving
@@ -127,8 +144,6 @@ class NPC(Character):
         self.target_scene = None  # Target scene name for cross-scene movement
         self.scene_path = None  # List of (scene_name, portal_id, spawn_point) for cross-scene path
         self.current_scene_step = 0  # Which step in the scene path we're on
-        # Cache for off-screen mask sampling per scene
-        self.offscreen_mask_cache = {}
 
     def _create_animation(self, frame_indices: list) -> Animation:
         anim = Animation(self.spritesheet, fps=6, scale=self.sprite_scale)
@@ -217,6 +232,7 @@ class NPC(Character):
                     
                     # Only transition if we're at the expected portal or path is complete
                     if expected_portal_id == portal_id or (not self.path or self.current_waypoint_idx >= len(self.path)):
+                        release_portal_turn(getattr(self.scene, 'scene_name', None), expected_portal_id, getattr(self, 'npc_id', id(self)))
                         if hasattr(self.scene, 'trigger_npc_portal_transition'):
                             self.scene.trigger_npc_portal_transition(self, portal_id)
                         self.current_scene_step += 1
@@ -227,9 +243,16 @@ class NPC(Character):
                     # Clear current path since we're leaving the scene
                     self.path = []
                     self.destination = None
+                    self.cancel_path_request()
         
+        # Wait in line when other NPCs are ahead at the portal we're walking to
+        waiting = not self._has_portal_turn()
+        if waiting:
+            self.stuck_timer = 0.0
+            self.repath_timer = 0.0
+
         # Determine if moving
-        is_moving = self.path and self.current_waypoint_idx < len(self.path)
+        is_moving = self.path and self.current_waypoint_idx < len(self.path) and not waiting
         
         # Check if stuck or need to re-path
         if is_moving and self.destination:
@@ -244,7 +267,7 @@ class NPC(Character):
                 self.stuck_timer += dt
                 if self.stuck_timer > 0.5:  # Stuck for more than 0.5 seconds
                     print(f"  NPC stuck, re-pathfinding to {self.destination}")
-                    self.pathfind_to(self.destination[0], self.destination[1])
+                    self._repath()
                     self.stuck_timer = 0.0
             else:
                 self.stuck_timer = 0.0
@@ -257,14 +280,14 @@ class NPC(Character):
                 self.repath_timer = 0.0
                 # Re-pathfind to destination
                 if self.destination:
-                    self.pathfind_to(self.destination[0], self.destination[1])
+                    self._repath()
         
         # Choose animation based on movement state
         if is_moving:
             # Use moving animation for current direction
             self.animation = self.moving_animations.get(self.direction, self.idle_animations.get(self.direction))
         else:
-            # Use idle animation (single frame)
+            # Use idle animation (single frame); also shown while a path is being searched
             self.animation = self.idle_animations.get(self.direction, self.idle_animations.get("down"))
         
         # Update animation frame
@@ -280,8 +303,24 @@ class NPC(Character):
                 self.rect.topleft = (self.x, self.y)
         
         # Follow path if one exists, OR if we're in cross-scene travel trying to reach a portal
-        if self.path or (self.scene_path and self.current_scene_step < len(self.scene_path)):
+        if not waiting and (self.path or (self.scene_path and self.current_scene_step < len(self.scene_path))):
             self._follow_path(dt)
+
+    def _has_portal_turn(self) -> bool:
+        """Queue at the portal of the current scene step (see ai.portal_queue); False while this NPC must wait."""
+        if not self.mask_system or not self.scene_path or self.current_scene_step >= len(self.scene_path):
+            return True
+        portal_id = self.scene_path[self.current_scene_step][1]
+        portal_bounds = self.mask_system.get_portal_bounds(portal_id) if portal_id is not None else None
+        if portal_bounds is None:
+            return True
+        feet_x, feet_y = self._get_feet_position()
+        distance = math.hypot(portal_bounds.centerx - feet_x, portal_bounds.centery - feet_y)
+        if distance > PORTAL_QUEUE_RADIUS * self.scene_scale:
+            return True
+        place = request_portal_turn(getattr(self.scene, 'scene_name', None), portal_id, getattr(self, 'npc_id', id(self)))
+        # Place n stops n gaps from the portal; the head walks on in
+        return place == 0 or distance > place * QUEUE_SPACING * self.scene_scale
     
     def pathfind_to(self, target_x: float, target_y: float, avoid_portals: bool = False) -> None:
         """Pathfind from current position to target using A* algorithm.
@@ -294,6 +333,7 @@ class NPC(Character):
             avoid_portals: If True, portals are treated as unwalkable (for same-scene wandering)
         """
         npc_name = getattr(self, 'npc_id', '?')
+        self.cancel_path_request()
         if not self.mask_system:
             print(f"    [pathfind_to] {npc_name}: No mask_system, cannot pathfind")
             return
@@ -302,78 +342,109 @@ class NPC(Character):
         start_x, start_y = self._get_feet_position()
         
         # Store destination for re-pathfinding
+        is_repath = self.destination == (target_x, target_y) and self.destination_avoid_portals == avoid_portals
         self.destination = (target_x, target_y)
+        self.destination_avoid_portals = avoid_portals
         self.stuck_timer = 0.0
         self.repath_timer = 0.0
         
-        # Define walkable function: a position is walkable if it's not colliding
-        def is_walkable(x, y):
-            # Check if position is blocked by collision mask
-            walkable = self.mask_system.is_walkable(int(x), int(y))
-            if not walkable:
-                return False
-            
-            # If avoiding portals, reject portal areas
-            if avoid_portals:
-                if self.mask_system.is_portal(int(x), int(y)) is not None:
-                    return False
-            
-            # Check props (if they have collision)
-            if hasattr(self, 'props') and self.props:
-                for prop in self.props:
-                    if not getattr(prop, 'picked_up', False):
-                        prop_scale = getattr(prop, 'scale', 1.0)
-                        if hasattr(prop, 'sprite') and prop.sprite:
-                            bbox = prop.sprite.get_bounding_rect(min_alpha=1)
-                            scaled_width = int(bbox.width * prop_scale)
-                            scaled_height = int(bbox.height * prop_scale)
-                            prop_rect = pygame.Rect(
-                                int(prop.x + bbox.x * prop_scale),
-                                int(prop.y + bbox.y * prop_scale),
-                                scaled_width,
-                                scaled_height
-                            )
-                            check_rect = pygame.Rect(int(x) - 5, int(y) - 5, 10, 10)
-                            if check_rect.colliderect(prop_rect):
-                                return False
-            
-            return True
+        clearance_radius = max(1, int(PATH_CLEARANCE * self.scene_scale))
+        nav_grid = self._get_nav_grid()
+        prop_index = self.prop_index
         
-        # If start is not walkable, try to find a nearby walkable position
-        if not is_walkable(start_x, start_y):
+        # If start is not walkable, snap to the nearest walkable position
+        if not self._is_start_walkable(start_x, start_y, avoid_portals):
             print(f"Start position ({start_x}, {start_y}) not walkable, searching nearby...")
-            found_start = False
-            for offset_x in range(-50, 51, 10):
-                for offset_y in range(-50, 51, 10):
-                    test_x = start_x + offset_x
-                    test_y = start_y + offset_y
-                    if is_walkable(test_x, test_y):
-                        print(f"Found walkable position at ({test_x}, {test_y})")
-                        self._set_position_from_feet(test_x, test_y)
-                        start_x, start_y = test_x, test_y
-                        found_start = True
-                        break
-                if found_start:
-                    break
-            if not found_start:
+            nearest = self.mask_system.find_nearest_walkable(
+                start_x, start_y,
+                max_radius=50,
+                exclude_portals=avoid_portals,
+                min_clearance=clearance_radius,
+                exclude_rects=[rect.inflate(PROP_MARGIN * 2, PROP_MARGIN * 2) for rect in prop_index.rects()] if prop_index else None,
+            )
+            if nearest is None:
                 print(f"Could not find walkable start position!")
                 return
-        
-        # Calculate path using A*
-        world_width = 1920  # Default; can be made dynamic
-        world_height = 1080
-        if hasattr(self, 'scene') and hasattr(self.scene, 'world_width'):
-            world_width = self.scene.world_width
-            world_height = self.scene.world_height
-        
-        self.path = self.pathfinder.astar(
-            is_walkable,
-            (start_x, start_y),
-            (target_x, target_y),
-            (world_width, world_height)
-        )
+            print(f"Found walkable position at {nearest}")
+            start_x, start_y = nearest
+            self._set_position_from_feet(start_x, start_y)
+        
+        # Portal centers are shared goals: read the path off the portal's flow field
+        field = get_portal_flow_field(nav_grid, target_x, target_y) if not avoid_portals else None
+        path = field.path_from((start_x, start_y)) if field else []
+        if path:
+            self.path = smooth_path(nav_grid, path) if self.pathfinder.smooth else path
+        else:
+            # Cached paths are used right away; anything else is searched by the path worker
+            path = self.pathfinder.lookup(nav_grid, (start_x, start_y), (target_x, target_y), avoid_portals)
+            if path is None:
+                pathfinder = Pathfinding(cell_size=self.pathfinder.cell, max_expansions=self.pathfinder.max_expansions,
+                                         mode=self.pathfinder.mode, smooth=self.pathfinder.smooth)
+                self.path_request = get_path_worker().submit(PathRequest(
+                    pathfinder, nav_grid, (start_x, start_y), (target_x, target_y), avoid_portals, self._on_path_ready))
+                if is_repath:
+                    return  # Keep walking the old path to the same spot until the new one arrives
+                path = []
+            self.path = path
         self.current_waypoint_idx = 0
 
+    def _on_path_ready(self, request) -> None:
+        """Take the path of a finished PathRequest, unless it was superseded or the NPC left the scene."""
+        if request is not self.path_request:
+            return
+        self.path_request = None
+        if request.nav_grid.mask_system is not self.mask_system:
+            return
+        self.path = request.path
+        self.current_waypoint_idx = 0
+        self.stuck_timer = 0.0
+        self.repath_timer = 0.0
+        self.last_position = self._get_feet_position()
+
+    def has_pending_path(self) -> bool:
+        """True while a path for this NPC is being searched in the background."""
+        return self.path_request is not None
+
+    def cancel_path_request(self) -> None:
+        """Drop the background search for this NPC, if any."""
+        if self.path_request is not None:
+            self.path_request.cancel()
+            self.path_request = None
+
+    def _get_nav_grid(self):
+        """Nav grid for this NPC's scene, cell size and footprint, fed by the scene's prop index."""
+        # Footprint must fit between walls (one clearance lookup instead of a rect probe).
+        # Doorways (portal pixels) and the goal cell itself only need to be walkable.
+        clearance_radius = max(1, int(PATH_CLEARANCE * self.scene_scale))
+        scene_name = getattr(getattr(self, 'scene', None), 'scene_name', None)
+        nav_grid = get_nav_grid(scene_name, self.mask_system, self.pathfinder.cell, clearance_radius)
+        # Prop footprints come from the scene's prop index, which keeps the grid's prop counts up to date
+        if self.prop_index is not None:
+            self.prop_index.attach_nav_grid(nav_grid)
+        return nav_grid
+
+    def _is_start_walkable(self, x: float, y: float, avoid_portals: bool) -> bool:
+        """Check the exact start pixel (the grid only samples cell centers)."""
+        clearance_radius = max(1, int(PATH_CLEARANCE * self.scene_scale))
+        if not self.mask_system.has_clearance(int(x), int(y), clearance_radius):
+            if self.mask_system.is_portal(int(x), int(y)) is None:
+                return False
+        if avoid_portals and self.mask_system.is_portal(int(x), int(y)) is not None:
+            return False
+        if self.prop_index is not None and self.prop_index.point_blocked(x, y, PROP_MARGIN):
+            return False
+        return True
+
+    def _repath(self) -> None:
+        """Search again for self.destination, with the avoid_portals it was requested with.
+
+        The search runs on the path worker while the NPC keeps walking its old
+        path (see pathfind_to); portal destinations are re-read from their flow
+        field.
+        """
+        if self.destination and self.mask_system:
+            self.pathfind_to(*self.destination, self.destination_avoid_portals)
+
     def pathfind_to_scene(self, target_scene: str, target_x: float = None, target_y: float = None):
         """Pathfind to a location in a different scene (or current scene).
         
@@ -405,7 +476,7 @@ class NPC(Character):
         
         # Find path through scene graph
         scene_graph = get_scene_graph()
-        scene_path = scene_graph.find_scene_path(current_scene, target_scene)
+        scene_path = scene_graph.find_scene_path(current_scene, target_scene, self._get_feet_position())
         
         if not scene_path:
             print(f"      No path found from scene '{current_scene}' to '{target_scene}'")
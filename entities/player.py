@@ -5,6 +5,7 @@ from core.sprites import SpriteLoader
 from core.sprite_registry import get_sprite_config
 from core.collision_masks import CollisionMaskExtractor
 from entities.components.inventory import Inventory
+from world.prop_index import INTERACTION
 from entities.player_config import (
     PLAYER_HITBOX_WIDTH,
     PLAYER_HITBOX_HEIGHT,
@@ -26,6 +27,7 @@ class Player(Character):
         self.animations = {}
         self.collision_rects = []  # Will be set by scene
         self.props = []  # Scene props for collision/interact
+        self.prop_index = None  # Scene PropIndex used for prop collision/interact (set by scene)
         self.interact_prop = None  # Prop currently interactable under hitbox
         self.inventory = Inventory()  # Player inventory for items
         self.props = []  # List of props in the scene (set by scene)
@@ -125,42 +127,16 @@ class Player(Character):
         return anim
     
     def _rect_collides_with_props(self, rect: pygame.Rect) -> bool:
-        """Check if rect collides with any prop using pre-computed collision boxes."""
-        for prop in self.props:
-            # Skip picked-up items
-            if getattr(prop, 'picked_up', False):
-                continue
-            
-            # Get prop scale
-            prop_scale = getattr(prop, 'scale', 1.0)
-            
-            # Check collision rects (blocking areas)
-            if hasattr(prop, 'collision_rects'):
-                for collision_rect in prop.collision_rects:
-                    # Scale and position the rect
-                    scaled_rect = pygame.Rect(
-                        int(prop.x + collision_rect.x * prop_scale),
-                        int(prop.y + collision_rect.y * prop_scale),
-                        int(collision_rect.width * prop_scale),
-                        int(collision_rect.height * prop_scale)
-                    )
-                    if rect.colliderect(scaled_rect):
-                        return True
-            
-            # Check interaction rects (mark as interactable but don't block)
-            if hasattr(prop, 'interaction_rects'):
-                for interaction_rect in prop.interaction_rects:
-                    # Scale and position the rect
-                    scaled_rect = pygame.Rect(
-                        int(prop.x + interaction_rect.x * prop_scale),
-                        int(prop.y + interaction_rect.y * prop_scale),
-                        int(interaction_rect.width * prop_scale),
-                        int(interaction_rect.height * prop_scale)
-                    )
-                    if rect.colliderect(scaled_rect):
-                        self.interact_prop = prop
+        """Check if rect collides with any prop, using the scene's prop index."""
+        if self.prop_index is None:
+            return False
+        
+        # Interaction areas mark the prop as interactable but don't block
+        interact_prop = self.prop_index.first_prop(rect, INTERACTION)
+        if interact_prop is not None:
+            self.interact_prop = interact_prop
         
-        return False
+        return self.prop_index.collides(rect)
 
     def update(self, dt: float) -> None:
         # Reset interactable each frame
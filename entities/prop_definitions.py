@@ -0,0 +1,93 @@
+"""Shared, read-only prop variant data (flyweights).
+
+Every Prop that uses the same sprite sheet, mask sheet and variant points at one
+PropVariant holding the sliced sprite and mask, the visible bounds, the
+collision/interaction rects and any scaled copies of the sprite. These are built
+once per run, so creating, dropping, picking up or re-varianting a prop does no
+slicing or mask processing. Treat everything on a PropVariant as read-only.
+"""
+import pygame
+from typing import Optional
+from core.sprites import SpriteLoader
+from core.collision_masks import blocking_mask, white_mask, component_rects
+
+# (sprite_path, mask_path, variants, variant_index) -> PropVariant
+_variant_cache = {}
+# Lookup counters shown in the debug overlay
+_stats = {"hits": 0, "misses": 0}
+
+
+class PropVariant:
+    """Sprite and collision data for one variant of a prop sheet."""
+
+    __slots__ = ("sprite", "mask", "visible_rect", "collision_rects", "interaction_rects", "_scaled")
+
+    def __init__(self, sprite: pygame.Surface, mask: Optional[pygame.Surface]):
+        self.sprite = sprite
+        self.mask = mask
+        # Visible bounds ignore fully transparent padding (unscaled, relative to the prop)
+        self.visible_rect = sprite.get_bounding_rect(min_alpha=1)
+        # One rect per connected blocking / white region of the mask (unscaled)
+        if mask is not None:
+            self.collision_rects = tuple(component_rects(blocking_mask(mask)))
+            self.interaction_rects = tuple(component_rects(white_mask(mask)))
+        else:
+            self.collision_rects = ()
+            self.interaction_rects = ()
+        self._scaled = {}
+
+    def scaled_sprite(self, scale: float) -> pygame.Surface:
+        """Return the sprite scaled by scale, building it on first use."""
+        if scale == 1.0:
+            return self.sprite
+        scaled = self._scaled.get(scale)
+        if scaled is None:
+            size = (int(self.sprite.get_width() * scale), int(self.sprite.get_height() * scale))
+            scaled = pygame.transform.scale(self.sprite, size)
+            self._scaled[scale] = scaled
+        return scaled
+
+
+def get_prop_variant(assets, sprite_path: str, mask_path: str = None,
+                     variants: int = 1, variant_index: int = 0) -> Optional[PropVariant]:
+    """Get the shared variant data for a prop sheet, building it on a miss.
+
+    Returns None when there is no sprite to slice (no assets or no sprite path).
+    """
+    if assets is None or not sprite_path:
+        return None
+    variants = max(1, int(variants))
+    index = max(0, min(int(variant_index), variants - 1))
+    key = (sprite_path, mask_path, variants, index)
+    variant = _variant_cache.get(key)
+    if variant is not None:
+        _stats["hits"] += 1
+        return variant
+
+    _stats["misses"] += 1
+    loader = SpriteLoader(assets)
+    try:
+        sheet = assets.image(sprite_path)
+    except Exception as e:
+        print(f"Warning: Could not load prop sprite {sprite_path}: {e}")
+        sheet = pygame.Surface((64, 64))
+        sheet.fill((120, 120, 120))
+    mask = None
+    if mask_path:
+        try:
+            mask = loader.slice_variant(assets.image(mask_path), variants, index)
+        except Exception as e:
+            print(f"Warning: Could not load prop mask {mask_path}: {e}")
+    variant = PropVariant(loader.slice_variant(sheet, variants, index), mask)
+    _variant_cache[key] = variant
+    return variant
+
+
+def clear_prop_definitions() -> None:
+    """Drop all cached prop variants (e.g. after editing prop sheets)."""
+    _variant_cache.clear()
+
+
+def get_prop_definition_stats() -> dict:
+    """Return hit/miss counters and the number of cached variants."""
+    return {"hits": _stats["hits"], "misses": _stats["misses"], "entries": len(_variant_cache)}
@@ -5,10 +5,17 @@ from typing import Any, Optional
 from entities.player import Player
 from entities.npc import NPC
 from world.camera import Camera
-from world.mask_collision import MaskCollisionSystem
+from world.mask_cache import get_mask, get_mask_path, get_mask_cache_stats
 from world.world_props import get_props_for_scene
 from world.world_npcs import get_npcs_for_scene
 from entities.prop_registry import make_prop
+from entities.prop_definitions import get_prop_definition_stats
+from world.prop_index import PropIndex
+from ai.pathfinding import get_pathfinding_stats, get_path_cache_stats
+from ai.flow_field import get_flow_field_stats
+from ai.path_worker import get_path_worker_stats
+from ai.path_smoothing import get_smoothing_stats
+from ai.portal_queue import get_portal_queue_stats
 from world.scene_graph import register_scene_portals
 from settings import WINDOW_WIDTH, WINDOW_HEIGHT
 from entities.player_config import (
@@ -77,11 +84,10 @@ class MaskedScene:
             print(f"Warning: Could not load background {self.BACKGROUND_PATH}: {e}")
             self.background = None
         
-        # Auto-load collision mask
+        # Auto-load collision mask (shared compiled instance from the mask cache)
         mask_path = self._get_mask_path(self.BACKGROUND_PATH)
         try:
-            mask_img = game.assets.image(mask_path)
-            self.mask_system = MaskCollisionSystem(mask_img)
+            self.mask_system = get_mask(self.SCENE_NAME, mask_path, game.assets, self.scene_scale)
         except Exception as e:
             print(f"Warning: Could not load mask {mask_path}: {e}")
             self.mask_system = None
@@ -203,6 +209,7 @@ class MaskedScene:
         # Load props from world registry
         self._load_scene_props()
         self.player.props = self.props
+        self.player.prop_index = self.prop_index
         
         # Load NPCs from world registry
         self._load_scene_npcs()
@@ -213,6 +220,8 @@ class MaskedScene:
         
         if not hasattr(self, 'props'):
             self.props = []
+        if not hasattr(self, 'prop_index'):
+            self.prop_index = PropIndex()
         
         # Get props that are currently in this scene from the world registry
         props_in_scene = get_props_in_scene(self.scene_name)
@@ -222,15 +231,10 @@ class MaskedScene:
             if getattr(prop, 'picked_up', False):
                 continue
             
-            # Update prop's scene-level scaling if it changed
-            old_combined_scale = prop.scale
+            # Update prop's scene-level scaling (scaled sprites come from the shared variant cache)
             prop.scene_scale = self.scene_scale
             prop.scale = prop.base_scale * prop.scene_scale
             
-            # Rebuild variant surface if scale changed (will update sprite and collision boxes)
-            if prop.scale != old_combined_scale and hasattr(prop, '_rebuild_variant_surface'):
-                prop._rebuild_variant_surface()
-            
             # Don't re-add if already in the list
             if prop not in self.props:
                 self.props.append(prop)
@@ -252,6 +256,9 @@ class MaskedScene:
                     self.props.append(dropped_prop)
                 except Exception as e:
                     print(f"Warning: Could not respawn dropped item {dropped_item.get('name')}: {e}")
+        
+        # Index world-space prop rects for collision, interaction and click hit-tests
+        self.prop_index.rebuild(self.props)
     
     def _load_scene_npcs(self) -> None:
         """Load NPCs currently in this scene from the world registry."""
@@ -268,28 +275,18 @@ class MaskedScene:
             npc.scene = self
             npc.mask_system = self.mask_system
             npc.props = self.props
+            npc.prop_index = self.prop_index
 
             # If position is not walkable (e.g., off-screen warp), snap to nearest walkable spot
             if npc.mask_system:
                 feet_x, feet_y = npc._get_feet_position()
                 if not npc.mask_system.is_walkable(int(feet_x), int(feet_y)):
-                    found = False
-                    for radius in range(20, 141, 20):  # search up to ~140px
-                        for dx in range(-radius, radius + 1, 20):
-                            for dy in range(-radius, radius + 1, 20):
-                                test_x = feet_x + dx
-                                test_y = feet_y + dy
-                                if npc.mask_system.is_walkable(int(test_x), int(test_y)):
-                                    npc._set_position_from_feet(test_x, test_y)
-                                    if hasattr(npc, 'rect'):
-                                        npc.rect.topleft = (npc.x, npc.y)
-                                    print(f"NPC {getattr(npc, 'npc_id', 'unknown')} snapped to walkable ({int(test_x)}, {int(test_y)}) in {self.scene_name}")
-                                    found = True
-                                    break
-                            if found:
-                                break
-                        if found:
-                            break
+                    nearest = npc.mask_system.find_nearest_walkable(feet_x, feet_y, max_radius=140)
+                    if nearest is not None:
+                        npc._set_position_from_feet(*nearest)
+                        if hasattr(npc, 'rect'):
+                            npc.rect.topleft = (npc.x, npc.y)
+                        print(f"NPC {getattr(npc, 'npc_id', 'unknown')} snapped to walkable {nearest} in {self.scene_name}")
             
             # Update NPC's scene-level scaling if it changed
             old_combined_scale = npc.sprite_scale
@@ -365,10 +362,7 @@ class MaskedScene:
     
     def _get_mask_path(self, background_path: str) -> str:
         """Convert background path to mask path by inserting '_mask' before extension."""
-        if '.' in background_path:
-            parts = background_path.rsplit('.', 1)
-            return f"{parts[0]}_mask.png"
-        return f"{background_path}_mask.png"
+        return get_mask_path(background_path)
 
     def _interact_with_prop(self, prop: Any) -> None:
         """Handle prop interaction - pick up items or open modals for arcades."""
@@ -439,6 +433,7 @@ class MaskedScene:
             
             # Mark the prop as picked up so it doesn't show in the scene
             prop.picked_up = True
+            self.prop_index.remove_prop(prop)
             
             # Handle tracking differently for original vs dropped items
             if getattr(prop, 'is_dropped', False):
@@ -510,6 +505,7 @@ class MaskedScene:
             # Add to scene props
             if hasattr(self, 'props'):
                 self.props.append(dropped_prop)
+                self.prop_index.add_prop(dropped_prop)
                 # Update player's prop reference
                 if hasattr(self.player, 'props'):
                     self.player.props = self.props
@@ -532,63 +528,35 @@ class MaskedScene:
         except Exception as e:
             print(f"Failed to drop item {item_name}: {e}")
     
-    def _find_valid_drop_location(self, initial_x: float, initial_y: float, item_name: str, max_attempts: int = 20) -> tuple:
-        """Find a valid location to drop an item by searching in a spiral pattern around the initial position.
+    def _find_valid_drop_location(self, initial_x: float, initial_y: float, item_name: str, max_radius: int = 150) -> tuple:
+        """Find the nearest valid location to drop an item around the initial position.
+        
+        A location is valid when it is walkable on the collision mask and not within
+        15 pixels of another prop's collision box center.
         
         Returns: (x, y) tuple of a valid drop location
         """
-        import math
-        
-        # Check if a location is valid (not blocked by mask and not overlapping props)
-        def is_valid_drop_location(x, y):
-            # Check collision mask
-            if self.mask_system and not self.mask_system.is_walkable(int(x), int(y)):
-                return False
-            
-            # Check collision with other props
-            if hasattr(self, 'props'):
-                for prop in self.props:
-                    if prop.name == item_name and prop.x == initial_x and prop.y == initial_y:
-                        # Skip the prop we're currently dropping
-                        continue
-                    
-                    # Get prop collision rects
-                    if hasattr(prop, 'collision_rects') and prop.collision_rects:
-                        for collision_rect in prop.collision_rects:
-                            # Scale the rect according to prop scale
-                            prop_scale = getattr(prop, 'scale', 1.0)
-                            scaled_rect = collision_rect.copy()
-                            scaled_rect.x = int(prop.x + collision_rect.x * prop_scale)
-                            scaled_rect.y = int(prop.y + collision_rect.y * prop_scale)
-                            scaled_rect.width = int(collision_rect.width * prop_scale)
-                            scaled_rect.height = int(collision_rect.height * prop_scale)
-                            
-                            # Check if drop point is too close (within 15 pixels of collision box)
-                            if (abs(x - scaled_rect.centerx) < 15 and 
-                                abs(y - scaled_rect.centery) < 15):
-                                return False
-            
-            return True
-        
-        # Try initial position first
-        if is_valid_drop_location(initial_x, initial_y):
-            return (initial_x, initial_y)
+        # Keep-out boxes around the other props' collision boxes
+        keep_out = []
+        for prop in getattr(self, 'props', []):
+            if prop.name == item_name and prop.x == initial_x and prop.y == initial_y:
+                # Skip the prop we're currently dropping
+                continue
+            prop_scale = getattr(prop, 'scale', 1.0)
+            for collision_rect in getattr(prop, 'collision_rects', None) or []:
+                center_x = prop.x + (collision_rect.x + collision_rect.width / 2) * prop_scale
+                center_y = prop.y + (collision_rect.y + collision_rect.height / 2) * prop_scale
+                keep_out.append(pygame.Rect(int(center_x) - 14, int(center_y) - 14, 29, 29))
         
-        # Spiral search around initial position
-        for attempt in range(1, max_attempts):
-            # Create a spiral pattern: 4 points per "ring"
-            ring = (attempt - 1) // 4 + 1
-            step = 30 * ring  # Increase distance each ring
-            
-            # Try 8 directions in expanding rings
-            angles = [0, 45, 90, 135, 180, 225, 270, 315]
-            for angle_deg in angles:
-                angle_rad = math.radians(angle_deg)
-                test_x = initial_x + step * math.cos(angle_rad)
-                test_y = initial_y + step * math.sin(angle_rad)
-                
-                if is_valid_drop_location(test_x, test_y):
-                    return (test_x, test_y)
+        if not self.mask_system:
+            if not any(rect.collidepoint(initial_x, initial_y) for rect in keep_out):
+                return (initial_x, initial_y)
+        else:
+            nearest = self.mask_system.find_nearest_walkable(
+                initial_x, initial_y, max_radius=max_radius, exclude_rects=keep_out
+            )
+            if nearest is not None:
+                return nearest
         
         # Fallback: return initial position even if invalid (shouldn't happen in normal play)
         print(f"Warning: Could not find valid drop location for {item_name}, using initial position")
@@ -704,25 +672,11 @@ class MaskedScene:
             mx, my = event.pos
             world_x, world_y = mx + self.camera.x, my + self.camera.y
 
-            prop = self.current_interact_prop
-            prop_scale = getattr(prop, 'scale', 1.0)
-            
-            if hasattr(prop, 'sprite') and prop.sprite:
-                bbox = prop.sprite.get_bounding_rect(min_alpha=1)
-                # Account for scale when determining clickable area
-                scaled_width = int(bbox.width * prop_scale)
-                scaled_height = int(bbox.height * prop_scale)
-                scaled_x = int(bbox.x * prop_scale)
-                scaled_y = int(bbox.y * prop_scale)
-                prop_rect = pygame.Rect(prop.x + scaled_x, prop.y + scaled_y, scaled_width, scaled_height)
-            elif hasattr(prop, 'rect'):
-                prop_rect = prop.rect
-            else:
-                prop_rect = pygame.Rect(prop.x, prop.y, 1, 1)
-
-            if prop_rect.collidepoint(world_x, world_y):
-                self._interact_with_prop(prop)
-                return
+            # Clicks count anywhere on the interactable prop's visible sprite
+            for prop in self.prop_index.props_at(world_x, world_y):
+                if prop is self.current_interact_prop:
+                    self._interact_with_prop(prop)
+                    return
     
     def update(self, dt: float) -> None:
         # Freeze game world updates while modal is open; update modal if needed
@@ -938,6 +892,10 @@ class MaskedScene:
         # Draw HUD inventory at top of screen
         self._draw_inventory_hud(surface)
         
+        # Draw mask cache, nav grid, path search and path worker stats (debug)
+        if DEBUG_DRAW:
+            self._draw_debug_overlay(surface)
+        
         # Draw game clock in top-right corner
         if hasattr(self.game, 'game_time'):
             # Convert game_time (minutes since midnight) to hours and minutes
@@ -996,6 +954,33 @@ class MaskedScene:
                     hint = self.font.render("(ESC to close)", True, (180, 180, 180))
                     surface.blit(hint, (modal_x + 20, modal_y + 60))
     
+    def _draw_debug_overlay(self, surface: pygame.Surface) -> None:
+        """Draw debug statistics in the bottom-left corner."""
+        stats = get_mask_cache_stats()
+        prop_stats = get_prop_definition_stats()
+        path_stats = get_pathfinding_stats()
+        path_cache_stats = get_path_cache_stats()
+        flow_stats = get_flow_field_stats()
+        worker_stats = get_path_worker_stats()
+        smoothing_stats = get_smoothing_stats()
+        queue_stats = get_portal_queue_stats()
+        avg_expansions = path_stats['expansions'] // max(1, path_stats['searches'])
+        lines = [
+            f"Mask cache: {stats['hits']} hits / {stats['misses']} misses ({stats['entries']} masks)",
+            f"Prop variants: {prop_stats['hits']} hits / {prop_stats['misses']} misses ({prop_stats['entries']} variants)",
+            f"A*: {path_stats['searches']} searches, {avg_expansions} avg expansions, {path_stats['partial']} partial / {path_stats['failed']} failed",
+            f"Path cache: {path_cache_stats['hits']} hits / {path_cache_stats['misses']} misses ({path_cache_stats['entries']} paths)",
+            f"Flow fields: {flow_stats['builds']} builds, {flow_stats['repairs']} repairs ({flow_stats['repaired_cells']} cells)",
+            f"Path worker: {worker_stats['delivered']} delivered / {worker_stats['requests']} requests, {worker_stats['queued']} queued, {worker_stats['cancelled']} cancelled, {worker_stats['sync']} sync",
+            f"Smoothing: {smoothing_stats['paths']} paths, {smoothing_stats['waypoints_in']} -> {smoothing_stats['waypoints_out']} waypoints",
+            f"Portal queues: {queue_stats['waiting']} waiting, {queue_stats['joins']} joins, {queue_stats['bumped']} bumped, {queue_stats['expired']} expired",
+        ]
+        y = WINDOW_HEIGHT - 10 - len(lines) * 20
+        for line in lines:
+            text = self.font.render(line, True, (255, 255, 0))
+            surface.blit(text, (10, y))
+            y += 20
+    
     def _draw_inventory_hud(self, surface: pygame.Surface) -> None:
         """Draw 5 inventory slots at the top of the screen."""
         BOX_SIZE = 60
@@ -1162,6 +1147,7 @@ class MaskedScene:
                 npc.scene = active_scene
                 npc.mask_system = active_scene.mask_system
                 npc.props = active_scene.props
+                npc.prop_index = active_scene.prop_index
 
                 # Apply scene scaling and rebuild visuals/sprite/rect so NPC appears at correct size
                 self._rescale_and_update_npc(npc, active_scene)
@@ -1176,28 +1162,12 @@ class MaskedScene:
                     feet_x, feet_y = npc._get_feet_position()
                     if not npc.mask_system.is_walkable(int(feet_x), int(feet_y)):
                         print(f"NPC spawn at ({int(feet_x)}, {int(feet_y)}) not walkable, searching nearby...")
-                        found = False
-                        for offset_x in range(-100, 101, 20):
-                            for offset_y in range(-100, 101, 20):
-                                test_x = feet_x + offset_x
-                                test_y = feet_y + offset_y
-                                if npc.mask_system.is_walkable(int(test_x), int(test_y)):
-                                    # Move NPC to this walkable position using mask offsets if available
-                                    if hasattr(npc, 'mask_offset_x') and hasattr(npc, 'mask_offset_y'):
-                                        scaled_offset_x = int(npc.mask_offset_x * npc.sprite_scale)
-                                        scaled_offset_y = int(npc.mask_offset_y * npc.sprite_scale)
-                                        npc.x = test_x - scaled_offset_x
-                                        npc.y = test_y - scaled_offset_y
-                                    else:
-                                        npc.x = test_x
-                                        npc.y = test_y
-                                    if hasattr(npc, 'rect'):
-                                        npc.rect.topleft = (npc.x, npc.y)
-                                        print(f"Moved NPC to walkable position ({int(test_x)}, {int(test_y)})")
-                                    found = True
-                                    break
-                            if found:
-                                break
+                        nearest = npc.mask_system.find_nearest_walkable(feet_x, feet_y, max_radius=100)
+                        if nearest is not None:
+                            npc._set_position_from_feet(*nearest)
+                            if hasattr(npc, 'rect'):
+                                npc.rect.topleft = (npc.x, npc.y)
+                                print(f"Moved NPC to walkable position {nearest}")
 
                     # Log final feet position
                     feet_x, feet_y = npc._get_feet_position()
@@ -1211,11 +1181,13 @@ class MaskedScene:
                 # Scene not active: clear immediate pathfinding but preserve scene_path for cross-scene travel
                 npc.path = []
                 npc.destination = None
+                npc.cancel_path_request()
                 # Keep scene/mask_system/props cleared so state machine knows NPC is off-screen
                 # but DON'T clear scene_path - the NPC will resume travel when this scene loads
                 npc.scene = None
                 npc.mask_system = None
                 npc.props = []
+                npc.prop_index = None
                 # scene_path remains set, so when _load_scene_npcs() restores mask_system,
                 # the NPC can continue its cross-scene journey
         
@@ -0,0 +1,105 @@
+"""Shared fixtures: small synthetic scene masks and nav grids drawn from text."""
+import math
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+import pytest
+
+# Mask pixels per layout character (and nav grid cell size)
+CELL = 10
+
+# Layout character -> mask color ('#' wall, '.' floor, 'P' portal)
+_COLORS = {"#": (200, 0, 0, 255), ".": (0, 0, 0, 255), "P": (255, 255, 255, 255)}
+
+# Walled rooms with a few corridors, a pillar and a portal
+ROOMS = [
+    "##################",
+    "#......#.........#",
+    "#......#..####...#",
+    "#......#..#..#...#",
+    "#.........#..#...#",
+    "#......#..####...P",
+    "###.####.........#",
+    "#........######..#",
+    "#..####..#.......#",
+    "#..#..#..#..######",
+    "#.....#..........#",
+    "##################",
+]
+
+# Open floor with a thin wall that has one gap
+OPEN = [
+    "####################",
+    "#..................#",
+    "#..................#",
+    "#.........#........#",
+    "#.........#........#",
+    "#.........#........#",
+    "#.........#........#",
+    "#..................#",
+    "####################",
+]
+
+
+def make_mask(layout):
+    """MaskCollisionSystem drawn from a text layout, CELL pixels per character."""
+    from world.mask_collision import MaskCollisionSystem
+
+    surface = pygame.Surface((len(layout[0]) * CELL, len(layout) * CELL), pygame.SRCALPHA)
+    for y, row in enumerate(layout):
+        for x, char in enumerate(row):
+            surface.fill(_COLORS[char], (x * CELL, y * CELL, CELL, CELL))
+    return MaskCollisionSystem(surface)
+
+
+def make_grid(layout, name="test"):
+    """Fresh NavGrid over a text layout, one cell per character."""
+    from ai.nav_grid import NavGrid
+
+    return NavGrid(make_mask(layout), CELL, 1, name)
+
+
+def center(cx, cy):
+    """World position of a layout cell's center."""
+    return cx * CELL + CELL // 2, cy * CELL + CELL // 2
+
+
+def path_cost(path):
+    """Length of a waypoint path in cells."""
+    return sum(math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(path, path[1:])) / CELL
+
+
+def floor_cells(grid):
+    """Open cells of a grid, in row order."""
+    opens = grid.open_cells()
+    return [(i % grid.cols, i // grid.cols) for i in range(grid.cols * grid.rows) if opens[i]]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _pygame():
+    pygame.init()
+    yield
+    pygame.quit()
+
+
+@pytest.fixture(autouse=True)
+def _fresh_path_cache():
+    # Test grids share scene names and versions, so cached paths must not leak between tests
+    from ai.pathfinding import clear_path_cache
+
+    clear_path_cache()
+
+
+@pytest.fixture
+def rooms():
+    return make_grid(ROOMS, "rooms")
+
+
+@pytest.fixture
+def open_grid():
+    return make_grid(OPEN, "open")
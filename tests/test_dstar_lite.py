@@ -0,0 +1,86 @@
+import pygame
+
+from conftest import CELL, center, make_grid, path_cost
+from ai.dstar_lite import DStarLite
+from ai.pathfinding import Pathfinding, MODE_ASTAR
+
+# Found by fuzzing: float keys of equal cost used to end a repair before the start's cost was raised
+TIES = [
+    "#####################",
+    "#.....#............##",
+    "#................#.##",
+    "#....#..#....###..#.#",
+    "#........#..........#",
+    "#.#.........#...##..#",
+    "#...#..##.##..#....##",
+    "#.#....##.#....#...##",
+    "#####################",
+]
+
+# Found by fuzzing: a walk of starts with props added and removed along the way
+WALK = [
+    "################",
+    "#......#....#..#",
+    "#.#.##.#..#.#..#",
+    "#....#........##",
+    "##...#.........#",
+    "#.........#....#",
+    "#.#.#..........#",
+    "##...#...#.#...#",
+    "#.#...#.#..#...#",
+    "#............#.#",
+    "################",
+]
+WALK_STEPS = [
+    ("plan", (14, 4)), ("plan", (14, 4)), ("add", (120, 50, 10, 20)), ("plan", (12, 8)), ("plan", (12, 8)),
+    ("remove", (120, 50, 10, 20)), ("plan", (8, 6)), ("plan", (8, 6)), ("add", (10, 90, 10, 10)),
+    ("plan", (10, 3)), ("add", (70, 90, 20, 20)), ("plan", (10, 3)), ("add", (140, 50, 10, 10)),
+    ("plan", (10, 3)), ("plan", (9, 8)),
+]
+
+
+def _astar_cost(grid, start_cell, goal_cell):
+    path = Pathfinding(CELL, mode=MODE_ASTAR).astar(grid, center(*start_cell), center(*goal_cell))
+    return path_cost(path)
+
+
+def test_repair_after_prop_change_matches_astar(rooms):
+    planner = DStarLite(rooms, (16, 10))
+    assert path_cost(planner.plan((1, 1))) == _astar_cost(rooms, (1, 1), (16, 10))
+    # Block the corridor the first path takes
+    rooms.add_prop_rect(pygame.Rect(8 * CELL, 8 * CELL, CELL, CELL))
+    cost = path_cost(planner.plan((1, 1)))
+    assert cost > 23
+    assert abs(cost - _astar_cost(rooms, (1, 1), (16, 10))) < 1e-9
+    assert planner.last_expansions > 0
+
+
+def test_equal_cost_ties_do_not_stop_a_repair_early():
+    grid = make_grid(TIES)
+    planner = DStarLite(grid, (13, 5))
+    planner.plan((7, 1))
+    planner.plan((9, 1))
+    grid.add_prop_rect(pygame.Rect(130, 20, 20, 20))
+    assert abs(path_cost(planner.plan((9, 1))) - _astar_cost(grid, (9, 1), (13, 5))) < 1e-9
+
+
+def test_moving_start_with_prop_changes_matches_astar():
+    grid = make_grid(WALK)
+    planner = DStarLite(grid, (3, 9))
+    for action, value in WALK_STEPS:
+        if action == "add":
+            grid.add_prop_rect(pygame.Rect(value))
+        elif action == "remove":
+            grid.remove_prop_rect(pygame.Rect(value))
+        else:
+            assert abs(path_cost(planner.plan(value)) - _astar_cost(grid, value, (3, 9))) < 1e-9
+
+
+def test_plans_follow_newer_snapshots(rooms):
+    planner = DStarLite(rooms.snapshot(), (16, 10))
+    path = planner.plan((1, 1))
+    assert path_cost(path) == _astar_cost(rooms, (1, 1), (16, 10))
+    # A later plan repairs the same search on a snapshot taken after a prop change
+    rooms.add_prop_rect(pygame.Rect(8 * CELL, 8 * CELL, CELL, CELL))
+    path = planner.plan((1, 1), rooms.snapshot())
+    assert abs(path_cost(path) - _astar_cost(rooms, (1, 1), (16, 10))) < 1e-9
@@ -0,0 +1,46 @@
+import math
+
+import pygame
+
+from conftest import CELL, center, floor_cells, path_cost
+from ai.flow_field import FlowField, get_portal_flow_field
+from ai.pathfinding import Pathfinding, MODE_ASTAR
+
+PORTAL = (17, 5)
+
+
+def _assert_matches_astar(grid, field):
+    astar = Pathfinding(CELL, mode=MODE_ASTAR)
+    for cell in floor_cells(grid):
+        path = field.path_from(center(*cell))
+        expected = astar.astar(grid, center(*cell), center(*PORTAL))
+        reached = bool(expected) and expected[-1] == center(*PORTAL)
+        assert bool(path) == reached, cell
+        if reached:
+            assert abs(path_cost(path) - path_cost(expected)) < 1e-6, cell
+            assert abs(field.cost_from(cell) - path_cost(path)) < 1e-6, cell
+        else:
+            assert field.cost_from(cell) == math.inf
+
+
+def test_field_costs_match_astar(rooms):
+    field = get_portal_flow_field(rooms, *center(*PORTAL))
+    assert field is not None and field.goal == PORTAL
+    _assert_matches_astar(rooms, field)
+    assert get_portal_flow_field(rooms, *center(1, 1)) is None
+
+
+def test_field_is_repaired_after_prop_changes(rooms):
+    field = get_portal_flow_field(rooms, *center(*PORTAL))
+    # Block a corridor, then open it again and block another
+    corridor = pygame.Rect(8 * CELL, 8 * CELL, CELL, CELL)
+    rooms.add_prop_rect(corridor)
+    assert get_portal_flow_field(rooms, *center(*PORTAL)) is field
+    _assert_matches_astar(rooms, field)
+    rooms.move_prop_rects([corridor], [pygame.Rect(12 * CELL, 6 * CELL, CELL, CELL)])
+    assert get_portal_flow_field(rooms, *center(*PORTAL)) is field
+    _assert_matches_astar(rooms, field)
+    fresh = FlowField(rooms, PORTAL)
+    for cell in floor_cells(rooms):
+        assert field.cost_from(cell) == fresh.cost_from(cell) or \
+            abs(field.cost_from(cell) - fresh.cost_from(cell)) < 1e-6
@@ -0,0 +1,216 @@
+import random
+
+import pygame
+
+from world.mask_collision import CELL_BLOCKED, CELL_PORTAL_BASE, MAX_CLEARANCE, MaskCollisionSystem
+
+BLACK = (0, 0, 0, 255)
+WHITE = (255, 255, 255, 255)
+RED = (200, 0, 0, 255)
+
+
+def _mask_from_pixels(pixels):
+    """MaskCollisionSystem from rows of pixel characters ('#' wall, '.' floor, 'P' portal)."""
+    colors = {"#": RED, ".": BLACK, "P": WHITE}
+    surface = pygame.Surface((len(pixels[0]), len(pixels)), pygame.SRCALPHA)
+    for y, row in enumerate(pixels):
+        for x, char in enumerate(row):
+            surface.set_at((x, y), colors[char])
+    return MaskCollisionSystem(surface)
+
+
+def _random_pixels(seed, width=48, height=40, portal_blobs=12):
+    """Floor scattered with walls and white blobs that touch, nest and wrap around each other."""
+    rng = random.Random(seed)
+    pixels = [[rng.choice("..#") for _ in range(width)] for _ in range(height)]
+    for _ in range(portal_blobs):
+        x, y = rng.randrange(width), rng.randrange(height)
+        for _ in range(rng.randrange(5, 40)):
+            pixels[y][x] = "P"
+            dx, dy = rng.choice(((1, 0), (-1, 0), (0, 1), (0, -1)))
+            x = min(max(x + dx, 0), width - 1)
+            y = min(max(y + dy, 0), height - 1)
+    return ["".join(row) for row in pixels]
+
+
+def _flood_regions(pixels):
+    """Reference labelling: 4-connected portal regions by flood fill, numbered in scanline order."""
+    width, height = len(pixels[0]), len(pixels)
+    seen = set()
+    regions = []
+    for y in range(height):
+        for x in range(width):
+            if pixels[y][x] != "P" or (x, y) in seen:
+                continue
+            seen.add((x, y))
+            stack, cells = [(x, y)], []
+            while stack:
+                cx, cy = stack.pop()
+                cells.append((cx, cy))
+                for nx, ny in ((cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)):
+                    if 0 <= nx < width and 0 <= ny < height and pixels[ny][nx] == "P" and (nx, ny) not in seen:
+                        seen.add((nx, ny))
+                        stack.append((nx, ny))
+            regions.append(cells)
+    return regions
+
+
+def _check_portals(pixels):
+    mask = _mask_from_pixels(pixels)
+    regions = _flood_regions(pixels)
+    assert sorted(mask.portal_regions) == list(range(len(regions)))
+    for portal_id, cells in enumerate(regions):
+        xs = [x for x, _ in cells]
+        ys = [y for _, y in cells]
+        region = mask.portal_regions[portal_id]
+        assert region.bounds == (min(xs), min(ys), max(xs) - min(xs) + 1, max(ys) - min(ys) + 1)
+        assert region.pixel_count == len(cells)
+        assert region.centroid == (sum(xs) / len(cells), sum(ys) / len(cells))
+        assert mask.get_portal_bounds(portal_id) == pygame.Rect(region.bounds)
+        for x, y in cells:
+            assert mask.is_portal(x, y) == portal_id
+    for y, row in enumerate(pixels):
+        for x, char in enumerate(row):
+            if char != "P":
+                assert mask.is_portal(x, y) is None
+                assert (mask.raster[y * mask.width + x] == CELL_BLOCKED) == (char == "#")
+    return mask
+
+
+def test_merged_runs_keep_scanline_ids():
+    # Both regions are U shapes whose arms start as separate runs and only join
+    # further down; region 1's left arm starts below and left of its first pixel
+    mask = _check_portals([
+        "P...P......",
+        "P...P....P.",
+        "PPPPP....P.",
+        "......P..P.",
+        "......PPPP.",
+        "...........",
+        "P.#........",
+    ])
+    assert mask.raster[0] == CELL_PORTAL_BASE
+    assert mask.is_portal(6, 3) == 1
+    assert mask.is_portal(0, 6) == 2
+
+
+def test_portal_labels_match_flood_fill():
+    for seed in range(20):
+        _check_portals(_random_pixels(seed))
+
+
+def _random_rects(rng, mask, count=400):
+    """Rects of every size, some reaching past the mask edges, plus zero-size ones."""
+    for _ in range(count):
+        left = rng.randrange(-6, mask.width + 2)
+        top = rng.randrange(-6, mask.height + 2)
+        yield pygame.Rect(left, top, rng.randrange(0, 16), rng.randrange(0, 16))
+
+
+def _scanned_pixels(mask, rect):
+    """Pixels a rect query covers: zero-size rects still test their corner pixel."""
+    right = max(rect.right, rect.left + 1)
+    bottom = max(rect.bottom, rect.top + 1)
+    return [(x, y) for y in range(rect.top, bottom) for x in range(rect.left, right)]
+
+
+def test_rect_queries_match_pixel_scan():
+    rng = random.Random(5)
+    for seed in range(5):
+        mask = _mask_from_pixels(_random_pixels(seed))
+        for rect in _random_rects(rng, mask):
+            pixels = _scanned_pixels(mask, rect)
+            blocked = sum(1 for x, y in pixels if not mask.is_walkable(x, y))
+            if rect.width and rect.height:
+                assert mask.count_blocked(rect.left, rect.top, rect.right, rect.bottom) == blocked
+            assert mask.rect_collides(rect) == (blocked > 0)
+            touching = {mask.is_portal(x, y) for x, y in pixels} - {None}
+            assert mask.rect_in_portal(rect) == (min(touching) if touching else None)
+
+
+def _chessboard_clearance(pixels):
+    """Reference clearance: chessboard distance to the nearest wall pixel or the outside of the mask."""
+    width, height = len(pixels[0]), len(pixels)
+    walls = [(x, y) for y in range(height) for x in range(width) if pixels[y][x] == "#"]
+    out = []
+    for y in range(height):
+        for x in range(width):
+            if pixels[y][x] == "#":
+                out.append(0)
+                continue
+            nearest = min(x + 1, y + 1, width - x, height - y)
+            for wx, wy in walls:
+                nearest = min(nearest, max(abs(wx - x), abs(wy - y)))
+            out.append(nearest)
+    return out
+
+
+def test_clearance_matches_chessboard_distance():
+    for seed in range(3):
+        pixels = _random_pixels(seed, 30, 24)
+        # Sparser walls leave room for larger clearances
+        pixels = [row.replace("#", ".", row.count("#") - 1) for row in pixels]
+        mask = _mask_from_pixels(pixels)
+        expected = _chessboard_clearance(pixels)
+        assert list(mask.clearance) == expected
+        for y in range(mask.height):
+            for x in range(mask.width):
+                clearance = expected[y * mask.width + x]
+                assert mask.clearance_at(x, y) == clearance
+                assert mask.has_clearance(x, y, 2) == (clearance > 2)
+    assert mask.clearance_at(-1, 0) == 0
+    assert mask.clearance_at(0, mask.height) == 0
+
+
+def test_clearance_is_capped():
+    surface = pygame.Surface((2 * MAX_CLEARANCE + 12, 2 * MAX_CLEARANCE + 12), pygame.SRCALPHA)
+    surface.fill(BLACK)
+    mask = MaskCollisionSystem(surface)
+    middle = MAX_CLEARANCE + 6
+    assert mask.clearance_at(middle, middle) == MAX_CLEARANCE
+    assert mask.clearance_at(MAX_CLEARANCE - 1, middle) == MAX_CLEARANCE
+    assert mask.clearance_at(MAX_CLEARANCE - 2, middle) == MAX_CLEARANCE - 1
+    assert mask.clearance_at(0, middle) == 1
+
+
+def _nearest_by_scan(mask, x, y, max_radius, exclude_portals, min_clearance, exclude_rects):
+    """Reference: squared distance to the closest accepted pixel in the max_radius square, or None."""
+    best = None
+    for py in range(max(y - max_radius, 0), min(y + max_radius + 1, mask.height)):
+        for px in range(max(x - max_radius, 0), min(x + max_radius + 1, mask.width)):
+            if not mask.is_walkable(px, py) or (exclude_portals and mask.is_portal(px, py) is not None):
+                continue
+            if min_clearance and not mask.has_clearance(px, py, min_clearance):
+                continue
+            if any(rect.collidepoint(px, py) for rect in exclude_rects):
+                continue
+            dist_sq = (px - x) ** 2 + (py - y) ** 2
+            if best is None or dist_sq < best:
+                best = dist_sq
+    return best
+
+
+def test_nearest_walkable_matches_exhaustive_search():
+    rng = random.Random(7)
+    pixels = _random_pixels(7, 60, 50)
+    # Carve a walled block so some queries start far from any floor
+    pixels = [row[:20] + "#" * 25 + row[45:] if 10 <= y < 40 else row for y, row in enumerate(pixels)]
+    mask = _mask_from_pixels(pixels)
+    for _ in range(300):
+        x, y = rng.randrange(-5, mask.width + 5), rng.randrange(-5, mask.height + 5)
+        max_radius = rng.choice((0, 3, 8, 20))
+        exclude_portals = rng.random() < 0.5
+        min_clearance = rng.choice((0, 0, 1, 2))
+        exclude_rects = [pygame.Rect(rng.randrange(mask.width), rng.randrange(mask.height), 6, 6)
+                         for _ in range(rng.randrange(3))]
+        found = mask.find_nearest_walkable(x, y, max_radius, exclude_portals, min_clearance, exclude_rects)
+        expected = _nearest_by_scan(mask, x, y, max_radius, exclude_portals, min_clearance, exclude_rects)
+        if expected is None:
+            assert found is None
+            continue
+        px, py = found
+        assert (px - x) ** 2 + (py - y) ** 2 == expected
+        assert mask.is_walkable(px, py)
+        assert not exclude_portals or mask.is_portal(px, py) is None
+        assert not min_clearance or mask.has_clearance(px, py, min_clearance)
+        assert not any(rect.collidepoint(px, py) for rect in exclude_rects)
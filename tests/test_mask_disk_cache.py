@@ -0,0 +1,86 @@
+import mmap
+
+import pytest
+
+from conftest import ROOMS, make_mask
+from world import mask_disk_cache
+from world.mask_collision import MaskCollisionSystem
+
+
+@pytest.fixture(autouse=True)
+def _cache_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(mask_disk_cache, "CACHE_ROOT", tmp_path)
+
+
+def _entry(key="abc-s1"):
+    return mask_disk_cache._entry_path("rooms", key)
+
+
+def test_round_trip_restores_compiled_mask():
+    mask = make_mask(ROOMS)
+    mask_disk_cache.save_sections("rooms", "abc-s1", mask.to_sections())
+    sections = mask_disk_cache.load_sections("rooms", "abc-s1")
+    loaded = MaskCollisionSystem.from_sections(sections)
+    assert (loaded.width, loaded.height) == (mask.width, mask.height)
+    assert bytes(loaded.raster) == mask.raster
+    assert bytes(loaded.clearance) == mask.clearance
+    assert loaded.portal_regions == mask.portal_regions
+    assert list(loaded.blocked_sat) == list(mask.blocked_sat)
+    for portal_id, table in mask.portal_sats.items():
+        assert list(loaded.portal_sats[portal_id]) == list(table)
+    assert loaded.to_sections() == mask.to_sections()
+
+
+def test_new_entry_replaces_stale_one():
+    sections = make_mask(ROOMS).to_sections()
+    mask_disk_cache.save_sections("rooms", "abc-s1", sections)
+    mask_disk_cache.save_sections("rooms", "def-s1", sections)
+    assert not _entry("abc-s1").exists()
+    assert mask_disk_cache.load_sections("rooms", "abc-s1") is None
+    assert mask_disk_cache.load_sections("rooms", "def-s1") is not None
+
+
+def test_version_mismatch_is_a_miss(monkeypatch):
+    mask_disk_cache.save_sections("rooms", "abc-s1", make_mask(ROOMS).to_sections())
+    data = bytearray(_entry().read_bytes())
+    mask_disk_cache._HEADER.pack_into(data, 0, mask_disk_cache.MAGIC, mask_disk_cache.CACHE_VERSION + 1,
+                                      *mask_disk_cache._HEADER.unpack_from(data, 0)[2:])
+    _entry().write_bytes(bytes(data))
+    assert mask_disk_cache.load_sections("rooms", "abc-s1") is None
+
+    # Bumping CACHE_VERSION moves the cache to a fresh directory
+    monkeypatch.setattr(mask_disk_cache, "CACHE_VERSION", mask_disk_cache.CACHE_VERSION + 1)
+    assert mask_disk_cache.load_sections("rooms", "abc-s1") is None
+
+
+def test_corrupt_entries_are_misses(monkeypatch):
+    mask_disk_cache.save_sections("rooms", "abc-s1", make_mask(ROOMS).to_sections())
+    mapped = []
+    real_mmap = mmap.mmap
+
+    def recording_mmap(*args, **kwargs):
+        mapped.append(real_mmap(*args, **kwargs))
+        return mapped[-1]
+
+    monkeypatch.setattr(mmap, "mmap", recording_mmap)
+    data = _entry().read_bytes()
+
+    # Truncated inside a section
+    _entry().write_bytes(data[:len(data) // 2])
+    assert mask_disk_cache.load_sections("rooms", "abc-s1") is None
+
+    # Too short for the header
+    _entry().write_bytes(data[:6])
+    assert mask_disk_cache.load_sections("rooms", "abc-s1") is None
+
+    # Empty file (cannot be mapped)
+    _entry().write_bytes(b"")
+    assert mask_disk_cache.load_sections("rooms", "abc-s1") is None
+
+    # Entry written for another key
+    _entry().write_bytes(data.replace(b"abc-s1", b"xyz-s1", 1))
+    assert mask_disk_cache.load_sections("rooms", "abc-s1") is None
+
+    # Every miss closed its mapping (the empty file was never mapped)
+    assert len(mapped) == 3
+    assert all(entry.closed for entry in mapped)
@@ -0,0 +1,66 @@
+import pygame
+
+from conftest import CELL, center
+
+
+def test_prop_rect_blocks_and_unblocks_cells(rooms):
+    rect = pygame.Rect(2 * CELL, 2 * CELL, CELL, CELL)
+    assert rooms.is_passable(2, 2)
+    rooms.add_prop_rect(rect)
+    assert not rooms.is_passable(2, 2)
+    rooms.remove_prop_rect(rect)
+    assert rooms.is_passable(2, 2)
+
+
+def test_set_prop_rects_is_one_change(rooms):
+    version = rooms.version
+    rects = [pygame.Rect(CELL + i, CELL, 2, 2) for i in range(100)]
+    rooms.set_prop_rects(rects)
+    assert rooms.version == version + 1
+    assert rooms.changes_since(version) == [(0, 0, rooms.cols - 1, rooms.rows - 1)]
+    assert not rooms.is_passable(1, 1)
+
+
+def test_prop_counts_saturate_instead_of_overflowing(rooms):
+    rect = pygame.Rect(*center(3, 3), 1, 1)
+    rooms.set_prop_rects([rect] * 300)
+    rooms.add_prop_rect(rect)
+    assert not rooms.is_passable(3, 3)
+
+
+class Prop:
+    def __init__(self, x, y):
+        self.x, self.y, self.scale = x, y, 1.0
+        self.collision_rects = [pygame.Rect(0, 0, 4, 4)]
+        self.interaction_rects = []
+        self.visible_rect = self.rect = None
+
+
+def test_prop_index_rebuild_updates_grid_once(rooms):
+    from world.prop_index import PropIndex
+
+    index = PropIndex()
+    index.attach_nav_grid(rooms)
+    props = [Prop(CELL * (1 + i % 5), CELL) for i in range(80)]
+    version = rooms.version
+    index.rebuild(props)
+    assert rooms.version == version + 1
+    assert rooms.changes_since(version) is not None
+    assert not rooms.is_passable(1, 1)
+
+
+def test_moved_prop_is_one_change(rooms):
+    from world.prop_index import PropIndex
+
+    index = PropIndex()
+    index.attach_nav_grid(rooms)
+    prop = Prop(*center(2, 2))
+    index.add_prop(prop)
+    version = rooms.version
+    prop.x, prop.y = center(4, 4)
+    index.update_prop(prop)
+    assert rooms.version == version + 1
+    assert rooms.is_passable(2, 2) and not rooms.is_passable(4, 4)
+    # Re-indexing a prop that did not move changes nothing
+    index.update_prop(prop)
+    assert rooms.version == version + 1
@@ -0,0 +1,62 @@
+import math
+
+import pygame
+
+from conftest import CELL, center, floor_cells, path_cost
+from ai.navmesh import get_navmesh
+from ai.pathfinding import Pathfinding, MODE_ASTAR, MODE_NAVMESH
+
+
+def _inside_open_cells(grid, a, b):
+    """True if every point of the segment a-b lies in an open cell or on the edge of one."""
+    opens = grid.open_cells()
+    steps = int(max(abs(b[0] - a[0]), abs(b[1] - a[1]))) * 4 + 1
+    for k in range(steps + 1):
+        x = a[0] + (b[0] - a[0]) * k / steps
+        y = a[1] + (b[1] - a[1]) * k / steps
+        # Points on a cell border may lean either way
+        xs = {math.floor(x / CELL - 1e-6), math.floor(x / CELL + 1e-6)}
+        ys = {math.floor(y / CELL - 1e-6), math.floor(y / CELL + 1e-6)}
+        if not any(grid.in_bounds(cx, cy) and opens[cy * grid.cols + cx] for cx in xs for cy in ys):
+            return False
+    return True
+
+
+def _compare_with_astar(grid):
+    astar = Pathfinding(CELL, mode=MODE_ASTAR)
+    navmesh = Pathfinding(CELL, mode=MODE_NAVMESH)
+    cells = floor_cells(grid)
+    ratios = []
+    for start in cells[::4]:
+        for goal in cells[::5]:
+            expected = astar.astar(grid, center(*start), center(*goal))
+            path = navmesh.navmesh(grid, center(*start), center(*goal))
+            reached = bool(expected) and expected[-1] == center(*goal)
+            assert bool(path) == reached, (start, goal)
+            if not reached:
+                continue
+            assert path[0] == center(*start) and path[-1] == center(*goal)
+            assert all(_inside_open_cells(grid, a, b) for a, b in zip(path, path[1:])), (start, goal)
+            direct = math.dist(center(*start), center(*goal)) / CELL
+            assert path_cost(path) >= direct - 1e-9
+            if start != goal:
+                ratios.append(path_cost(path) / path_cost(expected))
+    return ratios
+
+
+def test_navmesh_reaches_what_astar_reaches(rooms, open_grid):
+    for grid in (rooms, open_grid):
+        ratios = _compare_with_astar(grid)
+        # Any-angle paths beat grid paths on the whole; the polygon search may
+        # pick a longer corridor now and then (see Pathfinding.navmesh)
+        assert sum(ratios) / len(ratios) < 1.0
+        assert max(ratios) < 4 / 3
+
+
+def test_navmesh_rebuilt_after_prop_changes(open_grid):
+    mesh = get_navmesh(open_grid)
+    assert get_navmesh(open_grid) is mesh
+    # Close the gap below the wall
+    open_grid.add_prop_rect(pygame.Rect(10 * CELL, 7 * CELL, CELL, CELL))
+    assert get_navmesh(open_grid) is not mesh
+    _compare_with_astar(open_grid)
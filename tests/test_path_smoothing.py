@@ -0,0 +1,49 @@
+import pygame
+
+from conftest import CELL, center, floor_cells, path_cost
+from ai.path_smoothing import line_of_sight, smooth_path
+from ai.pathfinding import Pathfinding, MODE_ASTAR, MODE_JPS
+
+
+def test_smoothed_paths_keep_ends_and_sight(rooms):
+    astar = Pathfinding(CELL, mode=MODE_ASTAR)
+    cells = floor_cells(rooms)
+    for start in cells[::5]:
+        for goal in cells[::6]:
+            path = astar.astar(rooms, center(*start), center(*goal))
+            smoothed = smooth_path(rooms, list(path))
+            assert bool(smoothed) == bool(path)
+            if len(path) < 3:
+                assert smoothed == path
+                continue
+            assert smoothed[0] == path[0] and smoothed[-1] == path[-1]
+            # Only grid waypoints are kept, in order
+            remaining = iter(path)
+            assert all(point in remaining for point in smoothed)
+            assert all(line_of_sight(rooms, a, b) for a, b in zip(smoothed, smoothed[1:]))
+            assert path_cost(smoothed) <= path_cost(path) + 1e-9
+
+
+def test_line_of_sight_blocked_by_walls_and_props(open_grid):
+    left, right = center(5, 4), center(15, 4)
+    assert not line_of_sight(open_grid, left, right)
+    assert line_of_sight(open_grid, center(5, 2), center(15, 2))
+    # No cutting the corner at the end of the wall
+    assert not line_of_sight(open_grid, center(10, 7), center(11, 6))
+    assert line_of_sight(open_grid, center(10, 7), center(11, 7))
+    open_grid.add_prop_rect(pygame.Rect(10 * CELL, 2 * CELL, CELL, CELL))
+    assert not line_of_sight(open_grid.snapshot(), center(5, 2), center(15, 2))
+
+
+def test_smooth_find_path_costs_no_more_than_astar(rooms):
+    astar = Pathfinding(CELL, mode=MODE_ASTAR)
+    smooth = Pathfinding(CELL, mode=MODE_JPS, smooth=True)
+    cells = floor_cells(rooms)
+    for start in cells[::6]:
+        for goal in cells[::7]:
+            expected = astar.astar(rooms, center(*start), center(*goal))
+            path = smooth.find_path(rooms, center(*start), center(*goal))
+            assert bool(path) == bool(expected)
+            if path:
+                assert path[0] == expected[0] and path[-1] == expected[-1]
+                assert path_cost(path) <= path_cost(expected) + 1e-9
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pygame
+
+from conftest import CELL, center, make_grid
+from ai.path_worker import PathRequest, PathWorker, get_path_worker_stats
+from ai.pathfinding import Pathfinding, MODE_ASTAR, MODE_JPS, clear_path_cache
+
+# Wide open floor with a walled-in pocket, so a search for the pocket's
+# center expands the whole floor before giving up
+BIG = (["#" * 120]
+       + ["#" + "." * 118 + "#"] * 114
+       + ["#" + "." * 113 + "###" + "." * 2 + "#",
+          "#" + "." * 113 + "#.#" + "." * 2 + "#",
+          "#" + "." * 113 + "###" + "." * 2 + "#"]
+       + ["#" + "." * 118 + "#"] * 2
+       + ["#" * 120])
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline
+        time.sleep(0.001)
+
+
+class _GatedPathfinding(Pathfinding):
+    """Pathfinding whose searches wait for the test to release them."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.released = None
+
+    def _search(self, *args):
+        self.started.set()
+        self.released = self.release.wait(10)
+        return super()._search(*args)
+
+
+def test_main_thread_not_blocked_by_search():
+    grid = make_grid(BIG, "big")
+    clear_path_cache()
+    worker = PathWorker(use_thread=True)
+    results = []
+    pathfinder = _GatedPathfinding(CELL, mode=MODE_ASTAR)
+    request = worker.submit(PathRequest(pathfinder, grid, center(1, 1), center(115, 116), False, results.append))
+    stale = get_path_worker_stats()["stale"]
+
+    # While the worker is inside its search, cache lookups and prop changes go through
+    assert pathfinder.started.wait(10)
+    Pathfinding(CELL, mode=MODE_ASTAR).lookup(grid, center(1, 1), center(5, 5))
+    grid.add_prop_rect(pygame.Rect(center(50, 50), (CELL, CELL)))
+    assert request.path is None
+    pathfinder.release.set()
+
+    # The result was searched before the prop change, so it is searched again before delivery
+    _wait_for(lambda: worker.deliver() or results)
+    assert pathfinder.released
+    assert get_path_worker_stats()["stale"] == stale + 1
+    assert request.version == grid.version
+    assert request.nav_grid.prop_blocks == bytes(grid.prop_blocks)
+
+
+def test_worker_only_reads_prepared_tables():
+    grid = make_grid(BIG, "big")
+    clear_path_cache()
+    worker = PathWorker(use_thread=True)
+    results = []
+    request = worker.submit(PathRequest(Pathfinding(CELL, mode=MODE_JPS, smooth=True), grid,
+                                        center(1, 1), center(100, 100), False, results.append))
+    snapshot = request.nav_grid
+    tables = dict(snapshot._jump_tables)
+    assert False in tables
+
+    _wait_for(lambda: worker.deliver() or results)
+    assert request.path
+    assert snapshot._jump_tables == tables
+    assert all(snapshot._jump_tables[key] is value for key, value in tables.items())
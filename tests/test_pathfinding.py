@@ -0,0 +1,140 @@
+import heapq
+import math
+
+import pygame
+
+from conftest import CELL, center, floor_cells, path_cost
+from ai.pathfinding import Pathfinding, MODE_ASTAR, MODE_JPS, DIAGONAL_COST, get_path_cache_stats
+
+
+def _dijkstra(grid, start):
+    """Reference walking costs from a cell: 8 directions, no corner cutting."""
+    opens = grid.open_cells()
+
+    def is_open(x, y):
+        return 0 <= x < grid.cols and 0 <= y < grid.rows and opens[y * grid.cols + x]
+
+    dist = {start: 0.0}
+    heap = [(0.0, start)]
+    while heap:
+        d, (x, y) = heapq.heappop(heap)
+        if d > dist[(x, y)]:
+            continue
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                nx, ny = x + dx, y + dy
+                if (dx, dy) == (0, 0) or not is_open(nx, ny):
+                    continue
+                if dx and dy and not (is_open(x + dx, y) and is_open(x, y + dy)):
+                    continue
+                nd = d + (DIAGONAL_COST if dx and dy else 1.0)
+                if nd < dist.get((nx, ny), math.inf):
+                    dist[(nx, ny)] = nd
+                    heapq.heappush(heap, (nd, (nx, ny)))
+    return dist
+
+
+def _is_walk(grid, path):
+    """True if every step is to a neighbouring open cell without cutting a corner."""
+    opens = grid.open_cells()
+    for a, b in zip(path, path[1:]):
+        (ax, ay), (bx, by) = (a[0] // CELL, a[1] // CELL), (b[0] // CELL, b[1] // CELL)
+        if max(abs(bx - ax), abs(by - ay)) != 1 or not opens[by * grid.cols + bx]:
+            return False
+        if ax != bx and ay != by and not (opens[ay * grid.cols + bx] and opens[by * grid.cols + ax]):
+            return False
+    return True
+
+
+def test_astar_costs_are_optimal(rooms):
+    astar = Pathfinding(CELL, mode=MODE_ASTAR)
+    cells = floor_cells(rooms)
+    for start in cells[::7]:
+        dist = _dijkstra(rooms, start)
+        for goal in cells[::5]:
+            path = astar.astar(rooms, center(*start), center(*goal))
+            if goal in dist:
+                assert not astar.last_partial and path[-1] == center(*goal)
+                assert abs(path_cost(path) - dist[goal]) < 1e-9
+                assert _is_walk(rooms, path)
+            else:
+                assert astar.last_partial or not path
+
+
+def test_astar_budget_gives_partial_path(open_grid):
+    astar = Pathfinding(CELL, mode=MODE_ASTAR, max_expansions=10)
+    path = astar.astar(open_grid, center(1, 4), center(18, 4))
+    assert astar.last_partial and astar.last_expansions == 10
+    assert path[0] == center(1, 4) and path[-1] != center(18, 4)
+    # The partial path ends on the expanded cell closest to the goal
+    assert path[-1][0] > center(1, 4)[0]
+
+
+def test_astar_unreachable_goal_returns_nothing(open_grid):
+    open_grid.add_prop_rect(pygame.Rect(*center(18, 4), 1, 1))
+    astar = Pathfinding(CELL, mode=MODE_ASTAR)
+    assert astar.astar(open_grid, center(1, 4), center(18, 4)) == []
+    assert not astar.last_partial
+
+
+def test_jps_matches_astar_cost_with_fewer_expansions(rooms, open_grid):
+    astar = Pathfinding(CELL, mode=MODE_ASTAR)
+    jps = Pathfinding(CELL, mode=MODE_JPS)
+    for grid in (rooms, open_grid):
+        cells = floor_cells(grid)
+        astar_total = jps_total = 0
+        for start in cells[::6]:
+            for goal in cells[::9]:
+                expected = astar.astar(grid, center(*start), center(*goal))
+                path = jps.jps(grid, center(*start), center(*goal))
+                assert bool(path) == bool(expected)
+                if expected:
+                    assert path[0] == expected[0] and path[-1] == expected[-1]
+                    assert abs(path_cost(path) - path_cost(expected)) < 1e-9
+                    assert _is_walk(grid, path)
+                astar_total += astar.last_expansions
+                jps_total += jps.last_expansions
+        assert jps_total < astar_total
+
+
+def test_jps_follows_prop_changes(open_grid):
+    jps = Pathfinding(CELL, mode=MODE_JPS)
+    before = path_cost(jps.jps(open_grid, center(1, 4), center(18, 4)))
+    # Close the gaps around the thin wall's ends
+    open_grid.add_prop_rect(pygame.Rect(10 * CELL, 1 * CELL, CELL, 2 * CELL))
+    after = jps.jps(open_grid, center(1, 4), center(18, 4))
+    assert path_cost(after) > before
+    assert abs(path_cost(after) - path_cost(Pathfinding(CELL).astar(open_grid, center(1, 4), center(18, 4)))) < 1e-9
+
+
+def test_path_cache_hits_copies_and_invalidates(rooms):
+    pathfinder = Pathfinding(CELL, mode=MODE_JPS)
+    stats = get_path_cache_stats()
+    path = pathfinder.find_path(rooms, center(1, 1), center(16, 10))
+    assert pathfinder.last_expansions > 0
+    # Any point in the same start and goal cells hits
+    again = pathfinder.find_path(rooms, (CELL + 1, CELL + 2), center(16, 10))
+    assert again == path and again is not path
+    assert pathfinder.last_expansions == 0
+    again.append((0, 0))
+    assert pathfinder.lookup(rooms, center(1, 1), center(16, 10)) == path
+    after = get_path_cache_stats()
+    assert after["hits"] == stats["hits"] + 2 and after["misses"] == stats["misses"] + 1
+    # A prop change moves the grid to a new version, so the old entry no longer matches
+    rooms.add_prop_rect(pygame.Rect(14 * CELL, 1 * CELL, CELL, CELL))
+    assert pathfinder.lookup(rooms, center(1, 1), center(16, 10)) is None
+
+
+def test_path_cache_evicts_least_recently_used(rooms, monkeypatch):
+    import ai.pathfinding
+
+    monkeypatch.setattr(ai.pathfinding, "PATH_CACHE_SIZE", 2)
+    pathfinder = Pathfinding(CELL, mode=MODE_JPS)
+    goals = [(16, 10), (16, 1), (1, 10)]
+    pathfinder.find_path(rooms, center(1, 1), center(*goals[0]))
+    pathfinder.find_path(rooms, center(1, 1), center(*goals[1]))
+    pathfinder.lookup(rooms, center(1, 1), center(*goals[0]))
+    pathfinder.find_path(rooms, center(1, 1), center(*goals[2]))
+    assert pathfinder.lookup(rooms, center(1, 1), center(*goals[1])) is None
+    assert pathfinder.lookup(rooms, center(1, 1), center(*goals[0])) is not None
+    assert get_path_cache_stats()["entries"] == 2
@@ -0,0 +1,53 @@
+import pytest
+
+import ai.portal_queue as portal_queue
+from ai.portal_queue import (ENTRY_TTL, MAX_HOLD_TIME, get_portal_queue_stats, release_portal_turn,
+                             request_portal_turn, update_portal_queues)
+
+
+@pytest.fixture(autouse=True)
+def _empty_queues(monkeypatch):
+    monkeypatch.setattr(portal_queue, "_queues", {})
+    monkeypatch.setattr(portal_queue, "_head_since", {})
+    monkeypatch.setattr(portal_queue, "_clock", 0.0)
+
+
+def _renew(*npc_ids):
+    return [request_portal_turn("hall", 1, npc_id) for npc_id in npc_ids]
+
+
+def test_places_follow_arrival_and_release():
+    assert _renew("a", "b", "c") == [0, 1, 2]
+    assert request_portal_turn("hall", 2, "c") == 0  # Queues are per portal
+    assert get_portal_queue_stats()["waiting"] == 2
+    released = get_portal_queue_stats()["released"]
+    release_portal_turn("hall", 1, "a")
+    release_portal_turn("hall", 1, "missing")
+    assert get_portal_queue_stats()["released"] == released + 1
+    assert _renew("b", "c") == [0, 1]
+
+
+def test_unrenewed_entries_expire():
+    _renew("a", "b", "c")
+    update_portal_queues(ENTRY_TTL / 2)
+    _renew("a", "c")
+    update_portal_queues(ENTRY_TTL * 0.75)
+    # b was last seen more than ENTRY_TTL ago
+    assert _renew("a", "c") == [0, 1]
+    update_portal_queues(ENTRY_TTL * 2)
+    assert portal_queue._queues == {} and portal_queue._head_since == {}
+
+
+def test_head_holding_too_long_goes_to_the_back():
+    bumped = get_portal_queue_stats()["bumped"]
+    _renew("a", "b")
+    elapsed = 0.0
+    while elapsed <= MAX_HOLD_TIME:
+        update_portal_queues(ENTRY_TTL / 2)
+        elapsed += ENTRY_TTL / 2
+        places = _renew("a", "b")
+    assert places == [1, 0]
+    assert get_portal_queue_stats()["bumped"] == bumped + 1
+    # The new head gets the full hold time
+    update_portal_queues(ENTRY_TTL / 2)
+    assert _renew("a", "b") == [1, 0]
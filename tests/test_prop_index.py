@@ -0,0 +1,138 @@
+import random
+
+import pygame
+
+from conftest import CELL, ROOMS, make_grid
+from entities.interactables import Prop
+from world.prop_index import COLLISION, INTERACTION, VISIBLE, PropIndex
+
+# Two 40x40 variants side by side; each mask blocks one 10x10 square on black (walkable) ground
+VARIANT_BLOCKS = [pygame.Rect(0, 0, 10, 10), pygame.Rect(20, 20, 10, 10)]
+
+
+class _Assets:
+    def image(self, path):
+        sheet = pygame.Surface((80, 40), pygame.SRCALPHA)
+        if path.endswith("mask.png"):
+            sheet.fill((0, 0, 0, 255))
+            for i, block in enumerate(VARIANT_BLOCKS):
+                sheet.fill((200, 0, 0, 255), block.move(40 * i, 0))
+        else:
+            sheet.fill((90, 90, 90, 255))
+        return sheet
+
+
+class _Game:
+    assets = _Assets()
+
+
+def _make_prop(x, y):
+    return Prop(x, y, "test/variant_sprite.png", "test/variant_mask.png", game=_Game(), variants=2)
+
+
+def test_variant_change_reindexes_prop(rooms):
+    index = PropIndex()
+    index.attach_nav_grid(rooms)
+    prop = _make_prop(CELL, CELL)
+    index.add_prop(prop)
+    assert [rect for rect, _ in index.query_rect(pygame.Rect(0, 0, 80, 80))] == [pygame.Rect(CELL, CELL, 10, 10)]
+    assert not rooms.is_passable(1, 1) and rooms.is_passable(3, 3)
+
+    version = rooms.version
+    prop.set_variant(1)
+    assert [rect for rect, _ in index.query_rect(pygame.Rect(0, 0, 80, 80))] == [pygame.Rect(3 * CELL, 3 * CELL, 10, 10)]
+    assert rooms.is_passable(1, 1) and not rooms.is_passable(3, 3)
+    assert rooms.version == version + 1
+
+
+def test_restored_prop_is_reindexed(rooms, monkeypatch):
+    from world import world_registry
+
+    index = PropIndex()
+    index.attach_nav_grid(rooms)
+    prop = _make_prop(CELL, CELL)
+    index.add_prop(prop)
+    monkeypatch.setitem(world_registry._props, "crate", prop)
+    world_registry.apply_world_state({"props": [{"id": "crate", "x": 6 * CELL, "y": 0, "variant_index": 1}]}, None)
+    assert [rect for rect, _ in index.query_rect(pygame.Rect(0, 0, 180, 120))] == [pygame.Rect(8 * CELL, 2 * CELL, 10, 10)]
+    assert rooms.is_passable(1, 1) and not rooms.is_passable(8, 2)
+
+
+class _BoxProp:
+    """Prop stand-in with one rect of each kind."""
+
+    def __init__(self, rng):
+        self.scale = rng.choice((1.0, 0.5, 2.0))
+        self.collision_rects = [pygame.Rect(rng.randrange(20), rng.randrange(20), rng.randrange(1, 60), rng.randrange(1, 60))]
+        self.interaction_rects = [pygame.Rect(0, 0, rng.randrange(1, 90), rng.randrange(1, 90))]
+        self.visible_rect = pygame.Rect(0, 0, 50, 50)
+        self.rect = None
+        self.picked_up = False
+        self.place(rng)
+
+    def place(self, rng):
+        self.x, self.y = rng.randrange(-20, 160), rng.randrange(-20, 110)
+
+
+def _world_rects(prop, kind):
+    rects = {COLLISION: prop.collision_rects, INTERACTION: prop.interaction_rects, VISIBLE: [prop.visible_rect]}[kind]
+    return [pygame.Rect(int(prop.x + r.x * prop.scale), int(prop.y + r.y * prop.scale),
+                        int(r.width * prop.scale), int(r.height * prop.scale)) for r in rects]
+
+
+def _check_index(index, grid, indexed, rng):
+    """Compare every query with a scan over the props that should be indexed."""
+    for kind in (COLLISION, INTERACTION, VISIBLE):
+        expected = sorted((tuple(rect), id(prop)) for prop in indexed for rect in _world_rects(prop, kind))
+        assert sorted(tuple(rect) for rect in index.rects(kind)) == [rect for rect, _ in expected]
+        for _ in range(20):
+            query = pygame.Rect(rng.randrange(-30, 180), rng.randrange(-30, 130), rng.randrange(1, 70), rng.randrange(1, 70))
+            hits = sorted((tuple(rect), id(prop)) for rect, prop in index.query_rect(query, kind))
+            assert hits == [(rect, prop_id) for rect, prop_id in expected if query.colliderect(rect)]
+            x, y = query.topleft
+            assert ({id(prop) for prop in index.props_at(x, y, kind)}
+                    == {prop_id for rect, prop_id in expected if pygame.Rect(rect).collidepoint(x, y)})
+    for _ in range(20):
+        x, y = rng.randrange(-30, 180), rng.randrange(-30, 130)
+        blocked = any(rect.colliderect((x - 3, y - 3, 7, 7)) for prop in indexed for rect in _world_rects(prop, COLLISION))
+        assert index.point_blocked(x, y, 3) == blocked
+    # The attached grid's prop layer matches one built from scratch
+    fresh = make_grid(ROOMS, "rooms")
+    fresh.set_prop_rects([rect for prop in indexed for rect in _world_rects(prop, COLLISION)])
+    assert bytes(grid.prop_blocks) == bytes(fresh.prop_blocks)
+
+
+def test_insert_move_and_remove_match_scan(rooms):
+    rng = random.Random(10)
+    index = PropIndex(cell_size=32)
+    index.attach_nav_grid(rooms)
+    props = [_BoxProp(rng) for _ in range(30)]
+    indexed = []
+    for prop in props[:10]:
+        index.add_prop(prop)
+        indexed.append(prop)
+    _check_index(index, rooms, indexed, rng)
+    for _ in range(60):
+        prop = rng.choice(props)
+        action = rng.choice(("add", "move", "remove", "pick_up"))
+        if action == "add":
+            index.add_prop(prop)
+            if prop not in indexed:
+                indexed.append(prop)
+        elif action == "move":
+            prop.place(rng)
+            index.update_prop(prop)
+            if prop not in indexed:
+                indexed.append(prop)
+        elif action == "remove":
+            index.remove_prop(prop)
+            if prop in indexed:
+                indexed.remove(prop)
+        else:
+            # Picked-up props leave the index and are not re-added until dropped
+            prop.picked_up = True
+            index.update_prop(prop)
+            prop.picked_up = False
+            if prop in indexed:
+                indexed.remove(prop)
+        _check_index(index, rooms, indexed, rng)
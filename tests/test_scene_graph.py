@@ -0,0 +1,145 @@
+import math
+import random
+from collections import deque
+
+from world.scene_graph import SceneGraph, UNKNOWN_WALK_COST
+
+
+def _portals(*targets):
+    """Portal map with one portal per target scene, ids counting from 1."""
+    return {portal_id: {"to_scene": to_scene, "spawn": (portal_id * 10, 0)}
+            for portal_id, to_scene in enumerate(targets, 1)}
+
+
+def _hops(graph, from_scene, to_scene):
+    """Reference BFS: fewest portal crossings from one scene to another, or None."""
+    seen = {from_scene: 0}
+    queue = deque([from_scene])
+    while queue:
+        scene = queue.popleft()
+        for _, next_scene, _ in graph.connections.get(scene, ()):
+            if next_scene not in seen:
+                seen[next_scene] = seen[scene] + 1
+                queue.append(next_scene)
+    return seen.get(to_scene)
+
+
+def _assert_walks(graph, path, from_scene, to_scene):
+    assert path[0][0] == from_scene and path[-1] == (to_scene, None, None)
+    for (scene, portal_id, spawn), (next_scene, _, _) in zip(path, path[1:]):
+        assert graph.get_portal_to_scene(scene, next_scene) == (portal_id, spawn)
+
+
+def test_routes_take_fewest_crossings():
+    rng = random.Random(3)
+    graph = SceneGraph()
+    names = ["s%d" % i for i in range(12)]
+    for name in names:
+        graph.register_scene(name, _portals(*rng.sample(names, 2)))
+    graph.register_scene("island", {})
+    for from_scene in names + ["island"]:
+        for to_scene in names + ["island", "missing"]:
+            hops = _hops(graph, from_scene, to_scene)
+            path = graph.find_scene_path(from_scene, to_scene)
+            if hops is None:
+                assert path is None and graph.route_cost(from_scene, to_scene) == math.inf
+                continue
+            assert len(path) - 1 == hops
+            _assert_walks(graph, path, from_scene, to_scene)
+            assert graph.route_cost(from_scene, to_scene) == hops * UNKNOWN_WALK_COST
+
+
+def test_routes_follow_topology_changes():
+    graph = SceneGraph()
+    graph.register_scene("a", _portals("b"))
+    graph.register_scene("b", _portals("a", "c"))
+    graph.register_scene("c", _portals("b"))
+    assert [step[0] for step in graph.find_scene_path("a", "c")] == ["a", "b", "c"]
+    version = graph.version
+    graph.register_scene("b", _portals("a", "c"))
+    assert graph.version == version
+
+    graph.register_scene("a", _portals("b", "c"))
+    assert graph.version == version + 1
+    assert graph.find_scene_path("a", "c") == [("a", 2, (20, 0)), ("c", None, None)]
+    graph.register_scene("b", _portals("a"))
+    assert graph.find_scene_path("b", "c") == [("b", 1, (10, 0)), ("a", 2, (20, 0)), ("c", None, None)]
+
+
+def _cheapest(graph, walk_cost, from_scene, to_scene, start):
+    """Reference: cheapest walk over every sequence of distinct portals, by exhaustive search."""
+    best = math.inf
+
+    def visit(scene, position, cost, used):
+        nonlocal best
+        for portal_id, next_scene, spawn in graph.connections.get(scene, ()):
+            if (scene, portal_id) in used:
+                continue
+            step = 0.0 if position is None else walk_cost(scene, position, portal_id)
+            if cost + step >= best:
+                continue
+            if next_scene == to_scene:
+                best = cost + step
+            else:
+                visit(next_scene, spawn, cost + step, used | {(scene, portal_id)})
+
+    visit(from_scene, start, 0.0, frozenset())
+    return best
+
+
+def _route_cost(walk_cost, path, start):
+    cost, position = 0.0, start
+    for scene, portal_id, spawn in path[:-1]:
+        cost += 0.0 if position is None else walk_cost(scene, position, portal_id)
+        position = spawn
+    return cost
+
+
+def test_walk_weighted_routes_are_cheapest():
+    rng = random.Random(5)
+    graph = SceneGraph()
+    names = ["s%d" % i for i in range(7)]
+    for name in names:
+        graph.register_scene(name, _portals(*rng.sample(names, 3)))
+    # Fixed random costs per (scene, start, portal); a few legs cannot be walked at all
+    legs = {}
+
+    def walk_cost(scene, start, portal_id):
+        key = (scene, start, portal_id)
+        if key not in legs:
+            legs[key] = math.inf if rng.random() < 0.15 else float(rng.randrange(10, 500))
+        return legs[key]
+
+    graph.set_walk_cost_fn(walk_cost)
+    for from_scene in names:
+        for to_scene in names:
+            if from_scene == to_scene:
+                continue
+            for start in (None, (1, 2)):
+                expected = _cheapest(graph, walk_cost, from_scene, to_scene, start)
+                path = graph.find_scene_path(from_scene, to_scene, start)
+                assert graph.route_cost(from_scene, to_scene, start) == expected
+                if expected < math.inf:
+                    _assert_walks(graph, path, from_scene, to_scene)
+                    assert _route_cost(walk_cost, path, start) == expected
+                elif path is not None:
+                    # Only unwalkable routes: the fewest crossings are taken instead
+                    assert len(path) - 1 == _hops(graph, from_scene, to_scene)
+
+
+def test_long_walk_loses_to_more_crossings():
+    graph = SceneGraph()
+    graph.register_scene("a", _portals("c", "b"))
+    graph.register_scene("b", _portals("c"))
+    graph.register_scene("c", {})
+    walks = {("a", 1): 900.0, ("a", 2): 100.0, ("b", 1): 100.0}
+    walk_cost = lambda scene, start, portal_id: walks.get((scene, portal_id))
+    graph.set_walk_cost_fn(walk_cost)
+    assert [step[0] for step in graph.find_scene_path("a", "c", (0, 0))] == ["a", "b", "c"]
+    assert graph.route_cost("a", "c", (0, 0)) == 200.0
+    # Unknown walks count UNKNOWN_WALK_COST; walks between portals are read when routes are built
+    walks[("b", 1)] = None
+    graph.set_walk_cost_fn(walk_cost)
+    assert graph.route_cost("a", "c", (0, 0)) == 900.0
+    graph.set_walk_cost_fn(None)
+    assert graph.route_cost("a", "c", (0, 0)) == UNKNOWN_WALK_COST
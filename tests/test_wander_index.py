@@ -0,0 +1,65 @@
+import math
+import random
+
+from conftest import ROOMS, make_mask
+from ai.wander_index import WANDER_INDEX_STEP, WanderIndex, get_wander_index
+from world.mask_collision import CELL_WALKABLE
+
+PORTAL_MIN_DISTANCE = 25.5
+OPEN_CLEARANCE = 6
+
+
+def _points(buckets):
+    return {(points[i], points[i + 1]) for points in buckets.values() for i in range(0, len(points), 2)}
+
+
+def _expected(mask):
+    """Reference: (open points, near-wall points) found by checking every lattice point."""
+    portals = [(r.bounds[0] + r.bounds[2] / 2, r.bounds[1] + r.bounds[3] / 2) for r in mask.portal_regions.values()]
+    open_points, wall_points = set(), set()
+    half = WANDER_INDEX_STEP // 2
+    for y in range(half, mask.height, WANDER_INDEX_STEP):
+        for x in range(half, mask.width, WANDER_INDEX_STEP):
+            i = y * mask.width + x
+            if mask.raster[i] != CELL_WALKABLE:
+                continue
+            if any(math.dist((x, y), portal) < PORTAL_MIN_DISTANCE for portal in portals):
+                continue
+            (open_points if mask.clearance[i] > OPEN_CLEARANCE else wall_points).add((x, y))
+    return open_points, wall_points
+
+
+def test_index_matches_lattice_scan():
+    mask = make_mask(ROOMS)
+    assert mask.portal_regions
+    index = WanderIndex(mask, PORTAL_MIN_DISTANCE, OPEN_CLEARANCE)
+    open_points, wall_points = _expected(mask)
+    assert open_points and wall_points
+    assert _points(index.open_buckets) == open_points
+    assert _points(index.wall_buckets) == wall_points
+
+
+def test_samples_stay_in_the_ring():
+    random.seed(7)
+    mask = make_mask(ROOMS)
+    index = WanderIndex(mask, PORTAL_MIN_DISTANCE, OPEN_CLEARANCE)
+    open_points, wall_points = _expected(mask)
+    for open_only, points in ((True, open_points), (False, wall_points)):
+        for x, y, low, high in ((40, 40, 0, 30), (90, 60, 20, 70), (150, 100, 50, 200), (10, 10, 0, 500)):
+            ring = {p for p in points if low <= math.dist(p, (x, y)) <= high}
+            seen = set()
+            for _ in range(200):
+                point = index.sample(x, y, low, high, open_only)
+                assert point in ring
+                seen.add(point)
+            # Picks are spread over the ring, not stuck on a few points
+            assert len(seen) >= min(len(ring), 20)
+    assert index.sample(90, 60, 1000, 2000) is None
+    assert index.sample(-500, -500, 0, 50) is None
+
+
+def test_index_rebuilt_for_a_new_mask():
+    mask = make_mask(ROOMS)
+    index = get_wander_index("rooms", mask, PORTAL_MIN_DISTANCE, OPEN_CLEARANCE)
+    assert get_wander_index("rooms", mask, PORTAL_MIN_DISTANCE, OPEN_CLEARANCE) is index
+    assert get_wander_index("rooms", make_mask(ROOMS), PORTAL_MIN_DISTANCE, OPEN_CLEARANCE) is not index
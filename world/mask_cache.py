@@ -1,47 +1,134 @@
-"""Cache of collision masks for all scenes, loaded at startup.
+"""Shared registry of compiled collision masks, keyed by scene name and mask path.
 
-This allows off-screen NPCs to validate wander positions without loading masks on-demand.
+Scenes, on-screen NPCs and off-screen NPCs (WanderState) all take the same
+compiled MaskCollisionSystem instance from here, so a mask is only processed
+once per run instead of on every portal transition. Compiled masks are treated
+as read-only; call invalidate_mask() after changing a mask file to force a rebuild.
+
+Misses are served from the persistent disk cache (world.mask_disk_cache) when
+possible, so a warm start does no pixel processing at all.
 """
+import os
+
+# Set to False to always compile masks from the PNGs
+USE_DISK_CACHE = True
 
-# Global mask cache: scene_name -> MaskCollisionSystem
+# Global mask cache: (scene_name, mask_path) -> MaskCollisionSystem
 _mask_cache = {}
+# scene_name -> mask_path of the most recently registered mask for that scene
+_scene_mask_paths = {}
+# Lookup counters shown in the debug overlay
+_stats = {"hits": 0, "misses": 0}
+
+
+def get_mask_path(background_path: str) -> str:
+    """Convert background path to mask path by inserting '_mask' before extension."""
+    if '.' in background_path:
+        parts = background_path.rsplit('.', 1)
+        return f"{parts[0]}_mask.png"
+    return f"{background_path}_mask.png"
+
+
+def get_mask(scene_name: str, mask_path: str, assets, scene_scale: float = 1.0):
+    """Get the compiled mask for a scene, building and caching it on a miss.
+
+    Args:
+        scene_name: Registry name of the scene
+        mask_path: Asset path of the mask image
+        assets: Asset loader used to load the mask image on a miss
+        scene_scale: Scene scale (part of the disk cache key for derived nav data)
+
+    Raises whatever the asset loader raises if the mask image cannot be loaded.
+    """
+    key = (scene_name, mask_path)
+    mask_system = _mask_cache.get(key)
+    if mask_system is not None:
+        _stats["hits"] += 1
+        return mask_system
+
+    _stats["misses"] += 1
+    mask_system = _load_or_compile(scene_name, mask_path, assets, scene_scale)
+    _mask_cache[key] = mask_system
+    _scene_mask_paths[scene_name] = mask_path
+    return mask_system
+
+
+def _load_or_compile(scene_name: str, mask_path: str, assets, scene_scale: float):
+    """Load a compiled mask from the disk cache, or compile it and write it back."""
+    from world.mask_collision import MaskCollisionSystem
+    from world import mask_disk_cache
+
+    disk_key = None
+    if USE_DISK_CACHE:
+        base = getattr(assets, 'base', '')
+        disk_key = mask_disk_cache.make_cache_key(os.path.join(base, mask_path), scene_scale)
+    if disk_key:
+        sections = mask_disk_cache.load_sections(scene_name, disk_key)
+        if sections is not None:
+            try:
+                return MaskCollisionSystem.from_sections(sections)
+            except (KeyError, ValueError) as e:
+                print(f"[MaskCache] Rebuilding {scene_name}: {e}")
+
+    mask_system = MaskCollisionSystem(assets.image(mask_path))
+    if disk_key:
+        mask_disk_cache.save_sections(scene_name, disk_key, mask_system.to_sections())
+    return mask_system
 
 
 def get_mask_for_scene(scene_name: str):
     """Get the cached mask for a scene, or None if not cached."""
-    return _mask_cache.get(scene_name)
+    mask_path = _scene_mask_paths.get(scene_name)
+    mask_system = _mask_cache.get((scene_name, mask_path))
+    if mask_system is None:
+        _stats["misses"] += 1
+    else:
+        _stats["hits"] += 1
+    return mask_system
+
+
+def invalidate_mask(scene_name: str = None) -> None:
+    """Drop cached masks for one scene, or every scene when scene_name is None.
+
+    Scenes that already hold a mask keep using it until they are rebuilt.
+    """
+    if scene_name is None:
+        _mask_cache.clear()
+        _scene_mask_paths.clear()
+        return
+    for key in [key for key in _mask_cache if key[0] == scene_name]:
+        del _mask_cache[key]
+    _scene_mask_paths.pop(scene_name, None)
+
+
+def get_mask_cache_stats() -> dict:
+    """Return hit/miss counters and the number of cached masks."""
+    return {"hits": _stats["hits"], "misses": _stats["misses"], "entries": len(_mask_cache)}
 
 
 def precache_all_masks(game):
     """Load and cache collision masks for all registered scenes at startup.
-    
+
     This should be called once during game initialization after scene registration.
-    
+
     Args:
         game: The Game instance (for access to assets)
     """
     from scenes.scene_registry import SCENE_REGISTRY
-    from world.mask_collision import MaskCollisionSystem
-    
+
     count = 0
     for scene_name, scene_class in SCENE_REGISTRY.items():
         # Get background path from scene class
         background_path = getattr(scene_class, 'BACKGROUND_PATH', None)
         if not background_path:
             continue
-        
-        # Convert to mask path
-        if '.' in background_path:
-            parts = background_path.rsplit('.', 1)
-            mask_path = f"{parts[0]}_mask.png"
-        else:
-            mask_path = f"{background_path}_mask.png"
-        
-        # Load mask image
-        mask_img = game.assets.image(mask_path)
-        if mask_img:
-            _mask_cache[scene_name] = MaskCollisionSystem(mask_img)
+
+        try:
+            scene_scale = getattr(scene_class, 'SCENE_SCALE', 1.0) or 1.0
+            get_mask(scene_name, get_mask_path(background_path), game.assets, scene_scale)
             count += 1
-    
+        except Exception as e:
+            print(f"Warning: Could not precache mask for {scene_name}: {e}")
+
     if count > 0:
         print(f"[MaskCache] Precached masks for {count} scenes")
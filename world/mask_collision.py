@@ -1,8 +1,45 @@
 """Mask-based collision system for pixel-perfect collision detection and portal regions."""
+import re
+import struct
 import pygame
+from array import array
+from dataclasses import dataclass
+from itertools import accumulate
+from operator import add
 from typing import Optional
 
 
+# Values stored in the compiled class raster (one byte per mask pixel)
+CELL_BLOCKED = 0
+CELL_WALKABLE = 1
+CELL_PORTAL_BASE = 2  # Portal pixels store CELL_PORTAL_BASE + portal_id
+MAX_PORTALS = 256 - CELL_PORTAL_BASE
+
+# Horizontal run of unlabeled portal pixels in the raster
+_PORTAL_RUN = re.compile(re.escape(bytes((CELL_PORTAL_BASE,))) + b"+")
+
+# bytes.translate tables turning the class raster into 0/1 indicator bytes
+_BLOCKED_INDICATOR = bytes(1 if value == CELL_BLOCKED else 0 for value in range(256))
+_WALKABLE_INDICATOR = bytes(0 if value == CELL_BLOCKED else 1 for value in range(256))
+_FLOOR_INDICATOR = bytes(1 if value == CELL_WALKABLE else 0 for value in range(256))
+
+# Clearance values are stored as one byte per pixel
+MAX_CLEARANCE = 255
+
+# Serialized layout: mask size, then one record per portal region
+_SIZE_RECORD = struct.Struct("<II")
+_PORTAL_RECORD = struct.Struct("<IiiiiddI")
+
+
+@dataclass(frozen=True)
+class PortalRegion:
+    """Precomputed statistics for one connected portal region."""
+    portal_id: int
+    bounds: tuple[int, int, int, int]  # (left, top, width, height)
+    centroid: tuple[float, float]
+    pixel_count: int
+
+
 class MaskCollisionSystem:
     """Handles collision detection and portal detection based on a mask image.
     
@@ -10,6 +47,10 @@ class MaskCollisionSystem:
     - Black (0, 0, 0) = walkable area
     - Transparent/other colors = collision (walls, obstacles)
     - White (255, 255, 255) = portal regions
+    
+    The mask is compiled once at construction into a flat uint8 class raster
+    (row-major, one byte per pixel) so every point query is a single index.
+    Instances are read-only after construction; share them via world.mask_cache.
     """
     
     def __init__(self, mask_image: pygame.Surface):
@@ -17,142 +58,408 @@ class MaskCollisionSystem:
         self.width = mask_image.get_width()
         self.height = mask_image.get_height()
         
-        # Detect portal regions
+        # Compile the mask into the class raster
+        self.raster = self._compile_raster()
+        
+        # Label portal regions (stamps portal IDs into the raster)
         self.portal_regions = self._detect_portal_regions()
+        
+        # Freeze the raster: compiled masks are shared between scenes and NPCs
+        self.raster = bytes(self.raster)
+        
+        # Summed-area tables for exact constant-time rect queries
+        self.blocked_sat = _summed_area(self.raster.translate(_BLOCKED_INDICATOR), self.width, self.height)
+        self.portal_sats = {
+            portal_id: self._build_portal_sat(region)
+            for portal_id, region in self.portal_regions.items()
+        }
+        
+        # Distance from every pixel to the nearest blocked pixel
+        self.clearance = self._build_clearance()
+    
+    @classmethod
+    def from_sections(cls, sections: dict) -> "MaskCollisionSystem":
+        """Rebuild a compiled mask from serialized sections without touching pixels.
+        
+        The raster may be a read-only memoryview (e.g. memory-mapped from disk).
+        """
+        self = cls.__new__(cls)
+        self.mask_image = None
+        self.width, self.height = _SIZE_RECORD.unpack_from(sections["size"], 0)
+        self.raster = sections["raster"]
+        if len(self.raster) != self.width * self.height:
+            raise ValueError("raster size does not match mask dimensions")
+        self.portal_regions = {}
+        for record in _PORTAL_RECORD.iter_unpack(sections["portals"]):
+            portal_id, left, top, width, height, cx, cy, count = record
+            self.portal_regions[portal_id] = PortalRegion(
+                portal_id=portal_id,
+                bounds=(left, top, width, height),
+                centroid=(cx, cy),
+                pixel_count=count,
+            )
+        
+        self.blocked_sat = sections["blocked_sat"].cast("I")
+        if len(self.blocked_sat) != (self.width + 1) * (self.height + 1):
+            raise ValueError("blocked SAT size does not match mask dimensions")
+        portal_sat = sections["portal_sat"].cast("I")
+        self.portal_sats = {}
+        offset = 0
+        for portal_id, region in self.portal_regions.items():
+            size = (region.bounds[2] + 1) * (region.bounds[3] + 1)
+            self.portal_sats[portal_id] = portal_sat[offset:offset + size]
+            offset += size
+        if offset != len(portal_sat):
+            raise ValueError("portal SAT size does not match portal table")
+        
+        self.clearance = sections["clearance"]
+        if len(self.clearance) != self.width * self.height:
+            raise ValueError("clearance size does not match mask dimensions")
+        return self
+    
+    def to_sections(self) -> dict:
+        """Serialize the compiled data into named byte sections (see from_sections)."""
+        portals = bytearray()
+        for region in self.portal_regions.values():
+            portals += _PORTAL_RECORD.pack(
+                region.portal_id, *region.bounds, *region.centroid, region.pixel_count
+            )
+        portal_sat = bytearray()
+        for portal_id in self.portal_regions:
+            portal_sat += self.portal_sats[portal_id]
+        return {
+            "size": _SIZE_RECORD.pack(self.width, self.height),
+            "raster": bytes(self.raster),
+            "portals": bytes(portals),
+            "blocked_sat": bytes(self.blocked_sat),
+            "portal_sat": bytes(portal_sat),
+            "clearance": bytes(self.clearance),
+        }
+    
+    def _compile_raster(self) -> bytearray:
+        """Classify every mask pixel as blocked, walkable or portal.
+        
+        Uses pygame.mask thresholding so the per-pixel work stays in C. Portal
+        pixels are written as CELL_PORTAL_BASE until regions are labeled.
+        """
+        # Only opaque pixels count (transparent = collision)
+        opaque = pygame.mask.from_surface(self.mask_image, 0)
+        black = pygame.mask.from_threshold(self.mask_image, (0, 0, 0, 255), (1, 1, 1, 255))
+        white = pygame.mask.from_threshold(self.mask_image, (255, 255, 255, 255), (1, 1, 1, 255))
+        black = black.overlap_mask(opaque, (0, 0))
+        white = white.overlap_mask(opaque, (0, 0))
+        
+        # Paint classes into a scratch surface and read back the red channel
+        classes = pygame.Surface((self.width, self.height), 0, 32)
+        classes.fill((CELL_BLOCKED, 0, 0))
+        black.to_surface(classes, setcolor=(CELL_WALKABLE, 0, 0), unsetcolor=None)
+        white.to_surface(classes, setcolor=(CELL_PORTAL_BASE, 0, 0), unsetcolor=None)
+        return bytearray(pygame.image.tobytes(classes, "RGB")[0::3])
     
     def is_walkable(self, x: int, y: int) -> bool:
         """Check if a pixel coordinate is walkable (black or white in mask)."""
         if x < 0 or y < 0 or x >= self.width or y >= self.height:
             return False
-        
-        color = self.mask_image.get_at((int(x), int(y)))
-        # Walkable if black (normal area) or white (portal area)
-        if color.a > 0:
-            is_black = color.r == 0 and color.g == 0 and color.b == 0
-            is_white = color.r == 255 and color.g == 255 and color.b == 255
-            return is_black or is_white
-        return False
+        return self.raster[int(y) * self.width + int(x)] != CELL_BLOCKED
     
     def is_portal(self, x: int, y: int) -> Optional[int]:
         """Check if a pixel is in a portal region. Returns portal ID or None."""
         if x < 0 or y < 0 or x >= self.width or y >= self.height:
             return None
-        
-        color = self.mask_image.get_at((int(x), int(y)))
-        # Portal if white
-        if color.a > 0 and color.r == 255 and color.g == 255 and color.b == 255:
-            # Find which portal region this belongs to
-            for portal_id, region in self.portal_regions.items():
-                if (int(x), int(y)) in region:
-                    return portal_id
+        value = self.raster[int(y) * self.width + int(x)]
+        if value >= CELL_PORTAL_BASE:
+            return value - CELL_PORTAL_BASE
         return None
     
     def point_in_portal(self, x: int, y: int, portal_id: int) -> bool:
         """Check if a specific point is in a specific portal region."""
         if portal_id not in self.portal_regions:
             return False
-        return (int(x), int(y)) in self.portal_regions[portal_id]
+        return self.is_portal(x, y) == portal_id
+    
+    def _build_portal_sat(self, region: PortalRegion) -> array:
+        """Summed-area table of one portal's pixels, covering only its bounds."""
+        left, top, width, height = region.bounds
+        indicator = bytes(1 if value == CELL_PORTAL_BASE + region.portal_id else 0 for value in range(256))
+        rows = bytearray()
+        for y in range(top, top + height):
+            start = y * self.width + left
+            rows += self.raster[start:start + width].translate(indicator)
+        return _summed_area(rows, width, height)
+    
+    def _build_clearance(self) -> bytes:
+        """Chessboard (L-infinity) distance transform of the walkable area, capped at MAX_CLEARANCE.
+        
+        Pixel value c means every pixel within c - 1 of it (in x and y) is walkable;
+        blocked pixels are 0 and pixels outside the mask count as blocked. Computed
+        by repeated 3x3 erosion on a big-int bitset with one byte lane per pixel, so
+        summing the erosion levels leaves the distance in each lane.
+        """
+        width, height = self.width, self.height
+        level = int.from_bytes(self.raster.translate(_WALKABLE_INDICATOR), "little")
+        # Lane masks that stop horizontal shifts wrapping into the next row
+        not_first_col = int.from_bytes((b"\0" + b"\1" * (width - 1)) * height, "little")
+        not_last_col = int.from_bytes((b"\1" * (width - 1) + b"\0") * height, "little")
+        row_shift = 8 * width
+        distance = 0
+        for _ in range(MAX_CLEARANCE):
+            if not level:
+                break
+            distance += level
+            level &= (level << 8) & not_first_col & (level >> 8) & not_last_col
+            level &= (level << row_shift) & (level >> row_shift)
+        return distance.to_bytes(width * height, "little")
+    
+    def clearance_at(self, x: int, y: int) -> int:
+        """Distance in pixels from (x, y) to the nearest blocked pixel (0 if blocked or outside)."""
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return 0
+        return self.clearance[int(y) * self.width + int(x)]
+    
+    def has_clearance(self, x: int, y: int, radius: int) -> bool:
+        """Check if a square footprint extending radius pixels around (x, y) is fully walkable."""
+        return self.clearance_at(x, y) > radius
+    
+    def find_nearest_walkable(self, x: float, y: float, max_radius: int = 100,
+                              exclude_portals: bool = False, min_clearance: int = 0,
+                              exclude_rects: list = None) -> Optional[tuple[int, int]]:
+        """Find the walkable pixel closest (Euclidean) to (x, y) within max_radius.
+        
+        Searches square rings outward over the class raster, reading each ring edge
+        as a raster slice. Stops once no unchecked ring can hold a closer pixel.
+        
+        Args:
+            x, y: Query position
+            max_radius: Largest ring (in pixels, per axis) to search
+            exclude_portals: Reject portal pixels
+            min_clearance: Reject pixels without this much room (see has_clearance)
+            exclude_rects: Reject pixels inside any of these rects (e.g. prop footprints)
+        
+        Returns (x, y) of the pixel found, or None.
+        """
+        cx, cy = int(x), int(y)
+        indicator = _FLOOR_INDICATOR if exclude_portals else _WALKABLE_INDICATOR
+        best = None
+        best_dist_sq = 0
+        for radius in range(max_radius + 1):
+            # Every pixel on this ring is at least `radius` away
+            if best is not None and radius * radius >= best_dist_sq:
+                break
+            for px, py in self._ring_candidates(cx, cy, radius, indicator):
+                dist_sq = (px - cx) ** 2 + (py - cy) ** 2
+                if best is not None and dist_sq >= best_dist_sq:
+                    continue
+                if min_clearance and not self.has_clearance(px, py, min_clearance):
+                    continue
+                if exclude_rects and any(rect.collidepoint(px, py) for rect in exclude_rects):
+                    continue
+                best = (px, py)
+                best_dist_sq = dist_sq
+        return best
+    
+    def _ring_candidates(self, cx: int, cy: int, radius: int, indicator: bytes):
+        """Yield in-bounds pixels on the square ring of the given radius whose class passes indicator."""
+        width, height, raster = self.width, self.height, self.raster
+        if radius == 0:
+            if 0 <= cx < width and 0 <= cy < height and indicator[raster[cy * width + cx]]:
+                yield cx, cy
+            return
+        x0 = max(cx - radius, 0)
+        x1 = min(cx + radius, width - 1)
+        # Top and bottom edges (full width of the ring)
+        if x0 <= x1:
+            for py in (cy - radius, cy + radius):
+                if 0 <= py < height:
+                    row = py * width
+                    hits = bytes(raster[row + x0:row + x1 + 1]).translate(indicator)
+                    i = hits.find(1)
+                    while i != -1:
+                        yield x0 + i, py
+                        i = hits.find(1, i + 1)
+        # Left and right edges (excluding the corners already covered)
+        y0 = max(cy - radius + 1, 0)
+        y1 = min(cy + radius - 1, height - 1)
+        if y0 <= y1:
+            for px in (cx - radius, cx + radius):
+                if 0 <= px < width:
+                    hits = bytes(raster[y0 * width + px:y1 * width + px + 1:width]).translate(indicator)
+                    i = hits.find(1)
+                    while i != -1:
+                        yield px, y0 + i
+                        i = hits.find(1, i + 1)
+    
+    def count_blocked(self, left: int, top: int, right: int, bottom: int) -> int:
+        """Count blocked pixels in [left, right) x [top, bottom); pixels outside the mask count as blocked."""
+        area = (right - left) * (bottom - top)
+        if area <= 0:
+            return 0
+        x0 = min(max(left, 0), self.width)
+        y0 = min(max(top, 0), self.height)
+        x1 = min(max(right, 0), self.width)
+        y1 = min(max(bottom, 0), self.height)
+        inside = (x1 - x0) * (y1 - y0)
+        if inside <= 0:
+            return area
+        return area - inside + _sat_sum(self.blocked_sat, self.width + 1, x0, y0, x1, y1)
     
     def rect_collides(self, rect: pygame.Rect) -> bool:
-        """Check if a rect collides with non-walkable areas (transparent/colored).
-        Samples corners and center of the rect.
+        """Check if a rect overlaps any non-walkable pixel (transparent/colored) or leaves the mask.
+        Exact and constant time via the blocked-pixel summed-area table.
         """
-        # Sample points: corners + center
-        test_points = [
-            (rect.left, rect.top),
-            (rect.right - 1, rect.top),
-            (rect.left, rect.bottom - 1),
-            (rect.right - 1, rect.bottom - 1),
-            (rect.centerx, rect.centery),
-        ]
-        
-        for px, py in test_points:
-            if not self.is_walkable(px, py):
-                return True
-        return False
+        left, top = rect.left, rect.top
+        right = max(rect.right, left + 1)
+        bottom = max(rect.bottom, top + 1)
+        return self.count_blocked(left, top, right, bottom) > 0
     
     def rect_in_portal(self, rect: pygame.Rect) -> Optional[int]:
-        """Check if rect intersects with any portal region. Returns portal ID or None."""
-        # Check if any corner or center point is in a portal
-        test_points = [
-            (rect.left, rect.top),
-            (rect.right - 1, rect.top),
-            (rect.left, rect.bottom - 1),
-            (rect.right - 1, rect.bottom - 1),
-            (rect.centerx, rect.centery),
-        ]
-        
-        for x, y in test_points:
-            portal_id = self.is_portal(x, y)
-            if portal_id is not None:
+        """Check if rect intersects with any portal region. Returns the lowest touching portal ID or None."""
+        left, top = rect.left, rect.top
+        right = max(rect.right, left + 1)
+        bottom = max(rect.bottom, top + 1)
+        for portal_id, region in self.portal_regions.items():
+            p_left, p_top, p_width, p_height = region.bounds
+            # Intersect with the portal bounds, in portal-local coordinates
+            x0 = max(left, p_left) - p_left
+            y0 = max(top, p_top) - p_top
+            x1 = min(right, p_left + p_width) - p_left
+            y1 = min(bottom, p_top + p_height) - p_top
+            if x0 >= x1 or y0 >= y1:
+                continue
+            if _sat_sum(self.portal_sats[portal_id], p_width + 1, x0, y0, x1, y1) > 0:
                 return portal_id
-        
         return None
     
-    def _detect_portal_regions(self) -> dict[int, set[tuple[int, int]]]:
-        """Detect white portal regions using flood fill.
-        Returns dict mapping portal_id -> set of (x, y) coordinates.
+    def _detect_portal_regions(self) -> dict[int, PortalRegion]:
+        """Label connected white portal regions and stamp their IDs into the raster.
+        
+        Two-pass run-length labeling (4-connectivity): the first pass collects
+        horizontal runs of portal pixels row by row and unions runs that overlap
+        a run in the row above; the second pass resolves each run to its root and
+        accumulates bounds, centroid and pixel count. Linear in the number of runs.
+        
+        Portal IDs are assigned in scanline order of each region's first pixel,
+        matching the IDs used by the scenes' PORTAL_MAP definitions.
         """
-        visited = set()
-        regions = {}
-        portal_id = 0
+        raster = self.raster
+        width = self.width
+        runs = []  # (y, x_start, x_end) in scanline order
+        parent = []
         
+        def find(label):
+            while parent[label] != label:
+                parent[label] = parent[parent[label]]
+                label = parent[label]
+            return label
+        
+        # Pass 1: collect runs and union them with overlapping runs in the previous row
+        prev_row_runs = []  # (x_start, x_end, label) for the previous row
+        prev_y = -2
         for y in range(self.height):
-            for x in range(self.width):
-                if (x, y) in visited:
-                    continue
-                
-                color = self.mask_image.get_at((x, y))
-                # Check if white portal pixel
-                if color.a > 0 and color.r == 255 and color.g == 255 and color.b == 255:
-                    # Flood fill this region
-                    region = self._flood_fill_portal(x, y, visited)
-                    if region:
-                        regions[portal_id] = region
-                        portal_id += 1
+            row = y * width
+            if raster.find(CELL_PORTAL_BASE, row, row + width) == -1:
+                continue
+            above = prev_row_runs if prev_y == y - 1 else []
+            row_runs = []
+            i = 0
+            for match in _PORTAL_RUN.finditer(raster, row, row + width):
+                x0 = match.start() - row
+                x1 = match.end() - row
+                label = len(runs)
+                runs.append((y, x0, x1))
+                parent.append(label)
+                # Advance past runs above that end before this one starts
+                while i < len(above) and above[i][1] <= x0:
+                    i += 1
+                j = i
+                while j < len(above) and above[j][0] < x1:
+                    root_a = find(above[j][2])
+                    root_b = find(label)
+                    if root_a != root_b:
+                        # Keep the earlier (scanline-first) run as root
+                        if root_a < root_b:
+                            parent[root_b] = root_a
+                        else:
+                            parent[root_a] = root_b
+                    j += 1
+                row_runs.append((x0, x1, label))
+            prev_row_runs = row_runs
+            prev_y = y
         
-        return regions
-    
-    def _flood_fill_portal(self, start_x: int, start_y: int, visited: set) -> set[tuple[int, int]]:
-        """Flood fill to find all connected white pixels forming a portal region."""
-        region = set()
-        stack = [(start_x, start_y)]
+        # Pass 2: resolve roots, assign stable IDs and accumulate per-portal stats
+        root_to_id = {}
+        stats = []  # [min_x, min_y, max_x, max_y, count, sum_x, sum_y]
+        run_ids = []
+        for label, (y, x0, x1) in enumerate(runs):
+            root = find(label)
+            portal_id = root_to_id.get(root)
+            if portal_id is None:
+                portal_id = len(stats)
+                root_to_id[root] = portal_id
+                stats.append([x0, y, x1 - 1, y, 0, 0, 0])
+            entry = stats[portal_id]
+            length = x1 - x0
+            if x0 < entry[0]:
+                entry[0] = x0
+            if x1 - 1 > entry[2]:
+                entry[2] = x1 - 1
+            entry[3] = y
+            entry[4] += length
+            entry[5] += (x0 + x1 - 1) * length / 2
+            entry[6] += y * length
+            run_ids.append(portal_id)
         
-        while stack:
-            x, y = stack.pop()
-            
-            if (x, y) in visited:
-                continue
-            if x < 0 or y < 0 or x >= self.width or y >= self.height:
-                continue
-            
-            color = self.mask_image.get_at((x, y))
-            if not (color.a > 0 and color.r == 255 and color.g == 255 and color.b == 255):
-                continue
-            
-            visited.add((x, y))
-            region.add((x, y))
-            
-            # Add neighbors
-            stack.extend([(x+1, y), (x-1, y), (x, y+1), (x, y-1)])
+        if len(stats) > MAX_PORTALS:
+            print(f"Warning: mask has {len(stats)} portal regions, only the first {MAX_PORTALS} are used")
+        
+        # Stamp portal IDs into the raster (extra regions become plain floor)
+        for (y, x0, x1), portal_id in zip(runs, run_ids):
+            value = CELL_PORTAL_BASE + portal_id if portal_id < MAX_PORTALS else CELL_WALKABLE
+            start = y * width + x0
+            raster[start:start + x1 - x0] = bytes((value,)) * (x1 - x0)
         
-        return region
+        regions = {}
+        for portal_id, (min_x, min_y, max_x, max_y, count, sum_x, sum_y) in enumerate(stats[:MAX_PORTALS]):
+            regions[portal_id] = PortalRegion(
+                portal_id=portal_id,
+                bounds=(min_x, min_y, max_x - min_x + 1, max_y - min_y + 1),
+                centroid=(sum_x / count, sum_y / count),
+                pixel_count=count,
+            )
+        return regions
     
     def get_portal_bounds(self, portal_id: int) -> Optional[pygame.Rect]:
         """Get bounding rect for a portal region."""
-        if portal_id not in self.portal_regions:
+        region = self.portal_regions.get(portal_id)
+        if region is None:
             return None
-        
-        region = self.portal_regions[portal_id]
-        if not region:
+        return pygame.Rect(region.bounds)
+    
+    def get_portal_centroid(self, portal_id: int) -> Optional[tuple[float, float]]:
+        """Get the pixel centroid of a portal region."""
+        region = self.portal_regions.get(portal_id)
+        if region is None:
             return None
-        
-        xs = [x for x, y in region]
-        ys = [y for x, y in region]
-        
-        left = min(xs)
-        top = min(ys)
-        right = max(xs)
-        bottom = max(ys)
-        
-        return pygame.Rect(left, top, right - left + 1, bottom - top + 1)
+        return region.centroid
+
+
+def _summed_area(indicator: bytes, width: int, height: int) -> array:
+    """Build a (width + 1) x (height + 1) summed-area table of a 0/1 byte raster.
+    
+    Entry [y * (width + 1) + x] holds the sum of indicator pixels above and left
+    of (x, y). Rows are accumulated with itertools so the loop stays per-row.
+    """
+    table = array("I", bytes(4 * (width + 1)))
+    previous = [0] * (width + 1)
+    for y in range(height):
+        row = [0]
+        row.extend(accumulate(indicator[y * width:(y + 1) * width]))
+        previous = list(map(add, previous, row))
+        table.extend(previous)
+    return table
+
+
+def _sat_sum(table, stride: int, x0: int, y0: int, x1: int, y1: int) -> int:
+    """Sum of the indicator over [x0, x1) x [y0, y1) from a summed-area table."""
+    top = y0 * stride
+    bottom = y1 * stride
+    return table[bottom + x1] - table[top + x1] - table[bottom + x0] + table[top + x0]
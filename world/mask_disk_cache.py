@@ -0,0 +1,135 @@
+"""Persistent on-disk cache of compiled collision/navigation data.
+
+Each compiled mask is stored as one flat binary file of named sections (class
+raster, portal table, derived nav data, ...) keyed by a content hash of the mask
+PNG and the scene scale. Files are memory-mapped at load, so a warm start skips
+all pixel processing. Editing a mask changes its hash, which rebuilds only that
+scene's entry; bumping CACHE_VERSION invalidates everything.
+
+File layout (little-endian):
+    header:    magic (4s) | version (I) | section count (I) | key length (I)
+    key:       UTF-8 cache key, padded to 8 bytes
+    directory: per section: name (16s) | offset (Q) | length (Q)
+    sections:  raw section bytes, each 8-byte aligned
+"""
+import hashlib
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Optional
+
+CACHE_VERSION = 3
+# Under the repo root, so the cache is the same whatever directory the game runs from
+CACHE_ROOT = Path(__file__).resolve().parent.parent / "cache" / "masks"
+MAGIC = b"TTMC"
+
+_HEADER = struct.Struct("<4sIII")
+_DIR_ENTRY = struct.Struct("<16sQQ")
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def cache_dir() -> Path:
+    """Directory holding compiled masks for the current cache version."""
+    return CACHE_ROOT / f"v{CACHE_VERSION}"
+
+
+def make_cache_key(mask_file: str, scene_scale: float) -> Optional[str]:
+    """Build the cache key from the mask file contents and scene scale.
+
+    Returns None if the mask file cannot be read.
+    """
+    try:
+        with open(mask_file, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+    return f"{digest}-s{float(scene_scale):g}"
+
+
+def _entry_path(scene_name: str, key: str) -> Path:
+    return cache_dir() / f"{scene_name}-{key}.bin"
+
+
+def load_sections(scene_name: str, key: str) -> Optional[Dict[str, memoryview]]:
+    """Memory-map a cached entry. Returns section name -> read-only view, or None on miss.
+
+    The returned views keep the mapping open; it is closed on every miss.
+    """
+    path = _entry_path(scene_name, key)
+    if not path.exists():
+        return None
+    data = None
+    sections = None
+    try:
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        sections = _read_sections(data, key)
+    except (OSError, ValueError, struct.error, UnicodeDecodeError) as e:
+        print(f"[MaskDiskCache] Ignoring unreadable entry {path}: {e}")
+    if sections is None and data is not None:
+        data.close()
+    return sections
+
+
+def _read_sections(data: mmap.mmap, key: str) -> Optional[Dict[str, memoryview]]:
+    """Section views of a mapped entry, or None if it is for another key or version or is truncated."""
+    magic, version, count, key_len = _HEADER.unpack_from(data, 0)
+    offset = _HEADER.size
+    stored_key = bytes(data[offset:offset + key_len]).decode("utf-8")
+    if magic != MAGIC or version != CACHE_VERSION or stored_key != key:
+        return None
+    offset = _align(offset + key_len)
+    # The whole directory is checked before any view is taken, so a miss leaves nothing exported
+    entries = []
+    for _ in range(count):
+        name, start, length = _DIR_ENTRY.unpack_from(data, offset)
+        offset += _DIR_ENTRY.size
+        if start + length > len(data):
+            return None
+        entries.append((name.rstrip(b"\0").decode("ascii"), start, length))
+    view = memoryview(data)
+    return {name: view[start:start + length] for name, start, length in entries}
+
+
+def save_sections(scene_name: str, key: str, sections: Dict[str, bytes]) -> None:
+    """Write a compiled entry and remove stale entries for the same scene."""
+    directory = cache_dir()
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        key_bytes = key.encode("utf-8")
+        names = list(sections)
+        offset = _align(_HEADER.size + len(key_bytes)) + _DIR_ENTRY.size * len(names)
+        directory_entries = []
+        for name in names:
+            offset = _align(offset)
+            directory_entries.append((name, offset, len(sections[name])))
+            offset += len(sections[name])
+
+        out = bytearray(offset)
+        _HEADER.pack_into(out, 0, MAGIC, CACHE_VERSION, len(names), len(key_bytes))
+        out[_HEADER.size:_HEADER.size + len(key_bytes)] = key_bytes
+        pos = _align(_HEADER.size + len(key_bytes))
+        for name, start, length in directory_entries:
+            _DIR_ENTRY.pack_into(out, pos, name.encode("ascii"), start, length)
+            pos += _DIR_ENTRY.size
+            out[start:start + length] = sections[name]
+
+        path = _entry_path(scene_name, key)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(out)
+        os.replace(tmp_path, path)
+
+        # Only one entry per scene is kept; older hashes are stale
+        for stale in directory.glob(f"{scene_name}-*.bin"):
+            if stale != path:
+                try:
+                    stale.unlink()
+                except OSError:
+                    pass
+    except OSError as e:
+        print(f"[MaskDiskCache] Could not write cache for {scene_name}: {e}")
@@ -0,0 +1,202 @@
+"""Uniform-grid spatial index of a scene's world-space prop rects.
+
+Each scene keeps one PropIndex holding the scaled, world-space collision,
+interaction and visible rects of its props, bucketed into square grid cells.
+Player movement, NPC pathfinding and click hit-tests only look at the cells a
+query touches, so their cost follows local prop density instead of the total
+number of props. The index is only touched when a prop is added, moved,
+re-varianted, picked up or dropped (add_prop / update_prop / remove_prop).
+
+Attached navigation grids (ai.nav_grid.NavGrid) get the same collision rect
+changes pushed to them, so their prop layer never needs a full rebuild.
+"""
+import pygame
+from typing import Iterator, Optional
+
+# Grid cell size in world pixels (props are roughly 50-250px across)
+DEFAULT_CELL_SIZE = 128
+
+# Rect kinds stored per prop
+COLLISION = "collision"
+INTERACTION = "interaction"
+VISIBLE = "visible"
+
+
+def _world_rect(prop, rect: pygame.Rect) -> pygame.Rect:
+    """Scale a prop-relative rect by the prop's scale and move it to world space."""
+    prop_scale = getattr(prop, 'scale', 1.0)
+    return pygame.Rect(
+        int(prop.x + rect.x * prop_scale),
+        int(prop.y + rect.y * prop_scale),
+        int(rect.width * prop_scale),
+        int(rect.height * prop_scale)
+    )
+
+
+class PropIndex:
+    """Spatial hash of the world-space rects of one scene's props."""
+
+    def __init__(self, cell_size: int = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        # (cell_x, cell_y) -> list of (rect, prop, kind)
+        self._cells = {}
+        # prop -> list of (rect, prop, kind) it contributed
+        self._entries = {}
+        # NavGrids whose prop layer mirrors this index
+        self._nav_grids = []
+
+    def attach_nav_grid(self, nav_grid) -> None:
+        """Feed a nav grid's prop layer from this index, now and on every later change."""
+        if nav_grid.prop_source is self:
+            return
+        nav_grid.prop_source = self
+        nav_grid.set_prop_rects(self.rects(COLLISION))
+        self._nav_grids = [grid for grid in self._nav_grids if grid.prop_source is self]
+        self._nav_grids.append(nav_grid)
+
+    def _notify_nav_grids(self, rect: pygame.Rect, added: bool) -> None:
+        for grid in self._nav_grids:
+            # A newer scene instance may have taken over this grid
+            if grid.prop_source is not self:
+                continue
+            if added:
+                grid.add_prop_rect(rect)
+            else:
+                grid.remove_prop_rect(rect)
+
+    def rebuild(self, props) -> None:
+        """Replace the index contents with the given props (picked-up props are skipped)."""
+        self._cells.clear()
+        self._entries.clear()
+        # Grids get the finished layer in one set_prop_rects, not rect by rect
+        grids, self._nav_grids = self._nav_grids, []
+        for prop in props:
+            self.add_prop(prop)
+        self._nav_grids = grids
+        for grid in grids:
+            if grid.prop_source is self:
+                grid.set_prop_rects(self.rects(COLLISION))
+
+    def add_prop(self, prop) -> None:
+        """Index a prop's current rects. Picked-up props are not indexed.
+
+        The prop keeps a reference to this index in prop.prop_index, so it can
+        re-index itself when its variant changes (see Prop.set_variant).
+        """
+        if prop in self._entries:
+            self.remove_prop(prop)
+        prop.prop_index = self
+        if getattr(prop, 'picked_up', False):
+            return
+        entries = []
+        for rect in getattr(prop, 'collision_rects', ()):
+            entries.append((_world_rect(prop, rect), prop, COLLISION))
+        for rect in getattr(prop, 'interaction_rects', ()):
+            entries.append((_world_rect(prop, rect), prop, INTERACTION))
+        visible_rect = getattr(prop, 'visible_rect', None)
+        if visible_rect is not None:
+            entries.append((_world_rect(prop, visible_rect), prop, VISIBLE))
+        elif getattr(prop, 'rect', None) is not None:
+            entries.append((prop.rect.copy(), prop, VISIBLE))
+
+        for entry in entries:
+            for cell in self._cells_for(entry[0]):
+                self._cells.setdefault(cell, []).append(entry)
+            if entry[2] == COLLISION:
+                self._notify_nav_grids(entry[0], True)
+        self._entries[prop] = entries
+
+    def remove_prop(self, prop) -> None:
+        """Drop a prop from the index (e.g. when it is picked up)."""
+        entries = self._entries.pop(prop, None)
+        if not entries:
+            return
+        for entry in entries:
+            for cell in self._cells_for(entry[0]):
+                bucket = self._cells.get(cell)
+                if bucket is None:
+                    continue
+                bucket.remove(entry)
+                if not bucket:
+                    del self._cells[cell]
+            if entry[2] == COLLISION:
+                self._notify_nav_grids(entry[0], False)
+
+    def update_prop(self, prop) -> None:
+        """Re-index a prop after it moved, changed scale or changed variant."""
+        old_rects = [entry[0] for entry in self._entries.get(prop, ()) if entry[2] == COLLISION]
+        # Grids see the move as one change, not a removal and an addition
+        grids, self._nav_grids = self._nav_grids, []
+        self.add_prop(prop)
+        self._nav_grids = grids
+        new_rects = [entry[0] for entry in self._entries.get(prop, ()) if entry[2] == COLLISION]
+        for grid in grids:
+            if grid.prop_source is self:
+                grid.move_prop_rects(old_rects, new_rects)
+
+    def _cells_for(self, rect: pygame.Rect):
+        size = self.cell_size
+        x1 = (rect.right - 1) // size if rect.width > 0 else rect.x // size
+        y1 = (rect.bottom - 1) // size if rect.height > 0 else rect.y // size
+        for cy in range(rect.y // size, y1 + 1):
+            for cx in range(rect.x // size, x1 + 1):
+                yield cx, cy
+
+    def _query(self, left: int, top: int, right: int, bottom: int, kind: str) -> Iterator[tuple]:
+        """Yield (rect, prop) of the given kind overlapping [left, right) x [top, bottom).
+
+        An entry spanning several cells is reported only from the first cell
+        shared by the entry and the query, so no per-query dedup set is needed.
+        """
+        size = self.cell_size
+        qx0, qy0 = left // size, top // size
+        qx1, qy1 = (right - 1) // size, (bottom - 1) // size
+        cells = self._cells
+        for cy in range(qy0, qy1 + 1):
+            for cx in range(qx0, qx1 + 1):
+                bucket = cells.get((cx, cy))
+                if not bucket:
+                    continue
+                for rect, prop, entry_kind in bucket:
+                    if entry_kind != kind:
+                        continue
+                    if rect.right <= left or rect.x >= right or rect.bottom <= top or rect.y >= bottom:
+                        continue
+                    if max(rect.x // size, qx0) != cx or max(rect.y // size, qy0) != cy:
+                        continue
+                    yield rect, prop
+
+    def query_rect(self, rect: pygame.Rect, kind: str = COLLISION) -> Iterator[tuple]:
+        """Yield (world rect, prop) of the given kind that overlap rect."""
+        if rect.width <= 0 or rect.height <= 0:
+            return iter(())
+        return self._query(rect.x, rect.y, rect.right, rect.bottom, kind)
+
+    def collides(self, rect: pygame.Rect) -> bool:
+        """True if rect overlaps any prop collision rect."""
+        for _ in self.query_rect(rect, COLLISION):
+            return True
+        return False
+
+    def first_prop(self, rect: pygame.Rect, kind: str = INTERACTION) -> Optional[object]:
+        """Return a prop with a rect of the given kind overlapping rect, or None."""
+        for _, prop in self.query_rect(rect, kind):
+            return prop
+        return None
+
+    def point_blocked(self, x: float, y: float, margin: int = 0) -> bool:
+        """True if (x, y) lies within margin pixels of any prop collision rect."""
+        ix, iy = int(x), int(y)
+        for _ in self._query(ix - margin, iy - margin, ix + margin + 1, iy + margin + 1, COLLISION):
+            return True
+        return False
+
+    def props_at(self, x: float, y: float, kind: str = VISIBLE) -> Iterator[object]:
+        """Yield props whose rect of the given kind contains (x, y)."""
+        ix, iy = int(x), int(y)
+        for _, prop in self._query(ix, iy, ix + 1, iy + 1, kind):
+            yield prop
+
+    def rects(self, kind: str = COLLISION) -> list:
+        """All indexed world rects of the given kind."""
+        return [rect for entries in self._entries.values() for rect, _, entry_kind in entries if entry_kind == kind]
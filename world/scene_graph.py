@@ -2,11 +2,31 @@
 
 This module builds a graph of scene connections based on portal definitions,
 and provides algorithms to find paths between scenes.
+
+Routes are answered from a next-hop table covering every pair of scenes,
+built by one BFS per scene. The table is rebuilt only after the portal
+topology changes; re-registering a scene with the same portals is a no-op.
+SceneGraph.version counts topology changes so dependent caches can tell when
+to drop their contents.
+
+When a walking cost source is set (populate_scene_graph_from_registry sets
+nav_walk_cost), routes are instead the cheapest walk: a Dijkstra search over
+portals, where going from a portal to the next one costs the walk from the
+spawn point the first portal leads to. Costs are in unscaled pixels, so a
+cost divided by an NPC's base speed is the time the trip takes.
 """
 
+import heapq
+import math
 from typing import Dict, List, Tuple, Optional
 from collections import deque
 
+# Walking cost (unscaled px) assumed between a spawn point and a portal when the scene's nav grid is unavailable
+UNKNOWN_WALK_COST = 1000.0
+
+# (scene_name, portal_id) -> (FlowField, cell size, scene scale) used by nav_walk_cost
+_walk_fields = {}
+
 
 class SceneGraph:
     """Manages the connectivity graph of scenes via portals."""
@@ -14,6 +34,18 @@ class SceneGraph:
     def __init__(self):
         # scene_name -> list of (portal_id, destination_scene_name, spawn_point)
         self.connections: Dict[str, List[Tuple[int, str, Tuple[float, float]]]] = {}
+        # Bumped whenever a scene's connections change
+        self.version = 0
+        # from_scene -> {to_scene: (portal_id, next_scene, spawn_point)} of the first hop
+        self._next_hop: Dict[str, Dict[str, Tuple[int, str, Tuple[float, float]]]] = {}
+        self._routes_version = None
+        # Optional fn(scene_name, (x, y), portal_id) -> walking cost in unscaled px
+        # (math.inf if unreachable, None if unknown); routes count portal hops without it
+        self.walk_cost_fn = None
+        # (scene_name, portal_id) -> [((next_scene, next_portal_id), cost), ...] for walk-weighted routes
+        self._portal_edges: Dict[Tuple[str, int], List[Tuple[Tuple[str, int], float]]] = {}
+        # (scene_name, portal_id) -> (destination_scene_name, spawn_point)
+        self._portal_targets: Dict[Tuple[str, int], Tuple[str, Tuple[float, float]]] = {}
     
     def register_scene(self, scene_name: str, portal_map: dict):
         """Register a scene and its portal connections.
@@ -29,16 +61,102 @@ class SceneGraph:
             if to_scene:
                 connections.append((portal_id, to_scene, spawn))
         
+        if self.connections.get(scene_name) == connections:
+            return
         self.connections[scene_name] = connections
+        self.version += 1
+
+    def build_routes(self) -> None:
+        """Rebuild the next-hop table if the topology changed since it was built."""
+        if self._routes_version == self.version:
+            return
+        self._next_hop = {}
+        for from_scene in self.connections:
+            # BFS; every scene reached inherits the first hop of the scene it was reached from
+            first_hops = {}
+            queue = deque([from_scene])
+            visited = {from_scene}
+            while queue:
+                current_scene = queue.popleft()
+                for portal_id, next_scene, spawn in self.connections.get(current_scene, ()):
+                    if next_scene in visited:
+                        continue
+                    visited.add(next_scene)
+                    if current_scene == from_scene:
+                        first_hops[next_scene] = (portal_id, next_scene, spawn)
+                    else:
+                        first_hops[next_scene] = first_hops[current_scene]
+                    queue.append(next_scene)
+            self._next_hop[from_scene] = first_hops
+        self._portal_edges = {}
+        self._portal_targets = {}
+        if self.walk_cost_fn is not None:
+            for scene_name, connections in self.connections.items():
+                for portal_id, next_scene, spawn in connections:
+                    self._portal_targets[(scene_name, portal_id)] = (next_scene, spawn)
+                    self._portal_edges[(scene_name, portal_id)] = [
+                        ((next_scene, next_portal_id), self._walk_cost(next_scene, spawn, next_portal_id))
+                        for next_portal_id, _, _ in self.connections.get(next_scene, ())]
+        self._routes_version = self.version
+
+    def set_walk_cost_fn(self, walk_cost_fn) -> None:
+        """Route by walking cost from walk_cost_fn (see self.walk_cost_fn), or by portal hops if None."""
+        self.walk_cost_fn = walk_cost_fn
+        self._routes_version = None
+
+    def _walk_cost(self, scene_name: str, start, portal_id: int) -> float:
+        if start is None:
+            return 0.0
+        cost = self.walk_cost_fn(scene_name, start, portal_id)
+        return UNKNOWN_WALK_COST if cost is None else cost
+
+    def _cheapest_route(self, from_scene: str, to_scene: str, start=None):
+        """Dijkstra over portals: (cost, path in find_scene_path form), or (math.inf, None) if unreachable."""
+        # Heap of (cost, tie-breaker, (scene, portal_id)); previous holds the portal each one was reached from
+        heap = []
+        best = {}
+        previous = {}
+        for order, (portal_id, next_scene, spawn) in enumerate(self.connections.get(from_scene, ())):
+            cost = self._walk_cost(from_scene, start, portal_id)
+            node = (from_scene, portal_id)
+            if cost < best.get(node, math.inf):
+                best[node] = cost
+                previous[node] = None
+                heapq.heappush(heap, (cost, order, node))
+        pushed = len(heap)
+        targets = self._portal_targets
+        while heap:
+            cost, _, node = heapq.heappop(heap)
+            if cost > best[node]:
+                continue  # Stale entry
+            next_scene, _ = targets[node]
+            if next_scene == to_scene:
+                # Crossing this portal arrives: walk the previous links back to the start
+                path = [(to_scene, None, None)]
+                while node is not None:
+                    path.append((node[0], node[1], targets[node][1]))
+                    node = previous[node]
+                return cost, path[::-1]
+            for next_node, step in self._portal_edges.get(node, ()):
+                if cost + step >= best.get(next_node, math.inf):
+                    continue
+                best[next_node] = cost + step
+                previous[next_node] = node
+                pushed += 1
+                heapq.heappush(heap, (cost + step, pushed, next_node))
+        return math.inf, None
     
-    def find_scene_path(self, from_scene: str, to_scene: str) -> Optional[List[Tuple[str, int, Tuple[float, float]]]]:
+    def find_scene_path(self, from_scene: str, to_scene: str, start: Tuple[float, float] = None) -> Optional[List[Tuple[str, int, Tuple[float, float]]]]:
         """Find the path of scenes and portals to traverse from one scene to another.
         
-        Uses BFS to find the shortest path through the scene graph.
+        With a walking cost source the route is the shortest walk from start
+        (any portal of from_scene if start is None); otherwise it walks the
+        next-hop table (see build_routes) for the fewest portal crossings.
         
         Args:
             from_scene: Starting scene name
             to_scene: Destination scene name
+            start: Position in from_scene the trip starts from (optional)
             
         Returns:
             List of (scene_name, portal_id, spawn_point) tuples representing the path,
@@ -52,32 +170,39 @@ class SceneGraph:
         if from_scene not in self.connections:
             return None
         
-        # BFS to find shortest path
-        queue = deque([(from_scene, [])])
-        visited = {from_scene}
-        
-        while queue:
-            current_scene, path = queue.popleft()
-            
-            # Check all portals from current scene
-            if current_scene in self.connections:
-                for portal_id, next_scene, spawn in self.connections[current_scene]:
-                    if next_scene == to_scene:
-                        # Found the destination!
-                        result_path = path + [
-                            (current_scene, portal_id, spawn),
-                            (to_scene, None, None)
-                        ]
-                        return result_path
-                    
-                    if next_scene not in visited:
-                        visited.add(next_scene)
-                        new_path = path + [(current_scene, portal_id, spawn)]
-                        queue.append((next_scene, new_path))
+        self.build_routes()
+        if to_scene not in self._next_hop[from_scene]:
+            return None
+        if self.walk_cost_fn is not None:
+            path = self._cheapest_route(from_scene, to_scene, start)[1]
+            if path is not None:
+                return path
+            # Every route has a leg that cannot be walked: fall back to the fewest crossings
         
-        # No path found
-        return None
+        path = []
+        current_scene = from_scene
+        while current_scene != to_scene:
+            portal_id, next_scene, spawn = self._next_hop[current_scene][to_scene]
+            path.append((current_scene, portal_id, spawn))
+            current_scene = next_scene
+        path.append((to_scene, None, None))
+        return path
     
+    def route_cost(self, from_scene: str, to_scene: str, start: Tuple[float, float] = None) -> float:
+        """Walking cost (unscaled px) of the cheapest route, or math.inf if there is none.
+
+        Divide by an NPC's base speed for the travel time. Without a walking
+        cost source every crossing counts UNKNOWN_WALK_COST.
+        """
+        if from_scene == to_scene:
+            return 0.0
+        self.build_routes()
+        if to_scene not in self._next_hop.get(from_scene, {}):
+            return math.inf
+        if self.walk_cost_fn is None:
+            return UNKNOWN_WALK_COST * (len(self.find_scene_path(from_scene, to_scene)) - 1)
+        return self._cheapest_route(from_scene, to_scene, start)[0]
+
     def get_portal_to_scene(self, from_scene: str, to_scene: str) -> Optional[Tuple[int, Tuple[float, float]]]:
         """Get the portal ID to use to go directly from one scene to an adjacent scene.
         
@@ -112,6 +237,53 @@ def register_scene_portals(scene_name: str, portal_map: dict):
     _scene_graph.register_scene(scene_name, portal_map)
 
 
+def nav_walk_cost(scene_name: str, start: Tuple[float, float], portal_id: int) -> Optional[float]:
+    """Walking cost (unscaled px) from start to a portal's center on the scene's NPC nav grid.
+
+    Read off the portal's flow field. The field is kept for later calls even
+    after props move, so costs are an estimate that never costs a rebuild.
+    Returns None if the scene's mask is not cached, and math.inf if the portal
+    cannot be reached from start.
+    """
+    walk_field = _walk_fields.get((scene_name, portal_id))
+    if walk_field is None:
+        walk_field = _build_walk_field(scene_name, portal_id)
+        if walk_field is None:
+            return None
+        _walk_fields[(scene_name, portal_id)] = walk_field
+    field, cell, scene_scale = walk_field
+    cx, cy = field.nav_grid.cell_of(*start)
+    # Spawn points may sit just off the open cells: start from the cheapest open neighbour then
+    cost = min(field.cost_from((cx + dx, cy + dy)) + math.hypot(dx, dy)
+               for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+    return cost * cell / scene_scale
+
+
+def _build_walk_field(scene_name: str, portal_id: int):
+    """(FlowField, cell size, scene scale) toward a portal on the scene's NPC nav grid, or None."""
+    from scenes.scene_registry import SCENE_REGISTRY
+    from world.mask_cache import get_mask_for_scene
+    from ai.nav_grid import get_nav_grid
+    from ai.flow_field import get_portal_flow_field
+    from entities.npc import PATH_CLEARANCE
+
+    scene_class = SCENE_REGISTRY.get(scene_name)
+    mask_system = get_mask_for_scene(scene_name)
+    if scene_class is None or mask_system is None:
+        return None
+    bounds = mask_system.get_portal_bounds(portal_id)
+    if bounds is None:
+        return None
+    # Same grid NPCs in the scene search on (see NPC._get_nav_grid)
+    scene_scale = getattr(scene_class, 'SCENE_SCALE', None) or 1.0
+    cell = max(5, int(20 * scene_scale))
+    nav_grid = get_nav_grid(scene_name, mask_system, cell, max(1, int(PATH_CLEARANCE * scene_scale)))
+    field = get_portal_flow_field(nav_grid, bounds.centerx, bounds.centery)
+    if field is None:
+        return None
+    return field, cell, scene_scale
+
+
 def populate_scene_graph_from_registry():
     """Build the complete portal map by scanning all registered scenes.
     
@@ -126,3 +298,7 @@ def populate_scene_graph_from_registry():
         portal_map = getattr(scene_class, 'PORTAL_MAP', {})
         if portal_map:
             _scene_graph.register_scene(scene_name, portal_map)
+    # Route by walking distance over the scenes' nav grids (masks may have been cached since the last run)
+    _walk_fields.clear()
+    _scene_graph.set_walk_cost_fn(nav_walk_cost)
+    _scene_graph.build_routes()
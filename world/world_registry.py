@@ -7,6 +7,8 @@ Scenes only contain references to which objects are currently present.
 from typing import Dict, List, Optional, Tuple
 from entities.npc import NPC
 from entities.interactables import Prop
+from ai.path_worker import get_path_worker
+from ai.portal_queue import update_portal_queues
 
 # Global world state
 _npcs: Dict[str, NPC] = {}  # npc_id -> NPC instance
@@ -187,7 +189,10 @@ def apply_world_state(state: dict, game) -> None:
             prop.base_scale = saved_base_scale
             prop.scale = prop.base_scale * getattr(prop, "scene_scale", 1.0)
         if hasattr(prop, "set_variant"):
+            # Also re-indexes the restored position, scale and variant in the scene's prop index
             prop.set_variant(prop_state.get("variant_index", getattr(prop, "variant_index", 0)))
+        elif getattr(prop, "prop_index", None) is not None:
+            prop.prop_index.update_prop(prop)
 
         if prop_state.get("scene"):
             _prop_locations[prop_id] = prop_state["scene"]
@@ -199,6 +204,9 @@ def update_all_npcs(dt: float, game) -> None:
     This ensures NPCs continue to advance their state machines (idle/wander/travel)
     even when they're not in the currently-active scene.
     """
+    # Hand out paths finished by the background path worker since last frame
+    get_path_worker().deliver()
+    update_portal_queues(dt)
     for npc_id, npc in _npcs.items():
         if npc and hasattr(npc, "update"):
             npc.update(dt)